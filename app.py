@@ -1,12 +1,51 @@
 import streamlit as st
-import src.agent as agent
 import os
-import sqlite3
+import uuid
 import pandas as pd
 
 from datetime import datetime
+from src.db import connection
+from src.ingestion import classify_file
+from src.report_archive import ReportArchive
+from src.run_storage import create_run_storage
 
-DB_PATH = "database.db"
+FILE_TYPE_LABELS = {
+    "ativos": "Funcionários Ativos",
+    "admissao": "Admissões",
+    "desligados": "Desligamentos",
+    "ferias": "Férias",
+    "exterior": "Exterior",
+    "estagio": "Estágio",
+    "base_sindicato_x_valor": "Base sindicato x valor",
+    "base_dias_uteis": "Base dias uteis",
+    "afastamentos": "Afastamento",
+    "aprendiz": "Aprendiz",
+}
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def load_agent(
+    api_key: str,
+    calculation_mode: str,
+    persist_steps: bool,
+    stream_actives_batch_size,
+    incremental: bool,
+    archive_reports: bool
+):
+    """
+    Agente VR/VA com o workflow LangGraph já compilado, reaproveitado entre reruns e sessões com a
+    mesma configuração. O banco e os arquivos de cada execução seguem no estado inicial do workflow.
+    """
+    # Importado só no primeiro processamento: a página carrega sem LangGraph/LangChain.
+    import src.agent as agent
+    return agent.VRVAAgent(
+        None,
+        api_key,
+        persist_steps=persist_steps,
+        calculation_mode=calculation_mode,
+        stream_actives_batch_size=stream_actives_batch_size,
+        incremental=incremental,
+        archive=ReportArchive() if archive_reports else None
+    )
 
 def formatted_monetary_values(valor: float) -> str:
     """
@@ -18,6 +57,33 @@ def formatted_monetary_values(valor: float) -> str:
     
     return f"R$ {br_formatted_value}"
 
+def show_archive_statistics(archive: ReportArchive, competence: str):
+    """
+    Estatísticas do processamento a partir do arquivo colunar: uma única varredura das
+    colunas ESTADO e dos totais da competência, sem consultar o SQLite da execução.
+    """
+    try:
+        df_summary = archive.state_summary([competence])
+        if df_summary.empty:
+            st.warning("Competência não encontrada no arquivo colunar")
+            return
+
+        st.metric("Total de Registros Processados", int(df_summary["quantidade"].sum()))
+        st.subheader("📍 Distribuição por Estado:")
+        for _, row in df_summary.iterrows():
+            st.write(f"• {row['ESTADO']}: {row['quantidade']} funcionários")
+
+        st.subheader("💰 Totais Financeiros:")
+        col_t1, col_t2, col_t3 = st.columns(3)
+        with col_t1:
+            st.metric("Total VR/VA", formatted_monetary_values(df_summary["total"].sum()))
+        with col_t2:
+            st.metric("Custo Empresa", formatted_monetary_values(df_summary["custo_empresa"].sum()))
+        with col_t3:
+            st.metric("Desconto Profissional", formatted_monetary_values(df_summary["custo_profissional"].sum()))
+    except Exception as e:
+        st.error(f"Erro ao obter estatísticas: {e}")
+
 st.set_page_config(
     page_title="Agente VR/VA",
     page_icon="🍽️",
@@ -26,12 +92,16 @@ st.set_page_config(
 
 st.title("🍽️ Agente Inteligente VR/VA")
 
+# Identificador da sessão do navegador: cada execução usa um banco e diretório próprios.
+if "session_id" not in st.session_state:
+    st.session_state["session_id"] = uuid.uuid4().hex
+
 with st.sidebar:
     st.image("src/img/Logo_I2A2.png", width=200)
     st.header("ℹ️ Informações")
     st.info("""
     **Como usar:**
-    1. Insira sua API Key da OpenAI
+    1. Escolha o modo de cálculo (a API Key da OpenAI só é necessária nos modos com LLM)
     2. Faça upload das planilhas (.xlsx)
     3. Informe a competência
     4. Clique em Gerar Relatório
@@ -39,10 +109,31 @@ with st.sidebar:
     """)
         
 
-col1, col2 = st.columns([2, 1])
+CALCULATION_MODES = {
+    "local": "🧮 Local (determinístico, offline)",
+    "llm": "🤖 LLM (GPT-4) com fallback local",
+    "audit": "🔎 Auditoria (local + conferência pelo LLM)",
+}
+
+col0, col1, col2 = st.columns([1, 2, 1])
+
+with col0:
+    calculation_mode = st.selectbox(
+        "⚙️ Modo de cálculo",
+        options=list(CALCULATION_MODES),
+        format_func=CALCULATION_MODES.get,
+        help="O modo local calcula os benefícios sem chamadas externas"
+    )
+
+llm_required = calculation_mode != "local"
 
 with col1:
-    api_key = st.text_input("🔑 API Key OpenAI", type="password", help="Sua chave de API da OpenAI")
+    api_key = st.text_input(
+        "🔑 API Key OpenAI",
+        type="password",
+        help="Sua chave de API da OpenAI (necessária apenas nos modos com LLM)",
+        disabled=not llm_required
+    )
 
 with col2:
     competence = st.text_input(
@@ -51,6 +142,35 @@ with col2:
         placeholder="ex: 05-2025"
     )
 
+with st.expander("⚙️ Opções avançadas"):
+    persist_steps = st.checkbox(
+        "💾 Gravar checkpoint no banco a cada etapa (debug)",
+        value=False,
+        help="Por padrão o report trafega em memória entre as etapas e é gravado no SQLite uma única vez"
+    )
+    stream_actives = st.checkbox(
+        "🌊 Ler planilha de ativos em lotes (folhas muito grandes)",
+        value=False,
+        help="Mantém o uso de memória limitado lendo e gravando os ativos lote a lote"
+    )
+    stream_batch_size = st.number_input(
+        "Linhas por lote",
+        min_value=1_000,
+        value=50_000,
+        step=10_000,
+        disabled=not stream_actives
+    )
+    incremental = st.checkbox(
+        "♻️ Modo incremental (reaproveitar a competência anterior)",
+        value=False,
+        help="Recalcula dias úteis apenas das matrículas novas ou alteradas desde o último processamento"
+    )
+    archive_reports = st.checkbox(
+        "🗄️ Arquivar report e planilhas em Parquet (histórico colunar)",
+        value=False,
+        help="Guarda cada competência em .cache/archive (na raiz do projeto ou em VRVA_DATA_DIR) para análises entre meses; as estatísticas passam a ser lidas do arquivo"
+    )
+
 st.subheader("📁 Upload de Arquivos")
 files = st.file_uploader(
     "Selecione as planilhas (.xlsx)",
@@ -63,28 +183,7 @@ if files:
     st.success(f"✅ {len(files)} arquivo(s) carregado(s)")
     with st.expander("📋 Ver arquivos carregados"):
         for i, file in enumerate(files, 1):
-            file_type = "🔍 Detectando tipo..."
-            if 'ativo' in file.name.lower():
-                file_type = "Funcionários Ativos"
-            elif 'admiss' in file.name.lower():
-                file_type = "Admissões"
-            elif 'deslig' in file.name.lower():
-                file_type = "Desligamentos"
-            elif 'rias' in file.name.lower():
-                file_type = "Férias"
-            elif 'ext' in file.name.lower():
-                file_type = "Exterior"
-            elif 'est' in file.name.lower():
-                file_type = "Estágio"
-            elif 'sindicato' in file.name.lower():
-                file_type = "Base sindicato x valor"
-            elif 'dias' in file.name.lower():
-                file_type = "Base dias uteis"
-            elif 'afas' in file.name.lower():
-                file_type = "Afastamento"
-            elif 'apr' in file.name.lower():
-                file_type = "Aprendiz"  
-            
+            file_type = FILE_TYPE_LABELS.get(classify_file(file.name), "❓ Tipo não reconhecido")
             st.write(f"{i}. {file.name} ({file.size} bytes) - {file_type}")
 
 # Validações visuais
@@ -92,7 +191,9 @@ st.subheader("🔍 Status das Configurações")
 col3, col4, col5 = st.columns(3)
 
 with col3:
-    if api_key:
+    if not llm_required:
+        st.success("✅ Cálculo local (API Key dispensada)")
+    elif api_key:
         st.success("✅ API Key fornecida")
     else:
         st.error("❌ API Key necessária")
@@ -117,7 +218,7 @@ st.markdown("---")
 
 if st.button("🚀 Gerar Relatório", type="primary", use_container_width=True):
     # Validações
-    if not api_key:
+    if llm_required and not api_key:
         st.error("❌ Informe a API Key da OpenAI!")
     elif not files:
         st.error("❌ Faça upload dos arquivos!")
@@ -130,51 +231,63 @@ if st.button("🚀 Gerar Relatório", type="primary", use_container_width=True):
         
         with progress_container:
             progress_bar = st.progress(0, text="🔄 Iniciando...")
+
+            # Banco e relatório isolados desta execução, removidos ao final (após a leitura do download).
+            run = create_run_storage(st.session_state["session_id"], competence)
             
             try:
                 progress_bar.progress(10, text="🤖 Inicializando agente VR/VA...")
-                
-                if not os.path.exists(DB_PATH):
-                    open(DB_PATH, 'a').close()
-                
-                vrva_agent = agent.VRVAAgent(DB_PATH, api_key)
+
+                vrva_agent = load_agent(
+                    api_key,
+                    calculation_mode,
+                    persist_steps,
+                    int(stream_batch_size) if stream_actives else None,
+                    incremental,
+                    archive_reports
+                )
                 
                 progress_bar.progress(20, text="📁 Preparando arquivos para processamento...")
 
-                vrva_agent.set_files(files)
-
                 workflow_status = st.empty()
                 
                 progress_bar.progress(30, text="🔄 Executando...")
 
-                initial_state = {
-                    'messages': [],
-                    'db_path': DB_PATH,
-                    'files': files,
-                    'competencia': competence,
-                    'current_step': "Iniciando",
-                    'processed_files': {},
-                    'calculations_done': False,
-                    'report_generated': False,
-                    'error': ""
+                initial_state = vrva_agent.initial_state(
+                    competence, output_dir=run.directory, db_path=run.db_path, files=files
+                )
+
+                workflow_steps = {
+                    "ingest_files": ("📥 Lendo planilhas", 35),
+                    "process_actives": ("👥 Processando funcionários ativos", 40),
+                    "process_admissions": ("📅 Processando admissões", 50),
+                    "process_fired": ("📤 Processando desligamentos", 60),
+                    "apply_eligibility": ("🚫 Aplicando regras de elegibilidade", 65),
+                    "process_business_days": ("🗓️ Calculando dias úteis", 70),
+                    "process_daily_values": ("💰 Calculando valores diários", 75),
+                    "process_vacation_days": ("🏖️ Processando férias", 80),
+                    "calculate_benefits": ("🧮 Calculando benefícios VR/VA", 90),
+                    "generate_report": ("📊 Gerando relatório final", 95)
                 }
 
-                workflow_steps = [
-                    ("process_actives", "👥 Processando funcionários ativos", 40),
-                    ("process_admissions", "📅 Processando admissões", 50),
-                    ("process_fired", "📤 Processando desligamentos", 60),
-                    ("process_business_days", "🗓️ Calculando dias úteis", 70),
-                    ("process_daily_values", "💰 Calculando valores diários", 80),
-                    ("calculate_benefits", "🧮 Calculando benefícios VR/VA", 90),
-                    ("generate_report", "📊 Gerando relatório final", 95)
-                ]
-                
-                final_state = vrva_agent.workflow.invoke(initial_state)
-                
-                for step_name, step_desc, progress_val in workflow_steps:
-                    progress_bar.progress(progress_val, text=step_desc)
-                    workflow_status.info(f"✅ {step_desc}")
-                    
+                # Cada nó concluído é exibido assim que termina, com o tempo gasto e o nº de registros.
+                final_state = initial_state
+                completed_steps = []
+                for update in vrva_agent.workflow.stream(initial_state, stream_mode="updates"):
+                    for step_name, step_state in update.items():
+                        final_state = step_state
+                        step_desc, progress_val = workflow_steps.get(step_name, (step_name, 95))
+                        elapsed = step_state.get('node_timings', {}).get(step_name)
+                        rows = step_state.get('node_rows', {}).get(step_name)
+
+                        detail = f"{elapsed:.2f}s" if elapsed is not None else ""
+                        if rows is not None:
+                            detail += f" · {rows} registros"
+                        completed_steps.append(f"{'❌' if step_state.get('error') else '✅'} {step_desc} ({detail})")
+
+                        progress_bar.progress(progress_val, text=step_desc)
+                        workflow_status.info("\n\n".join(completed_steps))
+
                 progress_bar.progress(100, text="✅ Processo finalizado!")
  
                 if final_state.get('error'):
@@ -189,6 +302,7 @@ if st.button("🚀 Gerar Relatório", type="primary", use_container_width=True):
                     st.success("🎉 **Relatório gerado com sucesso!**")
                     
                     file_name = f"VR MENSAL {competence.replace('-', '.')}.xlsx"
+                    report_path = final_state.get('report_path') or run.output_path(file_name)
                     
                     with st.expander("📊 Detalhes do Processamento"):
                         st.write("**Arquivos processados:**")
@@ -199,18 +313,34 @@ if st.button("🚀 Gerar Relatório", type="primary", use_container_width=True):
                         st.write(f"**Último step:** {final_state.get('current_step', 'N/A')}")
                         st.write(f"**Cálculos realizados:** {'✅ Sim' if final_state.get('calculations_done') else '❌ Não'}")
 
-                    if os.path.exists(file_name):
-                        tamanho = os.path.getsize(file_name) / 1024  # KB
+                        if final_state.get('eligibility_hits'):
+                            st.write("**Exclusões por regra de elegibilidade:**")
+                            st.json(final_state['eligibility_hits'])
+
+                        if final_state.get('incremental_stats'):
+                            st.write("**Modo incremental:**")
+                            st.json(final_state['incremental_stats'])
+
+                        if final_state.get('node_timings'):
+                            st.write("**Tempo por etapa (s):**")
+                            st.json(final_state['node_timings'])
+
+                        if final_state.get('calculation_audit'):
+                            st.write("**Auditoria LLM x cálculo local (registros divergentes):**")
+                            st.json(final_state['calculation_audit'])
+
+                    if os.path.exists(report_path):
+                        tamanho = os.path.getsize(report_path) / 1024  # KB
                         
                         st.info(f"""
                             📋 **Detalhes do Relatório VR/VA:**
                             - **Arquivo:** {file_name}
                             - **Tamanho:** {tamanho:.1f} KB
                             - **Competência:** {competence}
-                            - **Cálculos:** IA Generativa (GPT-4)
+                            - **Cálculos:** {CALCULATION_MODES[calculation_mode]}
                             - **Gerado em:** {datetime.now().strftime('%d/%m/%Y às %H:%M:%S')}
 
-                            🤖 **Cálculos realizados pelo Agente:**
+                            🧮 **Cálculos realizados pelo Agente:**
                             - Total VR/VA = Dias úteis × Valor diário
                             - Custo empresa = 80% do total
                             - Desconto funcionário = 20% do total
@@ -218,7 +348,7 @@ if st.button("🚀 Gerar Relatório", type="primary", use_container_width=True):
                         )
                         
                         # Botão de download
-                        with open(file_name, "rb") as file:
+                        with open(report_path, "rb") as file:
                             st.download_button(
                                 label="📥 Baixar Relatório VR/VA",
                                 data=file.read(),
@@ -226,16 +356,28 @@ if st.button("🚀 Gerar Relatório", type="primary", use_container_width=True):
                                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                                 use_container_width=True
                             )
+
+                        # Perfil de desempenho da execução (tempo, CPU, memória e linhas por etapa).
+                        profile_path = final_state.get('profile_path')
+                        if profile_path and os.path.exists(profile_path):
+                            with open(profile_path, "rb") as file:
+                                st.download_button(
+                                    label="📈 Baixar perfil da execução (JSON)",
+                                    data=file.read(),
+                                    file_name=os.path.basename(profile_path),
+                                    mime="application/json",
+                                    use_container_width=True
+                                )
                     else:
                         st.warning("⚠️ Arquivo não encontrado após geração")
                         
                         # Verificar outros arquivos Excel no diretório
-                        generated_file = [f for f in os.listdir('.') if f.endswith('.xlsx')]
+                        generated_file = [f for f in os.listdir(run.directory) if f.endswith('.xlsx')]
                         if generated_file:
                             st.info("📁 Arquivos Excel encontrados no diretório:")
                             for file in generated_file:
                                 if 'relatorio' in file.lower():
-                                    with open(file, "rb") as file:
+                                    with open(run.output_path(file), "rb") as file:
                                         st.download_button(
                                             label=f"📥 Baixar {file}",
                                             data=file.read(),
@@ -252,61 +394,64 @@ if st.button("🚀 Gerar Relatório", type="primary", use_container_width=True):
                 
                 # Mostrar estatísticas finais
                 with st.expander("📊 Estatísticas do Processamento"):
-                    # Verificar dados na tabela report
-                    try:
-                        with sqlite3.connect(DB_PATH) as conn:
-                            # Verificar se tabela report existe
-                            cursor = conn.cursor()
-                            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='report'")
-                            if cursor.fetchone():
-                                df_stats = pd.read_sql("SELECT COUNT(*) as total_registros FROM report", conn)
-                                st.metric("Total de Registros Processados", df_stats['total_registros'].iloc[0])
+                    if vrva_agent.archive is not None:
+                        show_archive_statistics(vrva_agent.archive, competence)
+                    else:
+                        # Verificar dados na tabela report
+                        try:
+                            with connection(run.db_path) as conn:
+                                # Verificar se tabela report existe
+                                cursor = conn.cursor()
+                                cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='report'")
+                                if cursor.fetchone():
+                                    df_stats = pd.read_sql("SELECT COUNT(*) as total_registros FROM report", conn)
+                                    st.metric("Total de Registros Processados", df_stats['total_registros'].iloc[0])
                                 
-                                # Estatísticas por estado se existir coluna
-                                try:
-                                    df_estados = pd.read_sql("""
-                                        SELECT ESTADO, COUNT(*) as quantidade 
-                                        FROM report 
-                                        WHERE ESTADO IS NOT NULL 
-                                        GROUP BY ESTADO
-                                    """, conn)
-                                    if not df_estados.empty:
-                                        st.subheader("📍 Distribuição por Estado:")
-                                        for _, row in df_estados.iterrows():
-                                            st.write(f"• {row['ESTADO']}: {row['quantidade']} funcionários")
-                                except Exception:
-                                    pass
+                                    # Estatísticas por estado se existir coluna
+                                    try:
+                                        df_estados = pd.read_sql("""
+                                            SELECT ESTADO, COUNT(*) as quantidade 
+                                            FROM report 
+                                            WHERE ESTADO IS NOT NULL 
+                                            GROUP BY ESTADO
+                                        """, conn)
+                                        if not df_estados.empty:
+                                            st.subheader("📍 Distribuição por Estado:")
+                                            for _, row in df_estados.iterrows():
+                                                st.write(f"• {row['ESTADO']}: {row['quantidade']} funcionários")
+                                    except Exception:
+                                        pass
                                 
-                                # Totais financeiros se existirem                                
-                                try:
-                                    df_totais = pd.read_sql("""
-                                        SELECT 
-                                            SUM(TOTAL) as total,
-                                            SUM(CUSTO_EMPRESA) as custo_empresa,
-                                            SUM(CUSTO_PROFISSIONAL) as custo_profissionais
-                                        FROM report 
-                                        WHERE TOTAL IS NOT NULL
-                                    """, conn)
+                                    # Totais financeiros se existirem                                
+                                    try:
+                                        df_totais = pd.read_sql("""
+                                            SELECT 
+                                                SUM(TOTAL) as total,
+                                                SUM(CUSTO_EMPRESA) as custo_empresa,
+                                                SUM(CUSTO_PROFISSIONAL) as custo_profissionais
+                                            FROM report 
+                                            WHERE TOTAL IS NOT NULL
+                                        """, conn)
                                     
-                                    if not df_totais.empty and df_totais['total'].iloc[0]:
-                                        st.subheader("💰 Totais Financeiros:")
-                                        col_t1, col_t2, col_t3 = st.columns(3)
-                                        with col_t1:
-                                            total = df_totais['total'].iloc[0] or 0
-                                            st.metric("Total VR/VA", formatted_monetary_values(total))
-                                        with col_t2:
-                                            total_company_cost = df_totais['custo_empresa'].iloc[0] or 0
-                                            st.metric("Custo Empresa", formatted_monetary_values(total_company_cost))
-                                        with col_t3:
-                                            employee_cost = df_totais['custo_profissionais'].iloc[0] or 0
-                                            emp_cost = formatted_monetary_values(employee_cost)
-                                            st.metric("Desconto Profissional", emp_cost)
-                                except Exception:
-                                    pass
-                            else:
-                                st.warning("Tabela 'report' não encontrada no banco")
-                    except Exception as e:
-                        st.error(f"Erro ao obter estatísticas: {e}")
+                                        if not df_totais.empty and df_totais['total'].iloc[0]:
+                                            st.subheader("💰 Totais Financeiros:")
+                                            col_t1, col_t2, col_t3 = st.columns(3)
+                                            with col_t1:
+                                                total = df_totais['total'].iloc[0] or 0
+                                                st.metric("Total VR/VA", formatted_monetary_values(total))
+                                            with col_t2:
+                                                total_company_cost = df_totais['custo_empresa'].iloc[0] or 0
+                                                st.metric("Custo Empresa", formatted_monetary_values(total_company_cost))
+                                            with col_t3:
+                                                employee_cost = df_totais['custo_profissionais'].iloc[0] or 0
+                                                emp_cost = formatted_monetary_values(employee_cost)
+                                                st.metric("Desconto Profissional", emp_cost)
+                                    except Exception:
+                                        pass
+                                else:
+                                    st.warning("Tabela 'report' não encontrada no banco")
+                        except Exception as e:
+                            st.error(f"Erro ao obter estatísticas: {e}")
                 
             except Exception as e:
                 progress_bar.progress(0, text="❌ Erro durante processamento")
@@ -318,13 +463,14 @@ if st.button("🚀 Gerar Relatório", type="primary", use_container_width=True):
                     
                     # Informações adicionais para debug
                     st.write("**Informações para debug:**")
-                    st.write(f"- Banco existe: {os.path.exists(DB_PATH)}")
+                    st.write(f"- Banco existe: {os.path.exists(run.db_path)}")
                     st.write(f"- Número de arquivos: {len(files) if files else 0}")
+                    st.write(f"- Modo de cálculo: {calculation_mode}")
                     st.write(f"- API Key fornecida: {'Sim' if api_key else 'Não'}")
                     
                     # Tentar mostrar tabelas existentes
                     try:
-                        with sqlite3.connect(DB_PATH) as conn:
+                        with connection(run.db_path) as conn:
                             cursor = conn.cursor()
                             cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
                             tabelas = [row[0] for row in cursor.fetchall()]
@@ -333,18 +479,20 @@ if st.button("🚀 Gerar Relatório", type="primary", use_container_width=True):
                         st.write("- Não foi possível verificar tabelas do banco")
                 
                 st.info("💡 **Dicas para resolver:**")
-                st.write("1. Verifique se a API Key da OpenAI está correta")
+                st.write("1. Nos modos com LLM, verifique se a API Key da OpenAI está correta")
                 st.write("2. Confirme se os arquivos têm as colunas esperadas")
                 st.write("3. Verifique se há conexão com internet")
                 st.write("4. Consulte os logs no terminal para mais detalhes")
                 st.write("5. Certifique-se de que os arquivos contêm dados válidos")
+            finally:
+                run.cleanup()
 
 # Footer expandido
 st.markdown("---")
 st.markdown(
     """
     <div style='text-align: center; color: #666; font-size: 12px;'>
-    🤖 <strong>AI-Powered:</strong> OpenAI GPT-4 para cálculos inteligentes<br/>
+    🧮 <strong>Cálculos:</strong> calculadora local vetorizada, com OpenAI GPT-4 opcional para fallback/auditoria<br/>
     🔄 <strong>Workflow:</strong> LangGraph para orquestração estruturada<br/>
     📊 <strong>ETL:</strong> Pandas + SQLite para processamento de dados<br/>
     💻 <strong>Interface:</strong> Streamlit para experiência interativa<br/>
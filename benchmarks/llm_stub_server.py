@@ -0,0 +1,87 @@
+"""
+Servidor local compatível com a API de chat da OpenAI (POST /v1/chat/completions), usado no
+lugar do modelo real para exercitar o caminho LLM (modos llm/audit) sem rede nem custo.
+
+Responde sempre com os mesmos UPDATEs de STUB_SQL, opcionalmente após um atraso, o que permite
+observar o tempo limite, as novas tentativas e o cache de respostas do LLMClient.
+
+Uso:
+    python -m benchmarks.llm_stub_server --port 8765 [--delay 0.5]
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 streamlit run app.py
+"""
+import json
+import time
+import argparse
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+# Resposta fixa no lugar do LLM: os mesmos UPDATEs que o modelo costuma gerar.
+STUB_SQL = """
+UPDATE report SET TOTAL = ROUND(COALESCE(DIAS_UTEIS,0) * COALESCE(VALOR_DIARIO,0), 2);
+UPDATE report SET CUSTO_EMPRESA = ROUND(COALESCE(TOTAL,0) * 0.80, 2);
+UPDATE report SET CUSTO_PROFISSIONAL = ROUND(COALESCE(TOTAL,0) * 0.20, 2);
+"""
+
+def _handler(delay: float, content: str):
+    class StubHandler(BaseHTTPRequestHandler):
+        requests_served = 0
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            StubHandler.requests_served += 1
+            if delay:
+                time.sleep(delay)
+
+            payload = json.dumps({
+                "id": f"stub-{StubHandler.requests_served}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop"
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+            }).encode("utf-8")
+            try:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+            except (BrokenPipeError, ConnectionResetError):
+                # Cliente desistiu (tempo limite) antes da resposta.
+                pass
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+def start_stub_server(port: int = 0, delay: float = 0.0, content: str = STUB_SQL) -> Tuple[ThreadingHTTPServer, str]:
+    """Inicia o servidor em uma thread e retorna (servidor, base_url); port=0 escolhe uma porta livre."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), _handler(delay, content))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor stub compatível com a API de chat da OpenAI")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.0, help="Atraso de cada resposta, em segundos")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), _handler(args.delay, STUB_SQL))
+    print(f"Stub do LLM em http://127.0.0.1:{args.port}/v1 (atraso {args.delay}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
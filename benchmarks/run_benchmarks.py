@@ -0,0 +1,99 @@
+"""
+Benchmark do workflow VR/VA com folhas sintéticas.
+
+Executa o mesmo workflow LangGraph da interface (ingest_files, process_actives, process_admissions,
+process_fired, apply_eligibility, process_business_days, process_daily_values, process_vacation_days,
+calculate_benefits e generate_report) sobre planilhas .xlsx sintéticas e reporta o perfil que o
+próprio workflow registra: um registro por nó e pelos helpers medidos (@profiled) dentro deles.
+No modo llm o modelo é substituído por um stub que devolve STUB_SQL.
+
+Uso:
+    python -m benchmarks.run_benchmarks --sizes 1000 10000 100000
+    python -m benchmarks.run_benchmarks --sizes 10000 --mode llm --output bench.json
+"""
+import os
+import sys
+import json
+import glob
+import types
+import logging
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from typing import Any, Dict, List
+
+from benchmarks.llm_stub_server import STUB_SQL
+from benchmarks.synthetic_payroll import generate_payroll, write_workbooks
+from src.agent import VRVAAgent
+from src.file_cache import ExcelCache
+
+# A escrita das planilhas com openpyxl domina o preparo dos cenários: 1.000.000 pode ser pedido em --sizes.
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+COMPETENCIA = "05-2025"
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+# Planilhas base da amostra (valor por estado e dias úteis por sindicato), com os mesmos sindicatos das folhas sintéticas.
+BASE_FILES = ["Base_dias_uteis.xlsx", "Base_sindicato_x_valor.xlsx"]
+
+class StubLLM:
+    def invoke(self, messages):
+        return types.SimpleNamespace(content=STUB_SQL)
+
+def run_size(n_employees: int, workdir: str, calculation_mode: str = "local", seed: int = 0) -> List[Dict[str, Any]]:
+    """Executa o workflow completo para n_employees ativos e retorna o perfil de cada etapa."""
+    paths = write_workbooks(generate_payroll(n_employees, seed=seed), os.path.join(workdir, "data"))
+    files = list(paths.values()) + [p for name in BASE_FILES for p in glob.glob(os.path.join(DATA_DIR, name))]
+
+    # Cache de planilhas novo e só em memória: a ingestão é sempre medida a frio.
+    agent = VRVAAgent(
+        os.path.join(workdir, "database.db"), "sk-bench",
+        calculation_mode=calculation_mode, excel_cache=ExcelCache(cache_dir=None)
+    )
+    if calculation_mode != "local":
+        agent.llm = StubLLM()
+
+    final_state = agent.workflow.invoke(agent.initial_state(COMPETENCIA, workdir, files=files))
+    if final_state.get("error"):
+        raise RuntimeError(final_state["error"])
+
+    records = final_state["run_profile"]
+    for record in records:
+        record["employees"] = n_employees
+    return records
+
+def print_table(records: List[Dict[str, Any]]):
+    print(f"{'funcionários':>12}  {'etapa':<36} {'parede (s)':>10} {'CPU (s)':>9} {'pico RSS (MB)':>14} {'linhas':>9}")
+    for r in records:
+        rss = r.get("peak_rss_mb")
+        name = r["name"] if r["kind"] == "node" else f"  ↳ {r['name']}"
+        print(
+            f"{r['employees']:>12}  {name:<36} {r['wall_s']:>10.3f} {r['cpu_s']:>9.3f} "
+            f"{rss if rss is not None else '-':>14} {r['rows_out'] if r['rows_out'] is not None else '-':>9}"
+        )
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Benchmark do workflow VR/VA com folhas sintéticas")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Nº de funcionários ativos por cenário")
+    parser.add_argument("--mode", choices=["local", "llm"], default="local", help="Cálculo dos benefícios (llm usa um stub)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Arquivo JSON com as medições")
+    parser.add_argument("--verbose", action="store_true", help="Mantém os logs INFO das ferramentas")
+    args = parser.parse_args(argv)
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    results: List[Dict[str, Any]] = []
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory(prefix=f"vrva-bench-{size}-") as workdir:
+            print(f"⏱️ Cenário com {size} funcionários", file=sys.stderr)
+            results.extend(run_size(size, workdir, calculation_mode=args.mode, seed=args.seed))
+
+    print_table(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import os
+import numpy as np
+import pandas as pd
+
+from typing import Dict
+
+# Um sindicato real por estado de BUSINESS_DAYS_BY_STATE, com a distribuição da amostra em data/.
+UNIONS = [
+    ("SINDPPD RS - SINDICATO DOS TRAB. EM PROC. DE DADOS RIO GRANDE DO SUL", 0.63),
+    ("SINDPD SP - SIND.TRAB.EM PROC DADOS E EMPR.EMPRESAS PROC DADOS ESTADO DE SP.", 0.23),
+    ("SITEPD PR - SIND DOS TRAB EM EMPR PRIVADAS DE PROC DE DADOS DE CURITIBA E REGIAO METROPOLITANA", 0.08),
+    ("SINDPD RJ - SINDICATO PROFISSIONAIS DE PROC DADOS DO RIO DE JANEIRO", 0.06),
+]
+
+SITUATIONS = [
+    ("Trabalhando", 0.946),
+    ("Férias", 0.042),
+    ("Licença Maternidade", 0.006),
+    ("Auxílio Doença", 0.005),
+    ("Atestado", 0.001),
+]
+
+POSITIONS = [
+    ("ANALISTA DADOS I", 0.30),
+    ("TECH RECRUITER II", 0.15),
+    ("COORDENADOR ADMINISTRATIVO", 0.15),
+    ("ANALISTA CONTABIL-FISCAL II", 0.20),
+    ("ASSISTENTE DE BPO I", 0.15),
+    ("ESTAGIARIO", 0.02),
+    ("APRENDIZ", 0.02),
+    ("DIRETOR", 0.01),
+]
+
+# Proporções mensais observadas na amostra (sobre o nº de ativos).
+ADMISSION_RATE = 0.045
+DISMISSAL_RATE = 0.03
+VACATION_RATE = 0.045
+ABROAD_RATE = 0.002
+
+FILE_NAMES = {
+    "ativos": "ATIVOS.xlsx",
+    "admissao": "ADMISSÃO_ABRIL.xlsx",
+    "desligados": "DESLIGADOS.xlsx",
+    "ferias": "FÉRIAS.xlsx",
+    "afastamentos": "AFASTAMENTOS.xlsx",
+    "aprendiz": "APRENDIZ.xlsx",
+    "estagio": "ESTÁGIO.xlsx",
+    "exterior": "EXTERIOR.xlsx",
+}
+
+def _choice(rng: np.random.Generator, options, size: int) -> np.ndarray:
+    values, weights = zip(*options)
+    weights = np.asarray(weights) / sum(weights)
+    return rng.choice(np.asarray(values, dtype=object), size=size, p=weights)
+
+def _dates(rng: np.random.Generator, start: str, end: str, size: int) -> pd.Series:
+    days = (pd.Timestamp(end) - pd.Timestamp(start)).days + 1
+    return pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days, size), unit="D")
+
+def generate_payroll(n_employees: int, seed: int = 0) -> Dict[str, pd.DataFrame]:
+    """
+    Gera as planilhas ATIVOS, ADMISSÃO, DESLIGADOS, FÉRIAS e as de exclusão (AFASTAMENTOS,
+    APRENDIZ, ESTÁGIO, EXTERIOR) sintéticas, com as mesmas colunas e distribuições aproximadas
+    dos arquivos de exemplo, para n_employees ativos.
+    """
+    rng = np.random.default_rng(seed)
+    matriculas = np.arange(10_000, 10_000 + n_employees)
+
+    df_actives = pd.DataFrame({
+        "MATRICULA": matriculas,
+        "EMPRESA": 1410,
+        "TITULO DO CARGO": _choice(rng, POSITIONS, n_employees),
+        "DESC. SITUACAO": _choice(rng, SITUATIONS, n_employees),
+        "Sindicato": _choice(rng, UNIONS, n_employees),
+    })
+
+    # Admissões: a maioria já consta nos ativos, uma parte são matrículas novas.
+    n_adm = max(1, int(n_employees * ADMISSION_RATE))
+    n_new = n_adm // 10
+    adm_ids = np.concatenate([
+        rng.choice(matriculas, n_adm - n_new, replace=False),
+        np.arange(matriculas[-1] + 1, matriculas[-1] + 1 + n_new),
+    ])
+    df_admissions = pd.DataFrame({
+        "MATRICULA": adm_ids,
+        "Admissão": _dates(rng, "2025-04-01", "2025-04-30", n_adm),
+        "Cargo": _choice(rng, POSITIONS, n_adm),
+    })
+
+    n_dis = max(1, int(n_employees * DISMISSAL_RATE))
+    df_dismissed = pd.DataFrame({
+        "MATRICULA": rng.choice(matriculas, n_dis, replace=False),
+        "DATA DEMISSÃO": _dates(rng, "2025-05-01", "2025-05-31", n_dis),
+        "COMUNICADO DE DESLIGAMENTO": _choice(rng, [("OK", 0.7), (None, 0.3)], n_dis),
+    })
+
+    n_vac = max(1, int(n_employees * VACATION_RATE))
+    df_vacation = pd.DataFrame({
+        "MATRICULA": rng.choice(matriculas, n_vac, replace=False),
+        "DESC. SITUACAO": "Férias",
+        "DIAS DE FÉRIAS": rng.choice([5, 10, 15, 20, 30], n_vac),
+    })
+
+    # Planilhas de exclusão: listam os ativos afastados, aprendizes e estagiários, como na amostra.
+    situation = df_actives["DESC. SITUACAO"]
+    position = df_actives["TITULO DO CARGO"]
+    df_away = df_actives.loc[situation.isin(["Licença Maternidade", "Auxílio Doença", "Atestado"]), ["MATRICULA", "DESC. SITUACAO"]]
+    df_apprentices = df_actives.loc[position == "APRENDIZ", ["MATRICULA", "TITULO DO CARGO"]]
+    df_interns = df_actives.loc[position == "ESTAGIARIO", ["MATRICULA", "TITULO DO CARGO"]]
+
+    n_abroad = max(1, int(n_employees * ABROAD_RATE))
+    df_abroad = pd.DataFrame({
+        "Cadastro": rng.choice(matriculas, n_abroad, replace=False),
+        "Valor": 554.4,
+    })
+
+    return {
+        "ativos": df_actives,
+        "admissao": df_admissions,
+        "desligados": df_dismissed,
+        "ferias": df_vacation,
+        "afastamentos": df_away.reset_index(drop=True),
+        "aprendiz": df_apprentices.reset_index(drop=True),
+        "estagio": df_interns.reset_index(drop=True),
+        "exterior": df_abroad,
+    }
+
+def write_workbooks(frames: Dict[str, pd.DataFrame], directory: str) -> Dict[str, str]:
+    """Grava as planilhas geradas em directory, com os nomes reconhecidos pela ingestão."""
+    os.makedirs(directory, exist_ok=True)
+    paths = {}
+    for file_type, df in frames.items():
+        path = os.path.join(directory, FILE_NAMES[file_type])
+        df.to_excel(path, index=False)
+        paths[file_type] = path
+    return paths
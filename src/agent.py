@@ -1,22 +1,41 @@
-import re
-import unicodedata
+import os
+import time
+import hashlib
 import sqlite3
+import threading
+import numpy as np
 import pandas as pd
 
-from typing import Dict, Any, List, Optional, Union
-from langchain_openai import ChatOpenAI
-from langchain.schema import HumanMessage
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Any, List, Optional, Tuple, Union
 from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages
 from typing_extensions import Annotated, TypedDict
-from langchain.prompts import PromptTemplate
-
-from src.tools.admission_tool import process_admissions
-from src.tools.actives_tool import process_actives
-from src.tools.dismissed_tool import process_fired
-from src.tools.business_days_tool import process_business_days
-from src.tools.union_value_tool import process_daily_values
-from src.tools.vacation_tool import process_vacation
+
+from src.tools.admission_tool import apply_admissions
+from src.tools.actives_tool import build_actives, process_actives_streaming
+from src.tools.dismissed_tool import apply_fired
+from src.tools.eligibility_tool import apply_eligibility, last_eligible_union
+from src.tools.business_days_tool import apply_business_days
+from src.tools.union_value_tool import apply_daily_values
+from src.tools.vacation_tool import apply_vacation
+from src.tools.benefits_tool import calculate_benefits
+from src.report_archive import ReportArchive
+from src.report_schema import enforce_schema
+from src.report_store import load_report, save_report
+from src.report_writer import formatted_monetary_values, save_excel_report
+from src.file_cache import ExcelCache, excel_cache as default_excel_cache
+from src.incremental import SNAPSHOT_DIR, apply_business_days_incremental
+from src.profiling import PROFILE_SUFFIX, RunProfile, activate, count_rows, profiled
+from src.state_union import UnionStateResolver, resolver_from_bases
+from src.rate_tables import RateTables, load_rate_tables
+from src.base_tables import read_base_tables
+from src.eligibility import EligibilityEngine, default_engine
+from src.db import connection, get_connection, table_exists, write_frame
+from src.business_calendar import competencia_period, format_period
+from src.ingestion import FILE_PATTERNS, load_inputs, normalize_name, resolve_file_type
+from src.sql_executor import execute_updates, split_statements
 from src.logger.logger import logger
 
 # ==============================
@@ -33,36 +52,102 @@ class VRVAState(TypedDict):
     calculations_done: bool
     report_generated: bool
     error: str
+    report: Optional[pd.DataFrame]
+    calculation_audit: Dict[str, int]
+    inputs: Dict[str, pd.DataFrame]
+    output_dir: str
+    report_path: str
+    node_timings: Dict[str, float]
+    node_rows: Dict[str, int]
+    run_profile: List[Dict[str, Any]]
+    profile_path: str
+    incremental_stats: Dict[str, Any]
+    eligibility_hits: Dict[str, int]
 
 # ==============================
 # VRVA AGENT
 # ==============================
+# Modos de cálculo dos benefícios:
+#   - local: calculadora vetorizada determinística (padrão, não requer API Key);
+#   - llm: comandos SQL gerados pelo LLM, com a calculadora local como fallback;
+#   - audit: calculadora local + comparação com o resultado do LLM em uma cópia do report.
+CALCULATION_MODES = ("local", "llm", "audit")
+
+BENEFIT_COLUMNS = ["TOTAL", "CUSTO_EMPRESA", "CUSTO_PROFISSIONAL", "OBS_GERAL"]
+
 class VRVAAgent:
-    def __init__(self, db_path: str, openai_api_key: str):
+    def __init__(
+        self,
+        db_path: Optional[str],
+        openai_api_key: str,
+        persist_steps: bool = False,
+        calculation_mode: str = "local",
+        excel_cache: Optional[ExcelCache] = None,
+        ingestion_workers: Optional[int] = None,
+        stream_actives_batch_size: Optional[int] = None,
+        incremental: bool = False,
+        snapshot_dir: str = SNAPSHOT_DIR,
+        holidays_by_state: Optional[Dict[str, List[Any]]] = None,
+        archive: Optional[ReportArchive] = None,
+        eligibility_engine: Optional[EligibilityEngine] = None
+    ):
         logger.info("🚀 Inicializando VRVA Agent")
 
+        if calculation_mode not in CALCULATION_MODES:
+            raise ValueError(f"Modo de cálculo inválido: '{calculation_mode}'. Use um de {CALCULATION_MODES}.")
+
+        # Banco padrão de build_excel_report; os nós usam sempre o db_path do estado, então a mesma
+        # instância (e o workflow compilado) pode atender várias execuções (ver cached_agent).
         self.db_path = db_path
         self.openai_api_key = openai_api_key
-
+        # Quando ativo, grava a tabela report ao fim de cada etapa (checkpoint/debug).
+        self.persist_steps = persist_steps
+        self.calculation_mode = calculation_mode
+        # Planilhas já interpretadas são reaproveitadas entre etapas e entre execuções.
+        self.excel_cache = excel_cache or default_excel_cache
+        # Número de processos usados na leitura das planilhas (None = um por arquivo, até o nº de CPUs).
+        self.ingestion_workers = ingestion_workers
+        # Quando definido, a planilha de ativos é lida e gravada em lotes desse tamanho (memória limitada).
+        self.stream_actives_batch_size = stream_actives_batch_size
+        # Modo incremental: reaproveita ESTADO/DIAS_UTEIS das matrículas inalteradas desde a última competência.
+        self.incremental = incremental
+        self.snapshot_dir = snapshot_dir
+        # Feriados por estado excluídos da contagem de dias úteis (ver business_calendar.build_holidays_by_state).
+        self.holidays_by_state = holidays_by_state
+        # Histórico colunar (Parquet/Arrow) onde o report e as entradas de cada competência são arquivados.
+        self.archive = archive
+        # Regras de exclusão da base de compra (padrão: DEFAULT_RULES de src.eligibility).
+        self.eligibility_engine = eligibility_engine or default_engine
+
+        # Arquivos de um agente avulso (set_files); agentes compartilhados recebem os de cada execução pelo estado.
         self.files: List[Any] = []
+        self._shared = False
+
+        self.llm = None
+        self._client = None
+        # O agente é compartilhado entre threads (ver cached_agent): o cliente é criado uma vez só.
+        self._client_lock = threading.Lock()
+        if calculation_mode != "local":
+            # Importado só no caminho LLM: langchain_openai responde pela maior parte do tempo de import.
+            from langchain_openai import ChatOpenAI
+            self.llm = ChatOpenAI(
+                temperature=0,
+                api_key=openai_api_key,
+                model="gpt-4",
+                max_tokens=3000,
+                # Tempo limite e novas tentativas ficam a cargo do LLMClient.
+                max_retries=0,
+                verbose=True
+            )
 
-        self.llm = ChatOpenAI(
-            temperature=0,
-            api_key=openai_api_key,
-            model="gpt-4",
-            max_tokens=3000,
-            verbose=True
-        )
-
-        self.calculation_prompt = PromptTemplate(
-            input_variables=["competencia", "table_info", "sample_data"],
-            template="""
+        # Preenchido com str.format: competencia, periodo, table_info e sample_data.
+        self.calculation_prompt = """
                 Você é um especialista em cálculos de benefícios VR/VA (Vale Refeição/Vale Alimentação).
 
                 CONTEXTO:
                 - Competência: {competencia}
                 - Tabela 'report' já contém dados do ETL.
-                - Considere a data de 15/04/2025 a 15/05/2025 para todos os cálculos.
+                - Considere a data de {periodo} para todos os cálculos.
 
                 CÁLCULOS NECESSÁRIOS:
                 1. TOTAL = COALESCE(DIAS_UTEIS,0) * COALESCE(VALOR_DIARIO,0)
@@ -87,7 +172,6 @@ class VRVAAgent:
                 Exemplo de dados:
                 {sample_data}
             """
-        )
 
         self.workflow = self._build_workflow()
 
@@ -99,19 +183,27 @@ class VRVAAgent:
     def _build_workflow(self) -> StateGraph:
         workflow = StateGraph(VRVAState)
 
-        workflow.add_node("process_actives", self.process_actives_node)
-        workflow.add_node("process_admissions", self.process_admissions_node)
-        workflow.add_node("process_fired", self.process_fired_node)
-        workflow.add_node("process_business_days", self.process_business_days_node)
-        workflow.add_node("process_daily_values", self.process_daily_values_node)
-        workflow.add_node("process_vacation_days", self.process_vacation_days_node)
-        workflow.add_node("calculate_benefits", self.calculate_benefits_node)
-        workflow.add_node("generate_report", self.generate_report_node)
+        nodes = {
+            "ingest_files": self.ingest_files_node,
+            "process_actives": self.process_actives_node,
+            "process_admissions": self.process_admissions_node,
+            "process_fired": self.process_fired_node,
+            "apply_eligibility": self.apply_eligibility_node,
+            "process_business_days": self.process_business_days_node,
+            "process_daily_values": self.process_daily_values_node,
+            "process_vacation_days": self.process_vacation_days_node,
+            "calculate_benefits": self.calculate_benefits_node,
+            "generate_report": self.generate_report_node,
+        }
+        for name, node in nodes.items():
+            workflow.add_node(name, self._profiled_node(name, node))
 
-        workflow.set_entry_point("process_actives")
+        workflow.set_entry_point("ingest_files")
+        workflow.add_edge("ingest_files", "process_actives")
         workflow.add_edge("process_actives", "process_admissions")
         workflow.add_edge("process_admissions", "process_fired")
-        workflow.add_edge("process_fired", "process_business_days")
+        workflow.add_edge("process_fired", "apply_eligibility")
+        workflow.add_edge("apply_eligibility", "process_business_days")
         workflow.add_edge("process_business_days", "process_daily_values")
         workflow.add_edge("process_daily_values", "process_vacation_days")
         workflow.add_edge("process_vacation_days", "calculate_benefits")
@@ -120,15 +212,82 @@ class VRVAAgent:
 
         return workflow.compile()
 
+    def _profiled_node(self, name: str, node: Callable[[VRVAState], VRVAState]) -> Callable[[VRVAState], VRVAState]:
+        """
+        Envolve um nó do workflow medindo tempo de parede, CPU, pico de RSS e linhas do report
+        antes/depois. Os helpers decorados com @profiled chamados pelo nó entram no mesmo perfil.
+        """
+        def wrapper(state: VRVAState) -> VRVAState:
+            profile = RunProfile(state.setdefault("run_profile", []))
+            with activate(profile), profile.measure(name, rows_in=self._report_rows(state)) as record:
+                state = node(state)
+                record["rows_out"] = self._report_rows(state)
+
+            state.setdefault("node_timings", {})[name] = round(record["wall_s"], 3)
+            if record["rows_out"] is not None:
+                state.setdefault("node_rows", {})[name] = record["rows_out"]
+
+            # O perfil é gravado ao lado do relatório assim que ele é gerado.
+            if state.get("report_path") and not state.get("profile_path"):
+                self._save_run_profile(state, profile)
+            return state
+        return wrapper
+
+    def _report_rows(self, state: VRVAState) -> Optional[int]:
+        """
+        Linhas do report: do DataFrame em memória ou, quando ele já foi gravado (flush antes das
+        etapas SQL, ativos em lotes), da tabela report no SQLite. None se ainda não há report.
+        """
+        rows = count_rows(state.get("report"))
+        db_path = state.get("db_path")
+        if rows is None and db_path and os.path.exists(db_path):
+            try:
+                with connection(db_path) as conn:
+                    if table_exists(conn, "report"):
+                        rows = conn.execute('SELECT COUNT(*) FROM "report"').fetchone()[0]
+            except sqlite3.Error as e:
+                logger.warning("Não foi possível contar as linhas do report: %s", e)
+        return rows
+
+    def _save_run_profile(self, state: VRVAState, profile: RunProfile):
+        try:
+            path = os.path.splitext(state["report_path"])[0] + PROFILE_SUFFIX
+            state["profile_path"] = profile.save(
+                path,
+                competencia=state.get("competencia"),
+                calculation_mode=self.calculation_mode
+            )
+        except Exception as e:
+            logger.warning("Não foi possível salvar o perfil da execução: %s", e)
+
     # ==============================
     # WORKFLOW NODES
     # ==============================
+    def ingest_files_node(self, state: VRVAState) -> VRVAState:
+        try:
+            files = state.get("files") or []
+            skip_types = ("ativos",) if self.stream_actives_batch_size else ()
+            state["inputs"] = load_inputs(
+                files,
+                cache=self.excel_cache,
+                max_workers=self.ingestion_workers,
+                skip_types=skip_types
+            )
+            state["current_step"] = "Arquivos carregados"
+        except Exception as e:
+            logger.exception("Erro ao carregar arquivos")
+            state["error"] = f"Erro ao carregar arquivos: {e}"
+        return state
+
     def process_actives_node(self, state: VRVAState) -> VRVAState:
         try:
-            df = self._find_and_load_file(state.get("files", None) or self.files, "ativos")
-            if df is None or df.empty:
-                raise ValueError("Arquivo de ativos não encontrado.")
-            process_actives(state["db_path"], df)
+            if self.stream_actives_batch_size:
+                self._process_actives_streaming(state)
+            else:
+                df = self._load_input(state, "ativos")
+                if df is None or df.empty:
+                    raise ValueError("Arquivo de ativos não encontrado.")
+                self._set_report(state, build_actives(df))
             state["processed_files"]["actives"] = True
             state["current_step"] = "Ativos processados"
             logger.info("Ativos processados com sucesso.")
@@ -137,12 +296,32 @@ class VRVAAgent:
             state["error"] = f"Erro ao processar ativos: {e}"
         return state
 
+    def _process_actives_streaming(self, state: VRVAState):
+        """
+        Grava os ativos em lotes direto no SQLite, já sem cargo/situação não elegíveis (os acertos
+        dessas regras seguem em eligibility_hits); as etapas seguintes carregam o report de lá.
+        """
+        file = self._find_file(state.get("files") or [], "ativos")
+        if file is None:
+            raise ValueError("Arquivo de ativos não encontrado.")
+
+        df_keys, state["eligibility_hits"] = process_actives_streaming(
+            state["db_path"], file, self.stream_actives_batch_size, self.eligibility_engine
+        )
+        # Admissões só precisam de MATRICULA/Sindicato dos ativos.
+        state.setdefault("inputs", {})["ativos"] = df_keys
+        state["report"] = None
+
     def process_admissions_node(self, state: VRVAState) -> VRVAState:
         try:
-            df_admissions = self._find_and_load_file(state.get("files", None) or self.files, "admissao")
-            df_actives = self._find_and_load_file(state.get("files", None) or self.files, "ativos")
+            df_admissions = self._load_input(state, "admissao")
+            df_actives = self._load_input(state, "ativos")
             if df_admissions is not None and not df_admissions.empty and df_actives is not None and not df_actives.empty:
-                process_admissions(state["db_path"], df_admissions, df_actives)
+                df = self._get_report(state)
+                self._set_report(state, apply_admissions(
+                    df, df_admissions, df_actives, self._union_resolver(state),
+                    default_union=self._last_eligible_union(state, df)
+                ))
                 state["processed_files"]["admissions"] = True
                 logger.info("Admissões processadas com sucesso.")
             else:
@@ -155,9 +334,10 @@ class VRVAAgent:
 
     def process_fired_node(self, state: VRVAState) -> VRVAState:
         try:
-            df = self._find_and_load_file(state.get("files", None) or self.files, "desligados")
+            df = self._load_input(state, "desligados")
             if df is not None and not df.empty:
-                process_fired(state["db_path"], df)
+                df_report = self._get_report(state)
+                self._set_report(state, apply_fired(df_report, df, self._last_eligible_union(state, df_report)))
                 state["processed_files"]["fired"] = True
                 logger.info("Desligamentos processados com sucesso.")
             else:
@@ -168,9 +348,35 @@ class VRVAAgent:
             state["error"] = f"Erro ao processar desligamentos: {e}"
         return state
 
+    def apply_eligibility_node(self, state: VRVAState) -> VRVAState:
+        try:
+            df, hits = apply_eligibility(self._get_report(state), state.get("inputs"), self.eligibility_engine)
+            # No modo streaming, cargo/situação já foram aplicados lote a lote: os acertos se somam
+            # (linhas removidas nos lotes não contam mais para as regras por planilha).
+            previous = state.get("eligibility_hits") or {}
+            state["eligibility_hits"] = {name: previous.get(name, 0) + count for name, count in hits.items()}
+            self._set_report(state, df)
+            state["processed_files"]["eligibility"] = True
+            state["current_step"] = "Elegibilidade aplicada"
+        except Exception as e:
+            logger.exception("Erro ao aplicar regras de elegibilidade")
+            state["error"] = f"Erro ao aplicar regras de elegibilidade: {e}"
+        return state
+
     def process_business_days_node(self, state: VRVAState) -> VRVAState:
         try:
-            process_business_days(state["db_path"])
+            if self.incremental:
+                df, state["incremental_stats"] = apply_business_days_incremental(
+                    self._get_report(state), state["competencia"], self.snapshot_dir, self.holidays_by_state,
+                    resolver=self._union_resolver(state), rates=self._rate_tables(state)
+                )
+                self._set_report(state, df)
+            else:
+                self._set_report(state, apply_business_days(
+                    self._get_report(state), self.holidays_by_state,
+                    resolver=self._union_resolver(state), rates=self._rate_tables(state),
+                    competencia=state["competencia"]
+                ))
             state["processed_files"]["business_days"] = True
             state["current_step"] = "Dias úteis processados"
             logger.info("Dias úteis processados com sucesso.")
@@ -181,7 +387,7 @@ class VRVAAgent:
 
     def process_daily_values_node(self, state: VRVAState) -> VRVAState:
         try:
-            process_daily_values(state["db_path"])
+            self._set_report(state, apply_daily_values(self._get_report(state), self._rate_tables(state)))
             state["processed_files"]["daily_values"] = True
             state["current_step"] = "Valores diários processados"
             logger.info("Valores diários processados com sucesso.")
@@ -192,9 +398,9 @@ class VRVAAgent:
     
     def process_vacation_days_node(self, state: VRVAState) -> VRVAState:
         try:
-            df = self._find_and_load_file(state.get("files", None) or self.files, "férias")
+            df = self._load_input(state, "férias")
             if df is not None and not df.empty:
-                process_vacation(state["db_path"], df)
+                self._set_report(state, apply_vacation(self._get_report(state), df, state["competencia"], self.holidays_by_state))
                 state["processed_files"]["vacation"] = True
                 logger.info("Ferias processados com sucesso.")
             else:
@@ -207,49 +413,97 @@ class VRVAAgent:
 
     def calculate_benefits_node(self, state: VRVAState) -> VRVAState:
         try:
-            if not self._table_exists(state["db_path"], "report"):
-                raise ValueError("Tabela 'report' não existe. ETL não criou a tabela corretamente.")
-
-            table_info = self._get_table_structure()
-            sample_data = self._get_sample_data()
-
-            prompt = self.calculation_prompt.format(
-                competencia=state["competencia"],
-                table_info=table_info,
-                sample_data=sample_data
-            )
-
-            response = self.llm.invoke([HumanMessage(content=prompt)])
-            sql_commands = self._extract_sql_from_response(response.content)
-
-            if not sql_commands:
-                raise ValueError("LLM não retornou comandos UPDATE válidos.")
-
-            self._execute_sql_commands(state["db_path"], sql_commands)
+            df = self._get_report(state)
+            if self.calculation_mode != "local":
+                # O pedido ao LLM sai antes da calculadora local, que roda enquanto ele responde;
+                # o nó aguarda a resposta no máximo até o prazo (um tempo limite a partir do envio).
+                self._flush_report(state)
+                pending, deadline = self._submit_sql_request(state["competencia"], state["db_path"])
+
+            df_local = calculate_benefits(df, state["competencia"])
+            if self.calculation_mode == "llm":
+                self._calculate_benefits_llm(state, pending, deadline, df_local)
+            else:
+                self._set_report(state, df_local)
+                logger.info("Cálculos locais aplicados com sucesso.")
+                if self.calculation_mode == "audit":
+                    self._audit_benefits_llm(state, pending, deadline)
 
             state["calculations_done"] = True
             state["current_step"] = "Cálculos concluídos"
-            logger.info("Cálculos via LLM aplicados com sucesso.")
         except Exception as e:
-            logger.exception("Erro nos cálculos via LLM")
-            state["error"] = f"Erro nos cálculos via LLM: {e}"
+            logger.exception("Erro nos cálculos dos benefícios")
+            state["error"] = f"Erro nos cálculos dos benefícios: {e}"
         return state
 
+    def _calculate_benefits_llm(self, state: VRVAState, pending: Future, deadline: float, df_local: pd.DataFrame):
+        """
+        Aplica os comandos SQL gerados pelo LLM sobre a tabela report; se o LLM falhar ou não
+        responder até o prazo, usa o resultado da calculadora local, já calculado.
+        """
+        try:
+            sql_commands = self._wait_sql_commands(pending, deadline)
+            self._execute_sql_commands(state["db_path"], sql_commands)
+            logger.info("Cálculos via LLM aplicados com sucesso.")
+        except TimeoutError as e:
+            logger.warning("⏱️ %s Aplicando calculadora local.", e)
+            self._set_report(state, df_local)
+        except Exception:
+            logger.exception("Falha nos cálculos via LLM. Aplicando calculadora local.")
+            self._set_report(state, df_local)
+
+    def _audit_benefits_llm(self, state: VRVAState, pending: Future, deadline: float):
+        """
+        Executa o SQL do LLM sobre uma cópia em memória do report já calculado localmente
+        e registra, por coluna, quantos registros divergem. Falhas do LLM não interrompem o workflow.
+        """
+        try:
+            sql_commands = self._wait_sql_commands(pending, deadline)
+            df_local = self._get_report(state).reset_index(drop=True)
+
+            conn = get_connection(":memory:")
+            try:
+                write_frame(conn, "report", df_local)
+                self._run_sql_commands(conn, sql_commands)
+                df_llm = pd.read_sql("SELECT * FROM report", conn)
+            finally:
+                conn.close()
+
+            audit = {}
+            for col in BENEFIT_COLUMNS:
+                if col not in df_llm.columns:
+                    continue
+                local_values, llm_values = df_local[col], df_llm[col]
+                if pd.api.types.is_numeric_dtype(local_values):
+                    diverges = ~np.isclose(local_values.fillna(0), pd.to_numeric(llm_values, errors="coerce").fillna(0), atol=0.01)
+                else:
+                    diverges = local_values.fillna("").astype(str) != llm_values.fillna("").astype(str)
+                audit[col] = int(diverges.sum())
+
+            state["calculation_audit"] = audit
+            logger.info("Auditoria LLM x cálculo local (registros divergentes por coluna): %s", audit)
+        except Exception:
+            logger.exception("Auditoria via LLM não pôde ser concluída.")
+
     def generate_report_node(self, state: VRVAState) -> VRVAState:
         try:
-            if not self._table_exists(state["db_path"], "report"):
+            if state.get("report") is None and not self._table_exists(state["db_path"], "report"):
                 raise ValueError("Tabela report não existe. Processo ETL falhou.")
 
-            with sqlite3.connect(state["db_path"]) as conn:
-                df_final = pd.read_sql("SELECT * FROM report", conn)              
-
+            df_final = self._get_report(state)
+            self._flush_report(state)
 
             if df_final.empty:
                 raise ValueError("Tabela report está vazia.")
 
             filename = f"VR MENSAL {state['competencia'].replace('-', '.')}.xlsx"
-            self._save_excel_report(df_final, filename, state["competencia"])
+            # Cada execução grava no próprio diretório, para que usuários simultâneos não se sobrescrevam.
+            report_path = os.path.join(state.get("output_dir") or ".", filename)
+            self._save_excel_report(df_final, report_path, state["competencia"])
+            if self.archive is not None:
+                self._archive_run(state, df_final)
 
+            state["report_path"] = report_path
             state["report_generated"] = True
             state["current_step"] = f"Relatório gerado: {filename}"
             logger.info("Relatório gerado com sucesso: %s", filename)
@@ -265,80 +519,27 @@ class VRVAAgent:
         """
         Formata um número float para uma string no formato de moeda brasileira (R$ 1.234,56).
         """
-        us_formatted_value = f"{valor:,.2f}"
-        br_formatted_value = us_formatted_value.replace(",", "TEMP").replace(".", ",")
-        br_formatted_value = br_formatted_value.replace("TEMP", ".")
-        
-        return f"R$ {br_formatted_value}"
+        return formatted_monetary_values(valor)
 
-    def _save_excel_report(self, df: pd.DataFrame, filename: str, competencia: str):
-        df_report = df.copy()
-        df_report.insert(0, "COMPETENCIA", competencia)
-
-        column_mapping = {
-            "COMPETENCIA": "Competência",
-            "MATRICULA": "Matrícula",
-            "SINDICATO": "Sindicato do Colaborador",
-            "ADMISSAO": "Admissão",
-            "DIAS_UTEIS": "Dias",
-            "VALOR_DIARIO": "VALOR DIÁRIO VR",
-            "TOTAL": "TOTAL",
-            "CUSTO_EMPRESA": "Custo empresa",
-            "CUSTO_PROFISSIONAL": "Desconto profissional",
-            "OBS_GERAL": "OBS GERAL",
-        }
-        df_report.rename(columns={k: v for k, v in column_mapping.items() if k in df_report.columns}, inplace=True)
-
-        columns_to_format = [
-            "VALOR DIÁRIO VR",
-            "TOTAL",
-            "Custo empresa",
-            "Desconto profissional"
-        ]
-
-        for col in columns_to_format:
-            if col in df_report.columns:
-                df_report[col] = df_report[col].apply(self.formatted_monetary_values)
-        
-        columns_order = [
-            "Matrícula",
-            "Admissão",
-            "Sindicato do Colaborador",
-            "Competência",
-            "Dias",
-            "VALOR DIÁRIO VR",
-            "TOTAL",
-            "Custo empresa",
-            "Desconto profissional",
-            "OBS GERAL"
-        ]
-                
-        total_company_cost = df.get("CUSTO_EMPRESA", pd.Series([0], dtype=float)).sum()
-        employee_cost = df.get("CUSTO_PROFISSIONAL", pd.Series([0], dtype=float)).sum()
-        total = df.get("TOTAL", pd.Series([0], dtype=float)).sum()
-
-        colunas_finais_existentes = [col for col in columns_order if col in df_report.columns]
-        
-        df_report_complete = df_report[colunas_finais_existentes]
-        
-        summary = {
-            "Total Custo Empresa (R$)": self.formatted_monetary_values(total_company_cost),
-            "Total Colaboradores (R$)": self.formatted_monetary_values(employee_cost),
-            "Total Geral (R$)": self.formatted_monetary_values(total)
-        }
-        
-        df_summary = pd.DataFrame([summary])
+    @profiled("_archive_run")
+    def _archive_run(self, state: VRVAState, df: pd.DataFrame):
+        """Arquiva report e entradas da competência; falhas não impedem a entrega do relatório."""
+        try:
+            self.archive.save_report(df, state["competencia"])
+            self.archive.save_inputs(state.get("inputs"), state["competencia"])
+        except Exception:
+            logger.warning("Não foi possível arquivar a competência %s", state["competencia"], exc_info=True)
 
-        with pd.ExcelWriter(filename, engine="openpyxl") as writer:
-            df_report_complete.to_excel(writer, sheet_name="Relatorio", index=False)
-            df_summary.to_excel(writer, sheet_name="Custos totais", index=False)
+    @profiled("_save_excel_report")
+    def _save_excel_report(self, df: pd.DataFrame, filename: str, competencia: str):
+        save_excel_report(df, filename, competencia)
 
     # ==============================
     # HELPERS (SQL / LLM / FILES)
     # ==============================
-    def _get_table_structure(self) -> str:
+    def _get_table_structure(self, db_path: str) -> str:
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connection(db_path) as conn:
                 cursor = conn.cursor()
                 cursor.execute("PRAGMA table_info(report)")
                 cols = cursor.fetchall()
@@ -349,54 +550,125 @@ class VRVAAgent:
             logger.warning("Tabela report não disponível ao obter estrutura: %s", e)
             return "Tabela report não existe ou inacessível."
 
-    def _get_sample_data(self) -> str:
+    def _get_sample_data(self, db_path: str) -> str:
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connection(db_path) as conn:
                 df = pd.read_sql("SELECT * FROM report LIMIT 3", conn)
             return df.to_string(index=False) if not df.empty else "Nenhum dado encontrado"
         except Exception as e:
             logger.warning("Não foi possível obter amostra da tabela report: %s", e)
             return "Nenhum dado encontrado"
 
-    def _extract_sql_from_response(self, response: str) -> List[str]:
-        text = response.replace("```sql", "").replace("```", "")
+    def _request_sql_commands(self, competencia: str, db_path: Optional[str] = None) -> List[str]:
+        """Monta o prompt de cálculo a partir da tabela report e retorna os UPDATEs gerados pelo LLM."""
+        return self._wait_sql_commands(*self._submit_sql_request(competencia, db_path or self.db_path))
+
+    def _submit_sql_request(self, competencia: str, db_path: str) -> Tuple[Future, float]:
+        """
+        Monta o prompt de cálculo a partir da tabela report e agenda a chamada ao LLM sem bloquear.
+        Retorna o Future da resposta e o prazo (time.monotonic) até o qual vale a pena aguardá-la.
+        """
+        pending: Future = Future()
+        if self.llm is None:
+            pending.set_exception(ValueError("LLM não configurado. Informe a API Key e use o modo 'llm' ou 'audit'."))
+            return pending, time.monotonic()
+
+        client = self._llm_client()
+        try:
+            prompt = self.calculation_prompt.format(
+                competencia=competencia,
+                periodo=format_period(competencia_period(competencia)),
+                table_info=self._get_table_structure(db_path),
+                sample_data=self._get_sample_data(db_path)
+            )
+            pending = client.submit(prompt)
+        except Exception as e:
+            pending.set_exception(e)
+        return pending, time.monotonic() + client.timeout
+
+    @profiled("_wait_sql_commands")
+    def _wait_sql_commands(self, pending: Future, deadline: float) -> List[str]:
+        """
+        UPDATEs da resposta do LLM, aguardando no máximo até o prazo. Esgotado o prazo, a chamada
+        (e suas novas tentativas) segue em segundo plano e a resposta fica no cache para a próxima execução.
+        """
+        try:
+            response = pending.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            if pending.done():
+                raise
+            raise TimeoutError("LLM não respondeu no prazo; a resposta, quando chegar, ficará em cache.") from None
+
+        sql_commands = self._extract_sql_from_response(response)
+        if not sql_commands:
+            raise ValueError("LLM não retornou comandos UPDATE válidos.")
+        return sql_commands
+
+    def _llm_client(self):
+        """Cliente assíncrono do LLM configurado (recriado se self.llm for substituído, ex: por um stub)."""
+        from src.llm_client import LLMClient
+        with self._client_lock:
+            if self._client is None or self._client.llm is not self.llm:
+                self._client = LLMClient(self.llm)
+            return self._client
 
+    def _extract_sql_from_response(self, response: str) -> List[str]:
+        """Comandos UPDATE da resposta; demais comandos são ignorados (a validação ocorre na execução)."""
         commands = []
-        for part in text.split(";"):
-            part = part.strip()
-            if not part:
-                continue
-            up = part.upper()
-            if up.startswith("UPDATE") and "REPORT" in up:
-
-                commands.append(part + ";")
+        for statement in split_statements(response):
+            if statement.lstrip().upper().startswith("UPDATE"):
+                commands.append(statement)
+            else:
+                logger.warning("Comando ignorado na resposta do LLM: %s", statement[:200])
         return commands
 
+    @profiled("_execute_sql_commands")
     def _execute_sql_commands(self, db_path: str, commands: List[str]):
-        with sqlite3.connect(db_path) as conn:
-            cursor = conn.cursor()
-            for cmd in commands:
-                try:
-                    logger.info("Executando SQL: %s", cmd)
-                    cursor.execute(cmd)
-                except Exception as e:
-                    logger.error("Erro ao executar SQL '%s': %s", cmd, e)
-            conn.commit()
+        with connection(db_path) as conn:
+            self._run_sql_commands(conn, commands)
+
+    def _run_sql_commands(self, conn: sqlite3.Connection, commands: List[str]):
+        """Valida e aplica os UPDATEs em uma única transação; qualquer falha desfaz todos e é propagada."""
+        execute_updates(conn, commands, writable=BENEFIT_COLUMNS)
 
     def _normalize_text(self, text: str) -> str:
         """Converte para minúsculas, remove acentos e caracteres não alfanuméricos."""
-        text = unicodedata.normalize('NFD', text).encode('ascii', 'ignore').decode('utf-8')
-        return re.sub(r'[^a-z0-9]', '', text.lower())
-    
-    def _find_and_load_file(self, files_or_state: Optional[Union[List[Any], VRVAState]], file_type: str) -> pd.DataFrame:
-        """Localiza e carrega arquivo com base em padrões, usando nomes normalizados"""
-        patterns = {
-            "ativos": ["ativos", "ativo", "active", "funcionarios"],
-            "admissao": ["admissao", "admission", "admitidos"],
-            "desligados": ["desligados", "deslig", "fired", "demitidos", "demit"],
-            "ferias": ["ferias", "feria", "feri"]
-        }
-
+        return normalize_name(text)
+
+    def _load_input(self, state: VRVAState, file_type: str) -> pd.DataFrame:
+        """Retorna a planilha do tipo pedido já carregada pela etapa de ingestão ou, se ausente, localiza nos arquivos."""
+        inputs = state.get("inputs") or {}
+        df = inputs.get(resolve_file_type(file_type))
+        if df is not None:
+            # Cópia: as ferramentas alteram o DataFrame recebido.
+            return df.copy()
+        return self._find_and_load_file(state.get("files") or [], file_type)
+
+    def _base_tables(self, state: VRVAState):
+        """
+        Planilhas base (valor por estado, dias úteis por sindicato) enviadas na execução ou,
+        na falta delas, as tabelas de mesmo nome já gravadas no banco.
+        """
+        inputs = state.get("inputs") or {}
+        df_values, df_days = inputs.get("base_sindicato_x_valor"), inputs.get("base_dias_uteis")
+        if df_values is None and df_days is None and os.path.exists(state["db_path"]):
+            df_values, df_days = read_base_tables(state["db_path"])
+        return df_values, df_days
+
+    def _last_eligible_union(self, state: VRVAState, df: pd.DataFrame) -> Optional[str]:
+        """Sindicato herdado por admissões/desligados novos: o do último registro que passa nas regras."""
+        return last_eligible_union(df, state.get("inputs"), self.eligibility_engine)
+
+    def _union_resolver(self, state: VRVAState) -> UnionStateResolver:
+        """Resolvedor sindicato -> estado montado a partir das planilhas base (em cache pelo conteúdo)."""
+        return resolver_from_bases(*self._base_tables(state))
+
+    def _rate_tables(self, state: VRVAState) -> RateTables:
+        """Valores diários e dias úteis das planilhas base (em cache pelo conteúdo)."""
+        return load_rate_tables(*self._base_tables(state), resolver=self._union_resolver(state))
+
+    def _find_file(self, files_or_state: Optional[Union[List[Any], VRVAState]], file_type: str) -> Optional[Any]:
+        """Localiza o arquivo do tipo pedido com base em padrões, usando nomes normalizados"""
         files = []
         if isinstance(files_or_state, dict):
             files = files_or_state.get("files", []) or []
@@ -405,8 +677,8 @@ class VRVAAgent:
         else:
             files = self.files
 
-        normalized_type = self._normalize_text(file_type)
-        search_patterns = [self._normalize_text(p) for p in patterns.get(normalized_type, [normalized_type])]
+        normalized_type = resolve_file_type(file_type)
+        search_patterns = [self._normalize_text(p) for p in FILE_PATTERNS.get(normalized_type, [normalized_type])]
 
         for file in files:
             try:
@@ -415,29 +687,59 @@ class VRVAAgent:
 
                 if any(p in normalized_name for p in search_patterns):
                     logger.info(f"✅ Arquivo encontrado para '{file_type}': {original_name}")
-                    try:
-                        df = pd.read_excel(file)
-                        return df
-                    except Exception as e:
-                        logger.error(f"Erro ao ler o arquivo {original_name}: {e}")
-                        return pd.DataFrame()
+                    return file
             except Exception as e:
                 logger.error(f"Erro ao processar o nome de um arquivo: {e}")
         
         logger.warning(f"⚠️ Nenhum arquivo encontrado para o tipo '{file_type}' com os padrões {search_patterns}")
-        return pd.DataFrame()
+        return None
+
+    @profiled("_find_and_load_file")
+    def _find_and_load_file(self, files_or_state: Optional[Union[List[Any], VRVAState]], file_type: str) -> pd.DataFrame:
+        """Localiza e carrega arquivo com base em padrões, usando nomes normalizados"""
+        file = self._find_file(files_or_state, file_type)
+        if file is None:
+            return pd.DataFrame()
+        try:
+            return self.excel_cache.read_excel(file)
+        except Exception as e:
+            logger.error(f"Erro ao ler o arquivo {getattr(file, 'name', str(file))}: {e}")
+            return pd.DataFrame()
+
+    def _get_report(self, state: VRVAState) -> pd.DataFrame:
+        """Retorna o report em memória do estado ou, na ausência dele, carrega do SQLite."""
+        df = state.get("report")
+        if df is None:
+            df = load_report(state["db_path"])
+        return df
+
+    def _set_report(self, state: VRVAState, df: pd.DataFrame):
+        """Atualiza o report em memória (reaplicando o schema) e, no modo checkpoint, grava no SQLite."""
+        df = enforce_schema(df)
+        state["report"] = df
+        if self.persist_steps:
+            save_report(state["db_path"], df)
+
+    def _flush_report(self, state: VRVAState):
+        """Grava o report em memória no SQLite uma única vez, antes das etapas baseadas em SQL."""
+        df = state.get("report")
+        if df is None:
+            return
+        if not self.persist_steps:
+            save_report(state["db_path"], df)
+        state["report"] = None
 
     def set_files(self, files: List[Any]):
-        """Define arquivos para processamento."""
+        """Define arquivos para processamento (apenas em agentes avulsos, não nos de cached_agent)."""
+        if self._shared:
+            raise RuntimeError("Agente compartilhado: informe os arquivos em build_excel_report(..., files=...).")
         self.files = files
         logger.info("Arquivos definidos: %s", [getattr(f, "name", str(f)) for f in files])
 
     def _table_exists(self, db_path: str, table_name: str) -> bool:
         try:
-            with sqlite3.connect(db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table_name,))
-                return cursor.fetchone() is not None
+            with connection(db_path) as conn:
+                return table_exists(conn, table_name)
         except Exception as e:
             logger.error("Erro ao verificar existência de tabela: %s", e)
             return False
@@ -445,20 +747,47 @@ class VRVAAgent:
     # ==============================
     # EXECUÇÃO DO WORKFLOW
     # ==============================
-    def build_excel_report(self, competencia: str) -> bool:
+    def initial_state(
+        self,
+        competencia: str,
+        output_dir: str = ".",
+        db_path: Optional[str] = None,
+        files: Optional[List[Any]] = None
+    ) -> VRVAState:
+        """Estado inicial do workflow (db_path e files substituem os da instância, para agentes compartilhados)"""
+        return VRVAState(
+            messages=[],
+            db_path=db_path or self.db_path,
+            files=list(files if files is not None else self.files),
+            competencia=competencia,
+            current_step="Iniciando",
+            processed_files={},
+            calculations_done=False,
+            report_generated=False,
+            error="",
+            report=None,
+            calculation_audit={},
+            inputs={},
+            output_dir=output_dir,
+            report_path="",
+            node_timings={},
+            node_rows={},
+            run_profile=[],
+            profile_path="",
+            incremental_stats={},
+            eligibility_hits={}
+        )
+
+    def build_excel_report(
+        self,
+        competencia: str,
+        output_dir: str = ".",
+        db_path: Optional[str] = None,
+        files: Optional[List[Any]] = None
+    ) -> bool:
         """Executa o workflow completo"""
         try:
-            initial_state: VRVAState = VRVAState(
-                messages=[],
-                db_path=self.db_path,
-                files=self.files,
-                competencia=competencia,
-                current_step="Iniciando",
-                processed_files={},
-                calculations_done=False,
-                report_generated=False,
-                error=""
-            )
+            initial_state = self.initial_state(competencia, output_dir, db_path, files)
             final_state = self.workflow.invoke(initial_state)
 
             if final_state.get("error"):
@@ -468,4 +797,55 @@ class VRVAAgent:
             return final_state.get("report_generated", False)
         except Exception as e:
             logger.exception("Erro ao executar workflow")
-            return False
\ No newline at end of file
+            return False
+# ==============================
+# AGENTES COMPARTILHADOS
+# ==============================
+MAX_CACHED_AGENTS = 8
+
+_agents: "OrderedDict[tuple, VRVAAgent]" = OrderedDict()
+_agents_lock = threading.Lock()
+
+def cached_agent(
+    openai_api_key: str = "",
+    calculation_mode: str = "local",
+    persist_steps: bool = False,
+    ingestion_workers: Optional[int] = None,
+    stream_actives_batch_size: Optional[int] = None,
+    incremental: bool = False,
+    archive_dir: Optional[str] = None
+) -> VRVAAgent:
+    """
+    Agente (cliente do LLM e workflow LangGraph já compilado) reaproveitado por configuração dentro
+    do processo, inclusive entre threads. Sem db_path nem arquivos próprios: cada execução os informa
+    pelo estado ou por build_excel_report(competencia, output_dir, db_path=..., files=...).
+    A chave do cache guarda apenas o hash da chave da OpenAI.
+    """
+    key = (
+        hashlib.sha256(openai_api_key.encode()).hexdigest(), calculation_mode, persist_steps,
+        ingestion_workers, stream_actives_batch_size, incremental, archive_dir
+    )
+    with _agents_lock:
+        agent = _agents.get(key)
+        if agent is not None:
+            _agents.move_to_end(key)
+            return agent
+
+    # Construído fora do lock (compila o workflow); se outra thread chegar antes, vale o dela.
+    agent = VRVAAgent(
+        None,
+        openai_api_key,
+        persist_steps=persist_steps,
+        calculation_mode=calculation_mode,
+        ingestion_workers=ingestion_workers,
+        stream_actives_batch_size=stream_actives_batch_size,
+        incremental=incremental,
+        archive=ReportArchive(archive_dir) if archive_dir else None
+    )
+    agent._shared = True
+    with _agents_lock:
+        agent = _agents.setdefault(key, agent)
+        _agents.move_to_end(key)
+        while len(_agents) > MAX_CACHED_AGENTS:
+            _agents.popitem(last=False)
+    return agent
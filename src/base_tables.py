@@ -0,0 +1,64 @@
+import pandas as pd
+
+from typing import Optional, Tuple
+
+from src.db import connection, table_names
+from src.utils import strip_accents
+
+def _normalize_header(value) -> str:
+    return strip_accents(str(value)).upper().strip() if pd.notna(value) else ""
+
+def frame_fingerprint(df: Optional[pd.DataFrame]) -> str:
+    """Hash do conteúdo de uma tabela base: caches derivados dela só mudam quando a planilha muda."""
+    if df is None or df.empty:
+        return "-"
+    hashes = pd.util.hash_pandas_object(df.astype(str), index=False).to_numpy()
+    return f"{len(df)}-{int(hashes.sum(dtype='uint64')):016x}"
+
+def _locate_table(df: pd.DataFrame, first_header: str) -> Optional[pd.DataFrame]:
+    """
+    Localiza a tabela cuja primeira coluna de cabeçalho começa com first_header. As planilhas
+    base podem trazer linhas de título antes do cabeçalho (ex: 'BASE DIAS UTEIS DE 15/04 a 15/05').
+    """
+    if df is None or df.empty:
+        return None
+
+    rows = [list(df.columns)] + df.values.tolist()
+    for i, row in enumerate(rows):
+        if _normalize_header(row[0]).startswith(first_header):
+            body = pd.DataFrame(rows[i + 1:], columns=[_normalize_header(c) for c in row])
+            return body.dropna(how="all")
+    return None
+
+def parse_union_values(df: pd.DataFrame) -> pd.DataFrame:
+    """Base_sindicato_x_valor: valor diário do VR por estado -> colunas ESTADO, VALOR."""
+    table = _locate_table(df, "ESTADO")
+    if table is None or table.shape[1] < 2:
+        return pd.DataFrame(columns=["ESTADO", "VALOR"])
+
+    table = table.iloc[:, :2].copy()
+    table.columns = ["ESTADO", "VALOR"]
+    table["ESTADO"] = table["ESTADO"].astype(str).str.strip()
+    table["VALOR"] = pd.to_numeric(table["VALOR"], errors="coerce")
+    return table.dropna(subset=["VALOR"]).reset_index(drop=True)
+
+def parse_union_business_days(df: pd.DataFrame) -> pd.DataFrame:
+    """Base_dias_uteis: dias úteis do período por sindicato -> colunas SINDICATO, DIAS_UTEIS."""
+    table = _locate_table(df, "SINDIC")
+    if table is None or table.shape[1] < 2:
+        return pd.DataFrame(columns=["SINDICATO", "DIAS_UTEIS"])
+
+    table = table.iloc[:, :2].copy()
+    table.columns = ["SINDICATO", "DIAS_UTEIS"]
+    table["SINDICATO"] = table["SINDICATO"].astype(str).str.strip()
+    table["DIAS_UTEIS"] = pd.to_numeric(table["DIAS_UTEIS"], errors="coerce")
+    return table.dropna(subset=["DIAS_UTEIS"]).reset_index(drop=True)
+
+def read_base_tables(db_path: str) -> Tuple[Optional[pd.DataFrame], Optional[pd.DataFrame]]:
+    """Tabelas base_sindicato_x_valor e base_dias_uteis já gravadas no SQLite (None quando ausentes)."""
+    tables = []
+    with connection(db_path) as conn:
+        existing = set(table_names(conn))
+        for name in ("base_sindicato_x_valor", "base_dias_uteis"):
+            tables.append(pd.read_sql(f"SELECT * FROM {name}", conn) if name in existing else None)
+    return tables[0], tables[1]
@@ -0,0 +1,165 @@
+"""
+Processamento em lote de várias competências, sem a interface Streamlit.
+
+Cada subpasta do diretório de entrada contém as planilhas de um mês e tem a competência
+no nome (ex: 05-2025, 05.2025 ou 2025-05). As competências são processadas em paralelo,
+uma por processo, cada uma com seu próprio banco SQLite isolado.
+
+Uso:
+    python -m src.batch entradas/ --output relatorios/ [--workers 8] [--mode local|llm|audit] [--archive historico/]
+"""
+import os
+import re
+import glob
+import time
+import shutil
+import argparse
+import pandas as pd
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.logger.logger import logger
+from src.report_store import load_report
+from src.run_storage import create_run_storage
+from src.utils import parse_competencia
+
+SUMMARY_FILE = "RESUMO CONSOLIDADO.xlsx"
+
+def normalize_competencia(name: str) -> Optional[str]:
+    """Competência MM-AAAA a partir de um nome de pasta (MM-AAAA, MM.AAAA, MM/AAAA ou AAAA-MM)."""
+    match = re.fullmatch(r"\s*(\d{4})\s*[-._]\s*(\d{1,2})\s*", name)
+    if match:
+        name = f"{match.group(2)}-{match.group(1)}"
+    try:
+        month, year = parse_competencia(name.replace("_", "-"))
+    except ValueError:
+        return None
+    return f"{month:02d}-{year}"
+
+def discover_competencias(input_dir: str) -> List[Tuple[str, str]]:
+    """Lista (competência, pasta) das subpastas cujo nome é uma competência, em ordem cronológica."""
+    found = []
+    for name in sorted(os.listdir(input_dir)):
+        path = os.path.join(input_dir, name)
+        competencia = normalize_competencia(name) if os.path.isdir(path) else None
+        if competencia:
+            found.append((competencia, path))
+        elif os.path.isdir(path):
+            logger.warning(f"⚠️ Pasta '{name}' ignorada: nome não é uma competência (ex: 05-2025)")
+    return sorted(found, key=lambda item: parse_competencia(item[0])[::-1])
+
+def run_competencia(
+    competencia: str,
+    input_dir: str,
+    output_dir: str,
+    calculation_mode: str = "local",
+    openai_api_key: str = "",
+    archive_dir: Optional[str] = None
+) -> Dict[str, Any]:
+    """Processa uma competência em um armazenamento isolado e copia o relatório para output_dir."""
+    # Importado aqui: cada processo do pool carrega o agente (e o LangGraph) uma única vez e
+    # reaproveita o workflow compilado em todas as competências que processar.
+    from src.agent import cached_agent
+
+    start = time.perf_counter()
+    result: Dict[str, Any] = {"Competência": competencia, "Status": "erro"}
+    run = create_run_storage("batch", competencia)
+    try:
+        files = sorted(glob.glob(os.path.join(input_dir, "*.xlsx")))
+        if not files:
+            raise ValueError(f"Nenhuma planilha .xlsx em {input_dir}")
+
+        # O paralelismo é entre competências; a leitura das planilhas de cada uma é sequencial.
+        # Cada competência grava a própria partição, então os processos não disputam arquivos.
+        agent = cached_agent(openai_api_key, calculation_mode, ingestion_workers=1, archive_dir=archive_dir)
+        if not agent.build_excel_report(competencia, output_dir=run.directory, db_path=run.db_path, files=files):
+            raise RuntimeError("Workflow não concluído; consulte o log.")
+
+        for name in os.listdir(run.directory):
+            if name.endswith((".xlsx", ".json")):
+                shutil.copy2(run.output_path(name), os.path.join(output_dir, name))
+
+        df = load_report(run.db_path)
+        result.update({
+            "Status": "ok",
+            "Colaboradores": len(df),
+            "Total VR/VA": round(float(df["TOTAL"].sum()), 2),
+            "Custo empresa": round(float(df["CUSTO_EMPRESA"].sum()), 2),
+            "Desconto profissional": round(float(df["CUSTO_PROFISSIONAL"].sum()), 2),
+            "Arquivo": f"VR MENSAL {competencia.replace('-', '.')}.xlsx",
+        })
+    except Exception as e:
+        logger.exception(f"Erro ao processar a competência {competencia}")
+        result["Erro"] = str(e)
+    finally:
+        run.cleanup()
+
+    result["Tempo (s)"] = round(time.perf_counter() - start, 2)
+    return result
+
+def run_batch(
+    input_dir: str,
+    output_dir: str,
+    workers: Optional[int] = None,
+    calculation_mode: str = "local",
+    openai_api_key: str = "",
+    archive_dir: Optional[str] = None
+) -> pd.DataFrame:
+    """Processa todas as competências de input_dir e grava os relatórios e o resumo consolidado em output_dir."""
+    jobs = discover_competencias(input_dir)
+    if not jobs:
+        raise ValueError(f"Nenhuma pasta de competência encontrada em {input_dir}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    logger.info(f"📦 {len(jobs)} competência(s) com {workers} processo(s)")
+
+    results = []
+    if workers <= 1:
+        for competencia, path in jobs:
+            results.append(run_competencia(competencia, path, output_dir, calculation_mode, openai_api_key, archive_dir))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(run_competencia, competencia, path, output_dir, calculation_mode, openai_api_key, archive_dir)
+                for competencia, path in jobs
+            ]
+            for future in as_completed(futures):
+                result = future.result()
+                logger.info(f"✅ {result['Competência']}: {result['Status']} em {result['Tempo (s)']}s")
+                results.append(result)
+
+    df_summary = pd.DataFrame(results)
+    df_summary["_ordem"] = df_summary["Competência"].map(lambda c: parse_competencia(c)[::-1])
+    df_summary = df_summary.sort_values("_ordem").drop(columns="_ordem").reset_index(drop=True)
+    if "Colaboradores" in df_summary.columns:
+        df_summary["Colaboradores"] = df_summary["Colaboradores"].astype("Int64")
+
+    summary_path = os.path.join(output_dir, SUMMARY_FILE)
+    totals = df_summary[df_summary["Status"] == "ok"].select_dtypes("number").drop(columns=["Tempo (s)"], errors="ignore").sum()
+    df_out = pd.concat([df_summary, pd.DataFrame([{"Competência": "TOTAL", **totals.to_dict()}])], ignore_index=True)
+    df_out.to_excel(summary_path, index=False)
+    logger.info(f"📊 Resumo consolidado gravado em {summary_path}")
+    return df_summary
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Gera os relatórios VR/VA de várias competências em lote")
+    parser.add_argument("input_dir", help="Diretório com uma subpasta de planilhas por competência (ex: 05-2025/)")
+    parser.add_argument("--output", default="relatorios", help="Diretório de saída dos relatórios e do resumo")
+    parser.add_argument("--workers", type=int, default=None, help="Nº de processos (padrão: nº de CPUs)")
+    parser.add_argument("--mode", choices=["local", "llm", "audit"], default="local", help="Modo de cálculo dos benefícios")
+    parser.add_argument("--archive", default=None, metavar="DIR", help="Arquiva reports e planilhas de cada competência em Parquet neste diretório")
+    args = parser.parse_args(argv)
+
+    api_key = os.environ.get("OPENAI_API_KEY", "")
+    if args.mode != "local" and not api_key:
+        parser.error("Defina OPENAI_API_KEY para os modos com LLM.")
+
+    df_summary = run_batch(args.input_dir, args.output, args.workers, args.mode, api_key, args.archive)
+    print(df_summary.to_string(index=False))
+    if (df_summary["Status"] != "ok").any():
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
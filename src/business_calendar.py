@@ -0,0 +1,164 @@
+import threading
+import numpy as np
+import pandas as pd
+
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.utils import parse_competencia
+
+# Dia do mês que delimita o período de apuração: do dia 15 do mês anterior ao dia 15 da competência.
+PERIOD_DAY = 15
+MAX_CACHED_CALENDARS = 64
+
+def competencia_period(competencia: str) -> Tuple[pd.Timestamp, pd.Timestamp]:
+    """Período de apuração da competência (ex: 05-2025 -> 15/04/2025 a 15/05/2025)."""
+    month, year = parse_competencia(competencia)
+    end = pd.Timestamp(year=year, month=month, day=PERIOD_DAY)
+    start = end - pd.DateOffset(months=1)
+    return start, end
+
+def format_period(period: Tuple[pd.Timestamp, pd.Timestamp]) -> str:
+    return f"{period[0]:%d/%m/%Y} a {period[1]:%d/%m/%Y}"
+
+def to_days(values) -> np.ndarray:
+    """Converte datas (escalar, lista ou Series) para um array datetime64[D]."""
+    if isinstance(values, (np.ndarray, pd.Series, pd.Index)) and values.dtype.kind == "M" and getattr(values.dtype, "tz", None) is None:
+        # Já são datas sem fuso: basta truncar para dias, sem passar pelo parser do pandas.
+        return np.asarray(values).astype("datetime64[D]")
+    return pd.to_datetime(pd.Series(values), errors="coerce").to_numpy(dtype="datetime64[D]")
+
+def _easter(year: int) -> date:
+    """Domingo de Páscoa (algoritmo de Meeus/Jones/Butcher)."""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month = (h + l - 7 * m + 114) // 31
+    day = (h + l - 7 * m + 114) % 31 + 1
+    return date(year, month, day)
+
+def national_holidays(years: Iterable[int]) -> List[date]:
+    """
+    Feriados nacionais dos anos dados: os de data fixa e a Sexta-feira Santa. Pontos facultativos
+    (Carnaval, Corpus Christi) entram como feriados locais quando a empresa não trabalha neles.
+    """
+    holidays = []
+    for year in years:
+        easter = _easter(year)
+        holidays += [date(year, m, d) for m, d in [(1, 1), (4, 21), (5, 1), (9, 7), (10, 12), (11, 2), (11, 15), (12, 25)]]
+        if year >= 2024:
+            holidays.append(date(year, 11, 20))
+        holidays.append(easter - timedelta(days=2))
+    return sorted(set(holidays))
+
+def build_holidays_by_state(
+    states: Iterable[str],
+    years: Iterable[int],
+    local_holidays: Optional[Dict[str, Iterable]] = None
+) -> Dict[str, List[date]]:
+    """
+    Calendário de feriados por estado: os nacionais dos anos dados mais os estaduais/municipais
+    informados em local_holidays (estado -> datas).
+    """
+    national = national_holidays(years)
+    local_holidays = local_holidays or {}
+    return {
+        state: sorted(set(national) | {pd.Timestamp(d).date() for d in local_holidays.get(state, [])})
+        for state in states
+    }
+
+class BusinessCalendar:
+    """
+    Bitmap de dias úteis (segunda a sexta, menos os feriados) de um intervalo de anos, com a
+    soma prefixada: a contagem de dias úteis de qualquer intervalo custa duas consultas.
+    O intervalo de anos cresce sob demanda quando aparecem datas fora dele. Com holidays=None,
+    os feriados são os nacionais de cada ano do intervalo.
+    """
+
+    def __init__(self, holidays: Optional[np.ndarray], first_year: int = 2000, last_year: int = 2050):
+        self.holidays = holidays
+        # Calendários em cache são compartilhados entre threads: a ampliação do intervalo é serializada.
+        self._lock = threading.Lock()
+        self._build(first_year, last_year)
+
+    def _build(self, first_year: int, last_year: int):
+        self.first_year, self.last_year = first_year, last_year
+        self.origin = np.datetime64(f"{first_year:04d}-01-01", "D")
+        days = np.arange(self.origin, np.datetime64(f"{last_year + 1:04d}-01-01", "D"))
+        holidays = self.holidays
+        if holidays is None:
+            holidays = np.array(national_holidays(range(first_year, last_year + 1)), dtype="datetime64[D]")
+        self.bitmap = np.is_busday(days, holidays=holidays)
+        self.prefix = np.concatenate(([0], np.cumsum(self.bitmap, dtype=np.int64)))
+
+    def _ensure_range(self, first_day: np.datetime64, last_day: np.datetime64) -> Tuple[np.datetime64, np.ndarray]:
+        """Amplia o intervalo se preciso e devolve (origem, soma prefixada) consistentes entre si."""
+        first = int(first_day.astype("datetime64[Y]").astype(int)) + 1970
+        last = int(last_day.astype("datetime64[Y]").astype(int)) + 1970
+        with self._lock:
+            if first < self.first_year or last > self.last_year:
+                self._build(min(first, self.first_year), max(last, self.last_year))
+            return self.origin, self.prefix
+
+    def count(self, starts, ends) -> np.ndarray:
+        """
+        Dias úteis no intervalo fechado [start, end] de cada par. Pares com data ausente ou
+        end < start resultam em 0.
+        """
+        starts = to_days(starts)
+        ends = to_days(ends)
+
+        counts = np.zeros(len(starts), dtype=np.int64)
+        valid = ~np.isnat(starts) & ~np.isnat(ends)
+        valid[valid] = ends[valid] >= starts[valid]
+        if not valid.any():
+            return counts
+
+        all_valid = valid.all()
+        s, e = (starts, ends) if all_valid else (starts[valid], ends[valid])
+        origin, prefix = self._ensure_range(s.min(), e.max())
+        first = (s - origin).view(np.int64)
+        last = (e - origin).view(np.int64)
+        result = prefix[last + 1] - prefix[first]
+        if all_valid:
+            return result
+        counts[valid] = result
+        return counts
+
+_calendars: "OrderedDict[bytes, BusinessCalendar]" = OrderedDict()
+_calendars_lock = threading.Lock()
+
+NATIONAL = b"nacional"
+
+def calendar_for(holidays=None) -> BusinessCalendar:
+    """
+    Calendário (em cache) para o conjunto de feriados dado. None = feriados nacionais
+    (national_holidays), o padrão de quem não informa um calendário por estado; uma lista
+    vazia considera apenas os fins de semana.
+    """
+    if holidays is None:
+        key, days = NATIONAL, None
+    else:
+        days = np.unique(to_days(holidays)) if len(holidays) else np.array([], dtype="datetime64[D]")
+        days = days[~np.isnat(days)]
+        key = days.astype(np.int64).tobytes()
+    with _calendars_lock:
+        calendar = _calendars.get(key)
+        if calendar is not None:
+            _calendars.move_to_end(key)
+            return calendar
+
+    # Montado fora do lock; se outra thread chegar antes, vale o dela.
+    calendar = BusinessCalendar(days)
+    with _calendars_lock:
+        calendar = _calendars.setdefault(key, calendar)
+        _calendars.move_to_end(key)
+        while len(_calendars) > MAX_CACHED_CALENDARS:
+            _calendars.popitem(last=False)
+    return calendar
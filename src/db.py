@@ -0,0 +1,162 @@
+import os
+import sqlite3
+import threading
+import pandas as pd
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Optional
+
+from src.logger.logger import logger
+
+# Configuração aplicada a cada conexão aberta. WAL permite leituras (estatísticas da interface,
+# auditoria) enquanto o workflow grava; com WAL, synchronous=NORMAL só sincroniza o disco nos
+# checkpoints, o que basta para um banco de trabalho recriado a cada execução.
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "temp_store": "MEMORY",
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,  # negativo = KiB (64 MiB de cache de páginas)
+    "busy_timeout": 5000,
+}
+# Colunas indexadas quando presentes: chave dos UPDATEs/junções e filtro das estatísticas.
+INDEXED_COLUMNS = ["MATRICULA", "ESTADO"]
+MAX_POOLED_CONNECTIONS = 32
+
+_pool: "OrderedDict[tuple, sqlite3.Connection]" = OrderedDict()
+_pool_lock = threading.Lock()
+
+def _configure(conn: sqlite3.Connection, db_path: str):
+    for name, value in PRAGMAS.items():
+        if name == "journal_mode" and db_path == ":memory:":
+            continue
+        conn.execute(f"PRAGMA {name}={value}")
+
+def get_connection(db_path: str) -> sqlite3.Connection:
+    """
+    Conexão configurada para o banco, reaproveitada entre as etapas da execução. O pool é
+    separado por processo e por thread (sqlite3 não compartilha conexões entre threads).
+    """
+    key = (os.path.abspath(db_path) if db_path != ":memory:" else db_path, os.getpid(), threading.get_ident())
+    with _pool_lock:
+        conn = _pool.get(key)
+        if conn is not None:
+            _pool.move_to_end(key)
+            return conn
+
+    # Cada conexão é usada só pela thread que a abriu; check_same_thread=False permite apenas
+    # que close_connections a feche a partir de outra thread ao final da execução.
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    _configure(conn, db_path)
+    if db_path == ":memory:":
+        # Bancos em memória não são compartilhados: cada pedido recebe o seu.
+        return conn
+
+    evicted = []
+    with _pool_lock:
+        _pool[key] = conn
+        if len(_pool) > MAX_POOLED_CONNECTIONS:
+            # Primeiro as conexões de threads já encerradas (ex: workers de um lote anterior),
+            # depois as menos usadas recentemente. Todas são fechadas, liberando descritores e mmap.
+            alive = {thread.ident for thread in threading.enumerate()}
+            for old_key in [k for k in _pool if k[1] == os.getpid() and k[2] not in alive]:
+                evicted.append(_pool.pop(old_key))
+        while len(_pool) > MAX_POOLED_CONNECTIONS:
+            evicted.append(_pool.popitem(last=False)[1])
+    for old in evicted:
+        old.close()
+    return conn
+
+@contextmanager
+def connection(db_path: str) -> Iterator[sqlite3.Connection]:
+    """Conexão do pool como contexto: commit ao final, rollback em caso de erro (como `with sqlite3.connect`)."""
+    conn = get_connection(db_path)
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+@contextmanager
+def atomic(conn: sqlite3.Connection, name: str = "vrva_atomic") -> Iterator[sqlite3.Connection]:
+    """
+    Bloco atômico com SAVEPOINT: em erro, desfaz apenas o que foi feito no bloco. Sem transação
+    aberta, o RELEASE final faz o commit; dentro de uma transação do chamador (ex: connection()),
+    o bloco fica aninhado nela e o commit continua sendo do chamador.
+    """
+    savepoint = _quote(name)
+    conn.execute(f"SAVEPOINT {savepoint}")
+    try:
+        yield conn
+    except BaseException:
+        try:
+            conn.execute(f"ROLLBACK TO {savepoint}")
+            conn.execute(f"RELEASE {savepoint}")
+        except sqlite3.OperationalError:
+            # Erros como SQLITE_FULL já desfazem a transação inteira, savepoint incluído.
+            pass
+        raise
+    conn.execute(f"RELEASE {savepoint}")
+
+def close_connections(db_path: Optional[str] = None):
+    """Fecha as conexões do pool (todas ou apenas as do banco dado), antes de remover o arquivo."""
+    path = os.path.abspath(db_path) if db_path else None
+    with _pool_lock:
+        keys = [key for key in _pool if path is None or key[0] == path]
+        connections = [_pool.pop(key) for key in keys]
+    for conn in connections:
+        conn.close()
+
+def table_exists(conn: sqlite3.Connection, table: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)).fetchone() is not None
+
+def table_names(conn: sqlite3.Connection) -> List[str]:
+    return [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+
+def _quote(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+def _column_values(series: pd.Series) -> list:
+    """Valores de uma coluna prontos para o sqlite3: escalares Python, datas como texto e None para ausentes."""
+    if series.dtype.kind == "M":
+        # Mesmo formato gravado pelo pandas.to_sql, usado nas comparações de data do SQL.
+        series = series.dt.strftime("%Y-%m-%d %H:%M:%S")
+    values = series.astype(object)
+    return values.where(values.notna(), None).tolist()
+
+def ensure_indexes(conn: sqlite3.Connection, table: str, columns: Iterable[str] = INDEXED_COLUMNS):
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({_quote(table)})")}
+    for col in columns:
+        if col in existing:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {_quote(f'idx_{table}_{col}'.lower())} ON {_quote(table)} ({_quote(col)})")
+
+def write_frame(conn: sqlite3.Connection, table: str, df: pd.DataFrame, if_exists: str = "replace"):
+    """
+    Grava o DataFrame na tabela de forma atômica (ver atomic): recria a tabela (replace) ou
+    acrescenta (append), insere todas as linhas com executemany e cria os índices de
+    INDEXED_COLUMNS. Uma transação já aberta na conexão não é confirmada aqui.
+    O schema é o mesmo gerado por pandas.to_sql.
+    """
+    if if_exists not in ("replace", "append"):
+        raise ValueError(f"if_exists inválido: '{if_exists}'. Use 'replace' ou 'append'.")
+
+    df = df.reset_index(drop=True)
+    df.columns = [str(c) for c in df.columns]
+    columns = ", ".join(_quote(c) for c in df.columns)
+    placeholders = ", ".join("?" * len(df.columns))
+    rows = list(zip(*(_column_values(df[c]) for c in df.columns)))
+
+    try:
+        with atomic(conn, "write_frame"):
+            if if_exists == "replace":
+                conn.execute(f"DROP TABLE IF EXISTS {_quote(table)}")
+            if not table_exists(conn, table):
+                conn.execute(pd.io.sql.get_schema(df, table, con=conn))
+            if rows:
+                conn.executemany(f"INSERT INTO {_quote(table)} ({columns}) VALUES ({placeholders})", rows)
+            ensure_indexes(conn, table)
+    except Exception:
+        logger.error("Erro ao gravar a tabela %s; transação desfeita", table)
+        raise
@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+from src.report_schema import KEY_COLUMN, normalize_keys
+from src.utils import strip_accents
+
+@dataclass(frozen=True)
+class EligibilityRule:
+    """
+    Regra de exclusão da base de compra. Cada regra é de um dos tipos:
+      - por atributo: `column` do report cujo valor normalizado (maiúsculas, sem acentos)
+        começa com um dos `prefixes` ou é igual a um dos `values`;
+      - por lista: matrículas presentes na planilha `source` (coluna `source_key`), exceto as
+        linhas cuja anotação (qualquer outra coluna de texto) contém um dos `exempt_notes`.
+    """
+    name: str
+    description: str
+    column: Optional[str] = None
+    prefixes: Tuple[str, ...] = ()
+    values: Tuple[str, ...] = ()
+    source: Optional[str] = None
+    source_key: str = KEY_COLUMN
+    exempt_notes: Tuple[str, ...] = ()
+
+DEFAULT_RULES: List[EligibilityRule] = [
+    EligibilityRule("cargo", "Aprendizes, estagiários e diretores (pelo cargo)", column="CARGO",
+                    prefixes=("APRENDIZ", "ESTAGIARIO", "ESTAGIO", "DIRETOR")),
+    EligibilityRule("situacao", "Licença maternidade e auxílio doença (pela situação)", column="SITUACAO",
+                    values=("LICENCA MATERNIDADE", "AUXILIO DOENCA")),
+    EligibilityRule("afastamentos", "Afastados listados na planilha AFASTAMENTOS", source="afastamentos"),
+    EligibilityRule("aprendiz", "Aprendizes listados na planilha APRENDIZ", source="aprendiz"),
+    EligibilityRule("estagio", "Estagiários listados na planilha ESTÁGIO", source="estagio"),
+    # A EXTERIOR anota, em uma coluna sem cabeçalho, quem já voltou (ex: "RETORNOU DO EXTERIOR -
+    # devido o pgto"): essas matrículas seguem com o benefício.
+    EligibilityRule("exterior", "Profissionais ainda no exterior (planilha EXTERIOR)", source="exterior",
+                    source_key="Cadastro", exempt_notes=("RETORNOU", "DEVIDO")),
+]
+
+def _normalize(value) -> str:
+    return strip_accents(str(value)).upper().strip() if pd.notna(value) else ""
+
+def _key_index(values: pd.Series) -> pd.Index:
+    return pd.Index(normalize_keys(values))
+
+@dataclass
+class EligibilityResult:
+    """Resultado da avaliação: máscara das linhas excluídas e quantas linhas cada regra atingiu."""
+    excluded: np.ndarray
+    hits: Dict[str, int] = field(default_factory=dict)
+
+class EligibilityEngine:
+    """
+    Avalia todas as regras de elegibilidade em uma passada sobre o report. Regras por atributo
+    são calculadas uma vez por valor distinto da coluna (categorias) e expandidas pelos códigos;
+    regras por lista são anti-joins da MATRICULA contra o conjunto de matrículas da planilha.
+    """
+
+    def __init__(self, rules: Sequence[EligibilityRule] = DEFAULT_RULES):
+        self.rules = list(rules)
+        for rule in self.rules:
+            if (rule.column is None) == (rule.source is None):
+                raise ValueError(f"Regra '{rule.name}' deve ter exatamente um de column/source.")
+        self._prefixes = {r.name: tuple(_normalize(p) for p in r.prefixes) for r in self.rules}
+        self._values = {r.name: frozenset(_normalize(v) for v in r.values) for r in self.rules}
+        self._notes = {r.name: tuple(_normalize(n) for n in r.exempt_notes) for r in self.rules}
+
+    def attribute_rules(self) -> "EligibilityEngine":
+        """Motor só com as regras por atributo (cargo, situação), que não dependem das planilhas de exclusão."""
+        return EligibilityEngine([rule for rule in self.rules if rule.column is not None])
+
+    def _match_value(self, rule: EligibilityRule, value: str) -> bool:
+        return value.startswith(self._prefixes[rule.name]) or value in self._values[rule.name]
+
+    def _column_mask(self, rule: EligibilityRule, column: pd.Series) -> np.ndarray:
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            codes, uniques = column.cat.codes.to_numpy(), column.cat.categories
+        else:
+            codes, uniques = pd.factorize(column)
+        matches = np.array([self._match_value(rule, _normalize(u)) for u in uniques] + [False], dtype=bool)
+        return matches[codes]
+
+    def _source_mask(self, rule: EligibilityRule, keys: pd.Index, source: Optional[pd.DataFrame]) -> np.ndarray:
+        if source is None or source.empty:
+            return np.zeros(len(keys), dtype=bool)
+        columns = {str(c).strip(): c for c in source.columns}
+        if rule.source_key not in columns:
+            raise KeyError(f"Coluna '{rule.source_key}' ausente na planilha '{rule.source}'.")
+        key_column = columns[rule.source_key]
+        if self._notes[rule.name]:
+            source = source[~self._exempt_rows(rule, source, key_column)]
+        excluded = _key_index(source[key_column].dropna())
+        if (keys.dtype.kind in "iu") != (excluded.dtype.kind in "iu"):
+            return keys.astype(str).isin(excluded.astype(str))
+        return keys.isin(excluded)
+
+    def _exempt_rows(self, rule: EligibilityRule, source: pd.DataFrame, key_column) -> np.ndarray:
+        """Linhas da planilha com anotação de isenção, avaliadas uma vez por texto distinto."""
+        exempt = np.zeros(len(source), dtype=bool)
+        for col in source.columns:
+            if col == key_column or source[col].dtype.kind != "O":
+                continue
+            codes, uniques = pd.factorize(source[col])
+            notes = [_normalize(u) for u in uniques]
+            matches = np.array([any(n in note for n in self._notes[rule.name]) for note in notes] + [False], dtype=bool)
+            exempt |= matches[codes]
+        return exempt
+
+    def evaluate(self, df: pd.DataFrame, sources: Optional[Mapping[str, pd.DataFrame]] = None) -> EligibilityResult:
+        """Máscara de exclusão do report; regras cuja coluna não existe no report são ignoradas."""
+        sources = sources or {}
+        excluded = np.zeros(len(df), dtype=bool)
+        hits = {}
+        keys = _key_index(df[KEY_COLUMN]) if KEY_COLUMN in df.columns else None
+        for rule in self.rules:
+            if rule.column is not None:
+                if rule.column not in df.columns:
+                    continue
+                mask = self._column_mask(rule, df[rule.column])
+            else:
+                if keys is None:
+                    continue
+                mask = self._source_mask(rule, keys, sources.get(rule.source))
+            hits[rule.name] = int(mask.sum())
+            excluded |= mask
+        return EligibilityResult(excluded=excluded, hits=hits)
+
+default_engine = EligibilityEngine()
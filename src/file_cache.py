@@ -0,0 +1,172 @@
+import io
+import os
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+
+from collections import OrderedDict
+from typing import Any, Optional, Union
+
+from src.logger.logger import logger
+from src.utils import data_dir
+
+CACHE_DIR = data_dir("excel", "VRVA_CACHE_DIR")
+MAX_MEMORY_ENTRIES = 32
+MAX_DISK_ENTRIES = 256
+
+def read_file_bytes(file: Any) -> bytes:
+    """Lê o conteúdo bruto de um upload do Streamlit, arquivo aberto ou caminho em disco."""
+    if hasattr(file, "getvalue"):
+        return file.getvalue()
+    if hasattr(file, "read"):
+        position = file.tell() if hasattr(file, "tell") else None
+        data = file.read()
+        if position is not None:
+            file.seek(position)
+        return data
+    with open(file, "rb") as f:
+        return f.read()
+
+def content_hash(data: bytes) -> str:
+    """Hash SHA-256 do conteúdo do arquivo, usado como chave do cache."""
+    return hashlib.sha256(data).hexdigest()
+
+class ExcelCache:
+    """
+    Cache de planilhas já convertidas em DataFrame, indexado pelo hash do conteúdo e pela aba.
+
+    Mantém os DataFrames em memória com descarte LRU e, quando o pyarrow está disponível,
+    persiste cada entrada em Parquet para que novas execuções (ou reruns do Streamlit)
+    só precisem interpretar os arquivos que mudaram.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = CACHE_DIR, max_entries: int = MAX_MEMORY_ENTRIES, max_disk_entries: int = MAX_DISK_ENTRIES):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self._entries: "OrderedDict[str, pd.DataFrame]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def read_excel(self, file: Any, sheet_name: Union[int, str] = 0) -> pd.DataFrame:
+        """Equivalente a pd.read_excel(file, sheet_name), reaproveitando resultados já interpretados."""
+        data = read_file_bytes(file)
+        key = self.key_for(data, sheet_name)
+
+        df = self.get(key)
+        if df is not None:
+            logger.info(f"⚡ Planilha '{getattr(file, 'name', file)}' obtida do cache")
+            return df.copy()
+
+        df = pd.read_excel(io.BytesIO(data), sheet_name=sheet_name)
+        self.put(key, df)
+        return df.copy()
+
+    def key_for(self, data: bytes, sheet_name: Union[int, str] = 0) -> str:
+        """Chave do cache para o conteúdo de um arquivo e uma aba."""
+        return f"{content_hash(data)}-{sheet_name}"
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        """Busca a planilha em memória e depois em disco. Retorna None quando não está em cache."""
+        df = self._get_memory(key)
+        if df is None:
+            df = self._get_disk(key)
+            if df is not None:
+                self._put_memory(key, df)
+
+        if df is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return df
+
+    def put(self, key: str, df: pd.DataFrame):
+        """Armazena a planilha interpretada em memória e, se possível, em disco."""
+        self._put_memory(key, df)
+        self._put_disk(key, df)
+
+    def clear(self):
+        """Descarta as entradas em memória e em disco."""
+        with self._lock:
+            self._entries.clear()
+        if self.cache_dir and os.path.isdir(self.cache_dir):
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".parquet"):
+                    os.remove(os.path.join(self.cache_dir, name))
+
+    # ==============================
+    # MEMÓRIA (LRU)
+    # ==============================
+    def _get_memory(self, key: str) -> Optional[pd.DataFrame]:
+        with self._lock:
+            df = self._entries.get(key)
+            if df is not None:
+                self._entries.move_to_end(key)
+            return df
+
+    def _put_memory(self, key: str, df: pd.DataFrame):
+        with self._lock:
+            self._entries[key] = df
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # ==============================
+    # DISCO (PARQUET)
+    # ==============================
+    def _disk_path(self, key: str) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        return os.path.join(self.cache_dir, f"{key}.parquet")
+
+    def _get_disk(self, key: str) -> Optional[pd.DataFrame]:
+        path = self._disk_path(key)
+        if path is None or not os.path.exists(path):
+            return None
+        try:
+            df = pd.read_parquet(path)
+        except Exception as e:
+            logger.warning(f"Cache em disco ignorado para {path}: {e}")
+            return None
+
+        # O Parquet devolve None em colunas texto; o read_excel usa NaN.
+        for col in df.columns[df.dtypes == object]:
+            df[col] = df[col].where(df[col].notna(), np.nan)
+        os.utime(path)
+        return df
+
+    def _put_disk(self, key: str, df: pd.DataFrame):
+        path = self._disk_path(key)
+        if path is None:
+            return
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+        except ImportError:
+            logger.debug("pyarrow não instalado; cache de planilhas apenas em memória.")
+            return
+        except Exception as e:
+            # Colunas com tipos mistos (ex: texto e número) não são representáveis em Parquet.
+            logger.debug(f"Planilha não persistida no cache em disco: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self._prune_disk()
+
+    def _prune_disk(self):
+        files = [os.path.join(self.cache_dir, f) for f in os.listdir(self.cache_dir) if f.endswith(".parquet")]
+        if len(files) <= self.max_disk_entries:
+            return
+        files.sort(key=os.path.getmtime)
+        for path in files[:len(files) - self.max_disk_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+# Cache compartilhado pelo processo (sobrevive entre execuções do workflow e reruns do Streamlit).
+excel_cache = ExcelCache()
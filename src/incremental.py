@@ -0,0 +1,175 @@
+import os
+import re
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+
+from typing import Dict, List, Optional, Tuple
+
+from src.logger.logger import logger
+from src.state_union import UnionStateResolver, default_resolver
+from src.utils import data_dir, parse_competencia
+from src.rate_tables import RateTables, default_rate_tables
+from src.tools.business_days_tool import apply_business_days, period_of, prepare_business_days_columns
+
+SNAPSHOT_DIR = data_dir("snapshots", "VRVA_SNAPSHOT_DIR")
+# Incrementar quando a regra de cálculo de ESTADO/DIAS_UTEIS mudar, invalidando snapshots antigos.
+SNAPSHOT_VERSION = 3
+
+# Colunas que determinam ESTADO e DIAS_UTEIS de uma matrícula.
+SIGNATURE_COLUMNS = ["MATRICULA", "SINDICATO", "ADMISSAO", "DATA_DEMISSAO", "DIAS_DE_FERIAS"]
+CARRIED_COLUMNS = ["ESTADO", "DIAS_UTEIS"]
+
+def parameters_fingerprint(
+    holidays_by_state: dict = None,
+    resolver: UnionStateResolver = None,
+    rates: RateTables = None
+) -> str:
+    """Hash dos parâmetros globais do cálculo: snapshots só são reaproveitados com o mesmo valor."""
+    params = {
+        "version": SNAPSHOT_VERSION,
+        "unions": (resolver or default_resolver).fingerprint,
+        "rates": (rates or default_rate_tables).fingerprint,
+        "holidays": {k: sorted(str(d) for d in v) for k, v in (holidays_by_state or {}).items()},
+    }
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+
+def row_signatures(df_base: pd.DataFrame, competencia: str = None) -> np.ndarray:
+    """
+    Hash (int64) das colunas de SIGNATURE_COLUMNS de cada linha, após a normalização das datas.
+    Quem trabalha o período inteiro (admitido antes e não desligado até o fim) tem os dias
+    proporcionais iguais em qualquer competência: nesse caso as datas e o período ficam fora
+    do hash e o valor é reaproveitado entre meses. Nos demais casos o período entra no hash.
+    """
+    period_start, period_end = period_of(competencia)
+    df = pd.DataFrame({col: df_base[col] if col in df_base.columns else None for col in SIGNATURE_COLUMNS})
+    df["MATRICULA"] = df["MATRICULA"].astype(str)
+    df["SINDICATO"] = df["SINDICATO"].astype(str)
+
+    admission = pd.to_datetime(df["ADMISSAO"], errors="coerce")
+    dismissed = pd.to_datetime(df["DATA_DEMISSAO"], errors="coerce")
+    whole_period = ~(admission > period_start) & ~(dismissed < period_end)
+    df["ADMISSAO"] = admission.where(~whole_period)
+    df["DATA_DEMISSAO"] = dismissed.where(~whole_period)
+    df["PERIODO"] = np.where(whole_period, "", f"{period_start.date()}:{period_end.date()}")
+    return pd.util.hash_pandas_object(df, index=False).to_numpy().view(np.int64)
+
+def _competencia_key(competencia: str) -> Tuple[int, int]:
+    month, year = parse_competencia(competencia)
+    return year, month
+
+def _snapshot_files(snapshot_dir: str) -> List[Tuple[Tuple[int, int], str, str]]:
+    """Snapshots gravados: ((ano, mês), fingerprint, caminho). Nome: AAAA-MM-<fingerprint>.parquet."""
+    if not os.path.isdir(snapshot_dir):
+        return []
+    files = []
+    for name in os.listdir(snapshot_dir):
+        match = re.fullmatch(r"(\d{4})-(\d{2})-([0-9a-f]+)\.parquet", name)
+        if match:
+            key = (int(match.group(1)), int(match.group(2)))
+            files.append((key, match.group(3), os.path.join(snapshot_dir, name)))
+    return files
+
+def load_snapshot(snapshot_dir: str, competencia: str, fingerprint: str) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+    """
+    Carrega o snapshot com os mesmos parâmetros: o da própria competência (reprocessamento)
+    ou, na falta dele, o da competência anterior mais recente.
+    """
+    current = _competencia_key(competencia)
+    candidates = [(key, path) for key, fp, path in _snapshot_files(snapshot_dir) if fp == fingerprint and key <= current]
+    if not candidates:
+        return None, None
+
+    (year, month), path = max(candidates)
+    try:
+        df = pd.read_parquet(path)
+    except Exception as e:
+        logger.warning(f"Snapshot {path} ignorado: {e}")
+        return None, None
+    return df, f"{month:02d}-{year}"
+
+def save_snapshot(snapshot_dir: str, competencia: str, fingerprint: str, df_base: pd.DataFrame, signatures: np.ndarray):
+    """Substitui o snapshot da competência pelos valores calculados nesta execução."""
+    df = pd.DataFrame({
+        "MATRICULA": df_base["MATRICULA"].astype(str).to_numpy(),
+        "SIGNATURE": signatures,
+        "ESTADO": df_base["ESTADO"].astype(object).where(df_base["ESTADO"].notna(), None).to_numpy(),
+        "DIAS_UTEIS": df_base["DIAS_UTEIS"].to_numpy(),
+    })
+
+    year, month = _competencia_key(competencia)
+    path = os.path.join(snapshot_dir, f"{year:04d}-{month:02d}-{fingerprint}.parquet")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(snapshot_dir, exist_ok=True)
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    except ImportError:
+        logger.warning("pyarrow não instalado; snapshot do modo incremental não gravado.")
+        return
+    except Exception as e:
+        logger.warning(f"Não foi possível gravar o snapshot da competência {competencia}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return
+
+    # Um snapshot por competência: versões com outros parâmetros são descartadas.
+    for key, fp, other in _snapshot_files(snapshot_dir):
+        if key == (year, month) and fp != fingerprint:
+            os.remove(other)
+    logger.info(f"💾 Snapshot da competência {competencia} gravado com {len(df)} matrículas")
+
+def apply_business_days_incremental(
+    df_base: pd.DataFrame,
+    competencia: str,
+    snapshot_dir: str = SNAPSHOT_DIR,
+    holidays_by_state: dict = None,
+    resolver: UnionStateResolver = None,
+    rates: RateTables = None
+) -> Tuple[pd.DataFrame, Dict[str, object]]:
+    """
+    Calcula ESTADO e DIAS_UTEIS apenas para as matrículas novas ou cujas entradas mudaram
+    (sindicato, admissão, demissão, férias) em relação ao snapshot da execução anterior;
+    as demais herdam os valores do snapshot. Ao final grava o snapshot desta competência.
+    """
+    prepare_business_days_columns(df_base)
+    fingerprint = parameters_fingerprint(holidays_by_state, resolver, rates)
+    signatures = row_signatures(df_base, competencia)
+
+    df_previous, previous_competencia = load_snapshot(snapshot_dir, competencia, fingerprint)
+
+    changed = np.ones(len(df_base), dtype=bool)
+    has_previous = df_previous is not None and not df_previous.empty
+    if has_previous:
+        df_previous = df_previous.drop_duplicates("MATRICULA", keep="last")
+        positions = pd.Index(df_previous["MATRICULA"]).get_indexer(df_base["MATRICULA"].astype(str))
+        found = positions >= 0
+        changed[found] = df_previous["SIGNATURE"].to_numpy()[positions[found]] != signatures[found]
+        changed[~found] = True
+
+        reused = ~changed
+        df_base["ESTADO"] = df_base["ESTADO"].astype(object) if "ESTADO" in df_base.columns else None
+        if "DIAS_UTEIS" not in df_base.columns:
+            df_base["DIAS_UTEIS"] = 0
+        for col in CARRIED_COLUMNS:
+            df_base.loc[reused, col] = df_previous[col].to_numpy()[positions[reused]]
+
+    df_base = apply_business_days(
+        df_base, holidays_by_state, rows=changed if has_previous else None,
+        resolver=resolver, rates=rates, competencia=competencia
+    )
+    df_base["DIAS_UTEIS"] = df_base["DIAS_UTEIS"].astype(int)
+
+    save_snapshot(snapshot_dir, competencia, fingerprint, df_base, signatures)
+
+    stats = {
+        "previous_competencia": previous_competencia,
+        "reused": int((~changed).sum()),
+        "recomputed": int(changed.sum()),
+    }
+    logger.info(
+        f"♻️ Incremental: {stats['reused']} matrículas reaproveitadas de {previous_competencia or '-'}, "
+        f"{stats['recomputed']} recalculadas"
+    )
+    return df_base, stats
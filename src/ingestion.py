@@ -0,0 +1,143 @@
+import io
+import os
+import re
+import unicodedata
+import pandas as pd
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.file_cache import ExcelCache, excel_cache as default_excel_cache, read_file_bytes
+from src.logger.logger import logger
+
+# Tipos de arquivo de entrada e os padrões (normalizados) procurados no nome do arquivo.
+# A ordem importa: o primeiro tipo cujo padrão aparece no nome é o escolhido.
+FILE_PATTERNS: Dict[str, List[str]] = {
+    "ativos": ["ativos", "ativo", "active", "funcionarios"],
+    "admissao": ["admissao", "admission", "admitidos"],
+    "desligados": ["desligados", "deslig", "fired", "demitidos", "demit"],
+    "ferias": ["ferias", "feria", "feri"],
+    "afastamentos": ["afastamentos", "afastamento", "afast"],
+    "aprendiz": ["aprendiz"],
+    "estagio": ["estagio", "estagiario"],
+    "exterior": ["exterior"],
+    "base_dias_uteis": ["diasuteis", "dias"],
+    "base_sindicato_x_valor": ["sindicato", "valor"],
+}
+
+def normalize_name(text: str) -> str:
+    """Converte para minúsculas, remove acentos e caracteres não alfanuméricos."""
+    text = unicodedata.normalize('NFD', text).encode('ascii', 'ignore').decode('utf-8')
+    return re.sub(r'[^a-z0-9]', '', text.lower())
+
+def resolve_file_type(file_type: str) -> str:
+    """Converte um nome de tipo informado livremente (ex: 'férias') na chave de FILE_PATTERNS."""
+    normalized = normalize_name(file_type)
+    for key in FILE_PATTERNS:
+        if normalize_name(key) == normalized:
+            return key
+    return normalized
+
+def file_display_name(file: Any) -> str:
+    """Nome do arquivo (upload do Streamlit) ou o próprio caminho."""
+    return getattr(file, "name", str(file))
+
+def classify_file(name: str) -> Optional[str]:
+    """Identifica o tipo de um arquivo de entrada pelo nome, ou None se não reconhecido."""
+    # Apenas o nome do arquivo, sem diretórios, para que pastas não influenciem a classificação.
+    normalized = normalize_name(os.path.basename(name))
+    for file_type, patterns in FILE_PATTERNS.items():
+        if any(normalize_name(p) in normalized for p in patterns):
+            return file_type
+    return None
+
+def _parse_excel(data: bytes) -> pd.DataFrame:
+    """Interpreta o conteúdo de uma planilha. Executado nos processos do pool."""
+    return pd.read_excel(io.BytesIO(data))
+
+def _parse_serial(pending: List[Tuple[str, bytes]]) -> Dict[str, pd.DataFrame]:
+    parsed = {}
+    for file_type, data in pending:
+        try:
+            parsed[file_type] = _parse_excel(data)
+        except Exception as e:
+            logger.error(f"Erro ao ler a planilha de '{file_type}': {e}")
+    return parsed
+
+def _parse_all(pending: List[Tuple[str, bytes]], max_workers: int) -> Dict[str, pd.DataFrame]:
+    """Interpreta as planilhas pendentes, em paralelo quando há mais de uma e mais de um worker."""
+    if max_workers <= 1 or len(pending) <= 1:
+        return _parse_serial(pending)
+
+    parsed = {}
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = {file_type: pool.submit(_parse_excel, data) for file_type, data in pending}
+            for file_type, future in futures.items():
+                try:
+                    parsed[file_type] = future.result()
+                except BrokenProcessPool:
+                    raise
+                except Exception as e:
+                    logger.error(f"Erro ao ler a planilha de '{file_type}': {e}")
+    except (BrokenProcessPool, OSError) as e:
+        logger.warning(f"Pool de processos indisponível ({e}). Lendo planilhas sequencialmente.")
+        return _parse_serial(pending)
+    return parsed
+
+def load_inputs(
+    files: List[Any],
+    cache: Optional[ExcelCache] = None,
+    max_workers: Optional[int] = None,
+    skip_types: Tuple[str, ...] = ()
+) -> Dict[str, pd.DataFrame]:
+    """
+    Classifica todos os arquivos enviados e devolve um DataFrame por tipo de entrada.
+    Tipos em skip_types não são lidos aqui (ex: ativos no modo streaming).
+
+    Planilhas já presentes no cache não são relidas; as demais são interpretadas em paralelo
+    em um ProcessPoolExecutor (o openpyxl mantém o GIL, então threads não ajudariam).
+    """
+    cache = cache or default_excel_cache
+
+    inputs: Dict[str, pd.DataFrame] = {}
+    pending: List[Tuple[str, bytes]] = []
+    keys: Dict[str, str] = {}
+
+    for file in files:
+        name = file_display_name(file)
+        file_type = classify_file(name)
+        if file_type is None:
+            logger.warning(f"⚠️ Arquivo '{name}' não corresponde a nenhum tipo conhecido. Ignorado.")
+            continue
+        if file_type in skip_types:
+            continue
+        if file_type in inputs or file_type in keys:
+            logger.warning(f"⚠️ Mais de um arquivo para '{file_type}'. Ignorando '{name}'.")
+            continue
+
+        try:
+            data = read_file_bytes(file)
+        except Exception as e:
+            logger.error(f"Erro ao ler o arquivo {name}: {e}")
+            continue
+
+        key = cache.key_for(data)
+        df = cache.get(key)
+        if df is not None:
+            inputs[file_type] = df
+            logger.info(f"⚡ '{name}' ({file_type}) obtido do cache")
+        else:
+            keys[file_type] = key
+            pending.append((file_type, data))
+
+    if pending:
+        workers = max_workers or min(len(pending), os.cpu_count() or 1)
+        logger.info(f"📥 Lendo {len(pending)} planilha(s) com {workers} processo(s)")
+        for file_type, df in _parse_all(pending, workers).items():
+            cache.put(keys[file_type], df)
+            inputs[file_type] = df
+
+    logger.info(f"✅ Entradas carregadas: {sorted(inputs)}")
+    return inputs
@@ -0,0 +1,183 @@
+import os
+import time
+import asyncio
+import hashlib
+import threading
+
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Dict, Optional, Tuple
+
+from src.logger.logger import logger
+
+LLM_TIMEOUT_SECONDS = float(os.environ.get("VRVA_LLM_TIMEOUT", 45))
+LLM_MAX_CONCURRENCY = 4
+LLM_RETRIES = 1
+CACHE_TTL_SECONDS = 6 * 60 * 60
+MAX_CACHED_RESPONSES = 256
+
+SLOT_POLL_SECONDS = 0.05
+
+# Vagas de chamadas simultâneas ao LLM no processo inteiro (todos os nós, threads e sessões).
+llm_slots = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_pid: Optional[int] = None
+_loop_lock = threading.Lock()
+# Chamadas em andamento por hash do prompt: pedidos idênticos simultâneos compartilham a mesma chamada.
+_inflight: Dict[str, "Future[str]"] = {}
+_inflight_lock = threading.RLock()
+
+class LLMTimeoutError(TimeoutError):
+    """O LLM não respondeu dentro do tempo limite em nenhuma das tentativas."""
+
+class ResponseCache:
+    """
+    Respostas do LLM indexadas pelo hash do prompt, com validade (TTL) e descarte LRU.
+    Compartilhado entre execuções: reprocessar a mesma competência com o mesmo report
+    reaproveita a resposta sem nova chamada ao modelo.
+    """
+
+    def __init__(self, ttl_seconds: float = CACHE_TTL_SECONDS, max_entries: int = MAX_CACHED_RESPONSES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, content = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return content
+
+    def put(self, key: str, content: str):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, content)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+response_cache = ResponseCache()
+
+def _model_name(llm: Any) -> str:
+    return str(getattr(llm, "model_name", None) or getattr(llm, "model", None) or type(llm).__name__)
+
+def prompt_key(prompt: str, model: str = "") -> str:
+    return hashlib.sha256(f"{model}\n{prompt}".encode("utf-8")).hexdigest()
+
+def background_loop() -> asyncio.AbstractEventLoop:
+    """
+    Event loop único do processo, em uma thread daemon, onde rodam todas as chamadas ao LLM.
+    Recriado após um fork (processos do lote e do serviço), pois a thread não é herdada.
+    """
+    global _loop, _loop_pid
+    with _loop_lock:
+        if _loop is None or _loop_pid != os.getpid():
+            _loop = asyncio.new_event_loop()
+            _loop_pid = os.getpid()
+            _inflight.clear()
+            threading.Thread(target=_loop.run_forever, name="vrva-llm-loop", daemon=True).start()
+        return _loop
+
+class LLMClient:
+    """
+    Camada assíncrona sobre o modelo de chat (ainvoke): cache de respostas por hash do prompt,
+    concorrência limitada no processo, tempo limite por tentativa e um número fixo de novas tentativas.
+    As chamadas rodam no loop do processo (background_loop); submit devolve um Future, de modo que
+    o workflow segue trabalhando e só aguarda a resposta até o prazo que escolher.
+    """
+
+    def __init__(
+        self,
+        llm: Any,
+        timeout: float = LLM_TIMEOUT_SECONDS,
+        retries: int = LLM_RETRIES,
+        cache: Optional[ResponseCache] = response_cache,
+        slots: threading.BoundedSemaphore = llm_slots
+    ):
+        self.llm = llm
+        self.timeout = timeout
+        self.retries = retries
+        self.cache = cache
+        self.slots = slots
+        self.model = _model_name(llm)
+
+    async def _acquire_slot(self):
+        # Semáforo de threads aguardado sem bloquear o loop; cancelar a espera não consome vaga.
+        while not self.slots.acquire(blocking=False):
+            await asyncio.sleep(SLOT_POLL_SECONDS)
+
+    async def _ainvoke(self, prompt: str) -> str:
+        from langchain_core.messages import HumanMessage
+        messages = [HumanMessage(content=prompt)]
+        if hasattr(self.llm, "ainvoke"):
+            response = await self.llm.ainvoke(messages)
+        else:
+            # Modelos apenas síncronos (ex: stubs) rodam em uma thread para não bloquear o loop.
+            response = await asyncio.to_thread(self.llm.invoke, messages)
+        return response.content
+
+    async def acomplete(self, prompt: str) -> str:
+        """Resposta do LLM para o prompt, do cache quando disponível."""
+        key = prompt_key(prompt, self.model)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                logger.info("⚡ Resposta do LLM obtida do cache (%s)", key[:12])
+                return cached
+
+        last_error: Optional[BaseException] = None
+        await self._acquire_slot()
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    content = await asyncio.wait_for(self._ainvoke(prompt), timeout=self.timeout)
+                    break
+                except asyncio.TimeoutError:
+                    last_error = LLMTimeoutError(f"LLM não respondeu em {self.timeout:g}s")
+                except Exception as e:
+                    last_error = e
+                logger.warning("Tentativa %d/%d do LLM falhou: %s", attempt + 1, self.retries + 1, last_error)
+            else:
+                raise last_error
+        finally:
+            self.slots.release()
+
+        if self.cache is not None:
+            self.cache.put(key, content)
+        return content
+
+    def submit(self, prompt: str) -> "Future[str]":
+        """
+        Agenda a chamada no loop do processo e retorna imediatamente. Pedidos com o mesmo prompt
+        feitos enquanto a chamada está em andamento (outro nó, outra thread ou sessão) recebem o
+        mesmo Future: uma única chamada ao modelo atende a todos.
+        """
+        key = prompt_key(prompt, self.model)
+        with _inflight_lock:
+            future = _inflight.get(key)
+            if future is None:
+                future = asyncio.run_coroutine_threadsafe(self.acomplete(prompt), background_loop())
+                _inflight[key] = future
+                future.add_done_callback(lambda done: _forget(key, done))
+            else:
+                logger.info("🔗 Pedido ao LLM agrupado com uma chamada em andamento (%s)", key[:12])
+        return future
+
+    def complete(self, prompt: str) -> str:
+        return self.submit(prompt).result()
+
+def _forget(key: str, future: "Future[str]"):
+    with _inflight_lock:
+        if _inflight.get(key) is future:
+            del _inflight[key]
@@ -0,0 +1,106 @@
+import json
+import time
+import functools
+import pandas as pd
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from src.logger.logger import logger
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROFILE_SUFFIX = ".profile.json"
+
+def peak_rss_mb() -> Optional[float]:
+    """Pico de memória residente (RSS) do processo até o momento, em MB."""
+    if resource is None:
+        return None
+    # No Linux ru_maxrss é informado em KB.
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def count_rows(value: Any) -> Optional[int]:
+    """Nº de linhas quando o valor é um DataFrame; None nos demais casos."""
+    return len(value) if isinstance(value, pd.DataFrame) else None
+
+class RunProfile:
+    """
+    Perfil de uma execução do workflow: uma entrada por nó ou helper medido, com tempo de
+    parede, tempo de CPU, pico de RSS do processo ao fim da etapa e linhas de entrada/saída.
+    """
+
+    def __init__(self, records: Optional[List[Dict[str, Any]]] = None):
+        self.records: List[Dict[str, Any]] = records if records is not None else []
+
+    @contextmanager
+    def measure(self, name: str, kind: str = "node", rows_in: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Mede o bloco; quem chama pode preencher record['rows_out'] antes de sair."""
+        record: Dict[str, Any] = {"name": name, "kind": kind, "rows_in": rows_in, "rows_out": None}
+        rss_before = peak_rss_mb()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record["wall_s"] = round(time.perf_counter() - wall_start, 4)
+            record["cpu_s"] = round(time.process_time() - cpu_start, 4)
+            record["peak_rss_mb"] = peak_rss_mb()
+            if rss_before is not None:
+                record["rss_growth_mb"] = round(record["peak_rss_mb"] - rss_before, 1)
+            self.records.append(record)
+            logger.info(f"📈 perfil {json.dumps(record, ensure_ascii=False)}")
+
+    def to_dict(self, **metadata: Any) -> Dict[str, Any]:
+        nodes = [r for r in self.records if r["kind"] == "node"]
+        return {
+            **metadata,
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "total_wall_s": round(sum(r["wall_s"] for r in nodes), 4),
+            "total_cpu_s": round(sum(r["cpu_s"] for r in nodes), 4),
+            "peak_rss_mb": peak_rss_mb(),
+            "records": self.records,
+        }
+
+    def save(self, path: str, **metadata: Any) -> str:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(**metadata), f, ensure_ascii=False, indent=2)
+        logger.info(f"📈 Perfil da execução salvo em {path}")
+        return path
+
+_current_profile: ContextVar[Optional[RunProfile]] = ContextVar("vrva_run_profile", default=None)
+
+def current_profile() -> Optional[RunProfile]:
+    return _current_profile.get()
+
+@contextmanager
+def activate(profile: RunProfile) -> Iterator[RunProfile]:
+    """Torna o perfil ativo para os helpers decorados com @profiled executados no bloco."""
+    token = _current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _current_profile.reset(token)
+
+def profiled(name: str) -> Callable:
+    """
+    Decorador para helpers: registra a chamada no perfil ativo (se houver). As linhas de entrada
+    são as do primeiro DataFrame recebido e as de saída, as do DataFrame retornado.
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profile = current_profile()
+            if profile is None:
+                return func(*args, **kwargs)
+
+            rows_in = next((count_rows(a) for a in (*args, *kwargs.values()) if isinstance(a, pd.DataFrame)), None)
+            with profile.measure(name, kind="helper", rows_in=rows_in) as record:
+                result = func(*args, **kwargs)
+                record["rows_out"] = count_rows(result)
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,143 @@
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from src.logger.logger import logger
+from src.base_tables import frame_fingerprint, parse_union_business_days, parse_union_values
+from src.state_union import UnionStateResolver, default_resolver, normalize_union
+
+# Valores usados quando as planilhas base não são enviadas (ou não trazem o estado/sindicato).
+DEFAULT_DAILY_VALUE_BY_STATE = {
+    "Paraná": 35.0,
+    "Rio de Janeiro": 35.0,
+    "Rio Grande do Sul": 35.0,
+    "São Paulo": 37.5
+}
+
+DEFAULT_BUSINESS_DAYS_BY_STATE = {
+    "São Paulo": 22,
+    "Rio de Janeiro": 21,
+    "Rio Grande do Sul": 21,
+    "Paraná": 22
+}
+
+MAX_CACHED_TABLES = 16
+
+def _lookup(table: pd.Series, keys: np.ndarray) -> np.ndarray:
+    """Busca vetorizada pelo índice da tabela; chaves ausentes resultam em NaN."""
+    if table.empty:
+        return np.full(len(keys), np.nan)
+    positions = table.index.get_indexer(keys)
+    values = table.to_numpy(dtype=float)[positions]
+    values[positions < 0] = np.nan
+    return values
+
+def _union_keys(unions: pd.Series) -> np.ndarray:
+    """Nome normalizado de cada sindicato, calculado uma vez por valor distinto."""
+    codes, uniques = pd.factorize(unions)
+    keys = np.array([normalize_union(u).strip() if isinstance(u, str) else None for u in uniques] + [None], dtype=object)
+    return keys[codes]
+
+@dataclass(frozen=True)
+class RateTables:
+    """
+    Tabelas de parâmetros do cálculo indexadas para junções vetorizadas:
+      - daily_value_by_state: valor diário do VR por estado (Base_sindicato_x_valor);
+      - business_days_by_union: dias úteis do período por sindicato (Base_dias_uteis);
+      - business_days_by_state: dias úteis por estado, para sindicatos fora da tabela.
+
+    As planilhas base descrevem um único período (o da Base_dias_uteis enviada), sem coluna de
+    competência: as tabelas valem para a competência em processamento e não variam com ela.
+    """
+    daily_value_by_state: pd.Series
+    business_days_by_union: pd.Series
+    business_days_by_state: pd.Series
+    fingerprint: str
+
+    def daily_values(self, states: pd.Series) -> np.ndarray:
+        """VALOR_DIARIO de cada linha pelo ESTADO (0 quando o estado não tem valor)."""
+        return np.nan_to_num(_lookup(self.daily_value_by_state, states.to_numpy()), nan=0.0)
+
+    def business_days(self, unions: pd.Series, states: pd.Series) -> np.ndarray:
+        """Dias úteis cheios de cada linha: pelo SINDICATO e, na falta dele, pelo ESTADO (0 se nenhum)."""
+        days = _lookup(self.business_days_by_union, _union_keys(unions))
+        missing = np.isnan(days)
+        if missing.any():
+            days[missing] = _lookup(self.business_days_by_state, states.to_numpy()[missing])
+        return np.nan_to_num(days, nan=0.0)
+
+def _build_rate_tables(
+    values: pd.DataFrame,
+    days: pd.DataFrame,
+    resolver: UnionStateResolver
+) -> RateTables:
+    daily = pd.Series(DEFAULT_DAILY_VALUE_BY_STATE, dtype=float)
+    if not values.empty:
+        daily = values.groupby("ESTADO", sort=False)["VALOR"].last().combine_first(daily)
+
+    by_state = pd.Series(DEFAULT_BUSINESS_DAYS_BY_STATE, dtype=float)
+    by_union = pd.Series(dtype=float)
+    if not days.empty:
+        by_union = pd.Series(days["DIAS_UTEIS"].to_numpy(dtype=float), index=_union_keys(days["SINDICATO"]))
+        by_union = by_union[~by_union.index.duplicated(keep="last")]
+        states = resolver.resolve_series(days["SINDICATO"])
+        by_state = days["DIAS_UTEIS"].astype(float).groupby(states.to_numpy(), sort=False).last().combine_first(by_state)
+
+    description = repr((
+        resolver.fingerprint,
+        sorted(daily.items()), sorted(by_union.items()), sorted(by_state.items())
+    ))
+    return RateTables(
+        daily_value_by_state=daily,
+        business_days_by_union=by_union,
+        business_days_by_state=by_state,
+        fingerprint=hashlib.sha256(description.encode()).hexdigest()[:16]
+    )
+
+default_rate_tables = _build_rate_tables(
+    parse_union_values(None), parse_union_business_days(None), default_resolver
+)
+
+_tables: "OrderedDict[tuple, RateTables]" = OrderedDict()
+_tables_lock = threading.Lock()
+
+def load_rate_tables(
+    df_union_values: Optional[pd.DataFrame] = None,
+    df_business_days: Optional[pd.DataFrame] = None,
+    resolver: Optional[UnionStateResolver] = None
+) -> RateTables:
+    """
+    Monta as tabelas de valores diários e dias úteis a partir das planilhas base, completando
+    com os valores padrão. O resultado fica em cache pelo conteúdo das planilhas (e do
+    resolvedor): só é reconstruído quando as bases mudam. As bases cobrem um período fixo,
+    o da planilha enviada; por isso a competência não faz parte da chave.
+    """
+    values = parse_union_values(df_union_values)
+    days = parse_union_business_days(df_business_days)
+    if values.empty and days.empty:
+        return default_rate_tables
+
+    resolver = resolver or default_resolver
+    key = (frame_fingerprint(values), frame_fingerprint(days), resolver.fingerprint)
+    with _tables_lock:
+        tables = _tables.get(key)
+        if tables is not None:
+            _tables.move_to_end(key)
+            return tables
+
+    tables = _build_rate_tables(values, days, resolver)
+    logger.info(
+        f"📋 Tabelas de parâmetros carregadas: {len(values)} valores por estado, "
+        f"{len(days)} sindicatos com dias úteis"
+    )
+    with _tables_lock:
+        tables = _tables.setdefault(key, tables)
+        _tables.move_to_end(key)
+        while len(_tables) > MAX_CACHED_TABLES:
+            _tables.popitem(last=False)
+    return tables
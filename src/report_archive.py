@@ -0,0 +1,140 @@
+import os
+import re
+import pandas as pd
+
+from typing import Dict, List, Optional
+
+from src.logger.logger import logger
+from src.utils import data_dir, parse_competencia
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+ARCHIVE_DIR = data_dir("archive", "VRVA_ARCHIVE_DIR")
+ARCHIVE_FORMATS = {"parquet": "parquet", "arrow": "arrow"}
+REPORT_TABLE = "report"
+INPUTS_PREFIX = "inputs"
+
+def _partition_name(competencia: str) -> str:
+    month, year = parse_competencia(competencia)
+    return f"competencia={year:04d}-{month:02d}"
+
+def _competencia_from_partition(name: str) -> Optional[str]:
+    match = re.fullmatch(r"competencia=(\d{4})-(\d{2})", name)
+    return f"{match.group(2)}-{match.group(1)}" if match else None
+
+def _to_arrow(df: pd.DataFrame) -> "pa.Table":
+    """
+    Converte para Arrow preservando os tipos do report (categorias viram colunas dictionary).
+    Colunas de texto com tipos misturados, comuns nas planilhas brutas, são gravadas como texto.
+    """
+    df = df.copy()
+    df.columns = [str(c) for c in df.columns]
+    for col in df.columns[df.dtypes == object]:
+        try:
+            pa.array(df[col], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+class ReportArchive:
+    """
+    Histórico colunar dos reports e das planilhas de entrada, ao lado do SQLite de cada execução.
+
+    Cada tabela é gravada em <root>/<tabela>/competencia=AAAA-MM/part-0.<formato>, em Parquet
+    (compacto) ou Arrow IPC (lido por memory map, sem cópia). Consultas leem apenas as colunas
+    e competências pedidas, o que mantém barata a análise de vários anos de reports.
+    """
+
+    def __init__(self, root: str = ARCHIVE_DIR, file_format: str = "parquet"):
+        if pa is None:
+            raise ImportError("pyarrow é necessário para o arquivo colunar de reports.")
+        if file_format not in ARCHIVE_FORMATS:
+            raise ValueError(f"Formato inválido: '{file_format}'. Use um de {tuple(ARCHIVE_FORMATS)}.")
+        self.root = root
+        self.file_format = file_format
+
+    def _table_dir(self, table: str) -> str:
+        return os.path.join(self.root, table)
+
+    def _partition_file(self, table: str, competencia: str) -> str:
+        return os.path.join(self._table_dir(table), _partition_name(competencia), f"part-0.{ARCHIVE_FORMATS[self.file_format]}")
+
+    def write(self, table: str, df: pd.DataFrame, competencia: str) -> str:
+        """Grava (substituindo) a partição da competência de uma tabela."""
+        path = self._partition_file(table, competencia)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+
+        arrow_table = _to_arrow(df)
+        if self.file_format == "parquet":
+            pq.write_table(arrow_table, tmp_path)
+        else:
+            with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, arrow_table.schema) as writer:
+                writer.write_table(arrow_table)
+        os.replace(tmp_path, path)
+        return path
+
+    def save_report(self, df: pd.DataFrame, competencia: str):
+        self.write(REPORT_TABLE, df, competencia)
+        logger.info(f"🗄️ Report da competência {competencia} arquivado ({len(df)} registros, {self.file_format})")
+
+    def save_inputs(self, inputs: Dict[str, pd.DataFrame], competencia: str):
+        """Arquiva as planilhas de entrada já interpretadas, uma tabela por tipo de arquivo."""
+        for name, df in (inputs or {}).items():
+            if df is not None and not df.empty:
+                self.write(f"{INPUTS_PREFIX}/{name}", df, competencia)
+
+    def competencias(self, table: str = REPORT_TABLE) -> List[str]:
+        """Competências arquivadas de uma tabela, em ordem cronológica."""
+        directory = self._table_dir(table)
+        if not os.path.isdir(directory):
+            return []
+        found = [c for c in map(_competencia_from_partition, os.listdir(directory)) if c]
+        return sorted(found, key=lambda c: parse_competencia(c)[::-1])
+
+    def _read_file(self, path: str, columns: Optional[List[str]]) -> "pa.Table":
+        if self.file_format == "parquet":
+            return pq.read_table(path, columns=columns, memory_map=True)
+        # Arrow IPC: os buffers apontam direto para o arquivo mapeado em memória.
+        table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+        return table.select([c for c in columns if c in table.column_names]) if columns else table
+
+    def read_table(self, table: str = REPORT_TABLE, competencias: Optional[List[str]] = None, columns: Optional[List[str]] = None) -> "pa.Table":
+        """Lê as competências pedidas (todas, por padrão) como uma tabela Arrow com a coluna COMPETENCIA."""
+        parts = []
+        for competencia in competencias or self.competencias(table):
+            path = self._partition_file(table, competencia)
+            if not os.path.exists(path):
+                continue
+            part = self._read_file(path, columns)
+            parts.append(part.append_column("COMPETENCIA", pa.array([competencia] * part.num_rows, pa.string())))
+        if not parts:
+            return pa.table({"COMPETENCIA": pa.array([], pa.string())})
+        return pa.concat_tables(parts, promote_options="permissive")
+
+    def read(self, table: str = REPORT_TABLE, competencias: Optional[List[str]] = None, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        return self.read_table(table, competencias, columns).to_pandas()
+
+    def state_summary(self, competencias: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Colaboradores e totais por competência e ESTADO, lendo apenas as colunas necessárias
+        e agregando direto nas colunas Arrow.
+        """
+        columns = ["ESTADO", "TOTAL", "CUSTO_EMPRESA", "CUSTO_PROFISSIONAL"]
+        table = self.read_table(REPORT_TABLE, competencias, columns)
+        if table.num_rows == 0 or "ESTADO" not in table.column_names:
+            return pd.DataFrame(columns=["COMPETENCIA", "ESTADO", "quantidade", *[c.lower() for c in columns[1:]]])
+
+        table = table.filter(pc.is_valid(table["ESTADO"]))
+        if pa.types.is_dictionary(table.schema.field("ESTADO").type):
+            table = table.set_column(table.column_names.index("ESTADO"), "ESTADO", pc.cast(table["ESTADO"], pa.string()))
+        aggregations = [("ESTADO", "count")] + [(c, "sum") for c in columns[1:] if c in table.column_names]
+        summary = table.group_by(["COMPETENCIA", "ESTADO"]).aggregate(aggregations).to_pandas()
+        summary.rename(columns={"ESTADO_count": "quantidade", **{f"{c}_sum": c.lower() for c in columns[1:]}}, inplace=True)
+        summary["_ordem"] = summary["COMPETENCIA"].map(lambda c: parse_competencia(c)[::-1])
+        return summary.sort_values(["_ordem", "ESTADO"]).drop(columns="_ordem").reset_index(drop=True)
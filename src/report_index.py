@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+
+from typing import List, Tuple
+
+from src.report_schema import normalize_keys
+
+REPORT_KEY = "MATRICULA"
+# Nome do índice do report: distinto da coluna para não tornar ambíguos os merges por MATRICULA.
+KEY_INDEX = "_MATRICULA"
+
+def keyed_report(df_report: pd.DataFrame) -> pd.DataFrame:
+    """
+    Indexa o report pela MATRICULA normalizada. Quando o report já está indexado (etapas
+    anteriores em memória) não há custo: a coluna não é renormalizada e a tabela hash do
+    índice, construída na primeira busca, é reaproveitada pelas etapas seguintes.
+    """
+    if df_report.index.name == KEY_INDEX:
+        return df_report
+    keys = normalize_keys(df_report[REPORT_KEY])
+    df_report[REPORT_KEY] = keys
+    df_report.index = pd.Index(keys, name=KEY_INDEX)
+    return df_report
+
+def keyed_updates(df_updates: pd.DataFrame) -> pd.DataFrame:
+    """Indexa as linhas de uma planilha de movimentação pela matrícula (última ocorrência de cada uma)."""
+    df = df_updates.copy()
+    keys = normalize_keys(df[REPORT_KEY])
+    df[REPORT_KEY] = keys
+    df.index = pd.Index(keys, name=KEY_INDEX)
+    return df[~df.index.duplicated(keep="last")]
+
+def _comparable(index: pd.Index, keys: pd.Index) -> Tuple[pd.Index, pd.Index]:
+    """Matrículas numéricas de um lado e texto do outro são comparadas como texto."""
+    if (index.dtype.kind in "iu") != (keys.dtype.kind in "iu"):
+        return index.astype(str), keys.astype(str)
+    return index, keys
+
+def match_rows(df_report: pd.DataFrame, keys: pd.Index) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Posições no report e nas chaves de cada matrícula presente em ambos. Com índice único a
+    busca usa a tabela hash do índice do report, custando O(len(keys)).
+    """
+    index, keys = _comparable(df_report.index, keys)
+    if index.is_unique:
+        found = index.get_indexer(keys)
+        key_pos = np.flatnonzero(found >= 0)
+        return found[key_pos], key_pos
+    report_pos = np.flatnonzero(index.isin(keys))
+    return report_pos, keys.get_indexer(index[report_pos])
+
+def new_rows(df_report: pd.DataFrame, df_updates: pd.DataFrame) -> pd.DataFrame:
+    """Linhas de df_updates cujas matrículas não existem no report."""
+    index, keys = _comparable(df_report.index, df_updates.index)
+    if index.is_unique:
+        return df_updates[index.get_indexer(keys) < 0]
+    return df_updates[~keys.isin(index)]
+
+def update_rows(df_report: pd.DataFrame, df_updates: pd.DataFrame, columns: List[str], overwrite: bool = True) -> pd.DataFrame:
+    """
+    Atualiza as colunas dadas apenas nas linhas do report cujas matrículas estão em df_updates.
+      - overwrite=True: valores não nulos da atualização prevalecem sobre os do report;
+      - overwrite=False: a atualização só preenche valores nulos do report.
+    Colunas ausentes no report são criadas vazias (como em um merge left).
+    """
+    report_pos, update_pos = match_rows(df_report, df_updates.index)
+    for col in columns:
+        if col not in df_report.columns:
+            df_report[col] = df_updates[col].iloc[:0].reindex(df_report.index)
+        if not len(report_pos):
+            continue
+
+        current = df_report[col].iloc[report_pos].reset_index(drop=True)
+        new = df_updates[col].iloc[update_pos].reset_index(drop=True)
+        merged = new.combine_first(current) if overwrite else current.combine_first(new)
+        if isinstance(df_report[col].dtype, pd.CategoricalDtype):
+            # Colunas categóricas só aceitam valores já presentes nas categorias.
+            added = pd.Index(merged.dropna().unique()).difference(df_report[col].cat.categories)
+            if len(added):
+                df_report[col] = df_report[col].cat.add_categories(added)
+        df_report.iloc[report_pos, df_report.columns.get_loc(col)] = merged.to_numpy()
+    return df_report
+
+def add_to_column(df_report: pd.DataFrame, column: str, deltas: pd.Series) -> pd.DataFrame:
+    """Soma deltas (indexado pela matrícula) à coluna numérica apenas nas linhas afetadas."""
+    report_pos, delta_pos = match_rows(df_report, deltas.index)
+    if len(report_pos):
+        c = df_report.columns.get_loc(column)
+        df_report.iloc[report_pos, c] = df_report.iloc[report_pos, c].to_numpy() + deltas.to_numpy()[delta_pos]
+    return df_report
+
+def append_rows(df_report: pd.DataFrame, df_new: pd.DataFrame) -> pd.DataFrame:
+    """Acrescenta ao report linhas novas já indexadas pela matrícula."""
+    return pd.concat([df_report, df_new], sort=False)
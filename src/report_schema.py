@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+from typing import List
+
+# Tipos das colunas da tabela report, aplicados na ingestão dos ativos e preservados entre as
+# etapas: as ferramentas recebem datas já convertidas e as colunas de texto repetitivo ficam
+# codificadas como categorias (um código inteiro por linha em vez de uma string).
+KEY_COLUMN = "MATRICULA"
+CATEGORICAL_COLUMNS: List[str] = ["CARGO", "SITUACAO", "SINDICATO", "ESTADO", "TIPO_PAGAMENTO"]
+DATE_COLUMNS: List[str] = ["ADMISSAO", "DATA_DEMISSAO"]
+INTEGER_COLUMNS: List[str] = ["DIAS_DE_FERIAS", "DIAS_UTEIS"]
+FLOAT_COLUMNS: List[str] = ["VALOR_DIARIO", "TOTAL", "CUSTO_EMPRESA", "CUSTO_PROFISSIONAL"]
+
+def normalize_keys(values: pd.Series) -> np.ndarray:
+    """
+    Matrículas como inteiros (int64), a chave comum entre todas as planilhas. Se alguma
+    matrícula não for numérica, todas são mantidas como texto sem espaços.
+    """
+    if values.dtype.kind in "iu":
+        return values.to_numpy(dtype=np.int64)
+
+    numbers = values if values.dtype.kind == "f" else pd.to_numeric(values.astype(str).str.strip(), errors="coerce")
+    if numbers.notna().all() and (numbers % 1 == 0).all():
+        return numbers.to_numpy(dtype=np.int64)
+    return values.astype(str).str.strip().to_numpy()
+
+def enforce_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converte as colunas presentes do report para os tipos do schema. Colunas que já estão
+    no tipo certo não são tocadas, então aplicar o schema a cada etapa custa pouco.
+    """
+    if KEY_COLUMN in df.columns and df[KEY_COLUMN].dtype.kind not in "iu":
+        df[KEY_COLUMN] = normalize_keys(df[KEY_COLUMN])
+
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+
+    for col in DATE_COLUMNS:
+        if col in df.columns and df[col].dtype.kind != "M":
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+
+    for col in INTEGER_COLUMNS:
+        if col in df.columns and df[col].dtype.kind not in "iu":
+            values = pd.to_numeric(df[col], errors="coerce")
+            # Inteiro apenas quando não há lacunas; caso contrário permanece float (NaN).
+            df[col] = values.astype(np.int64) if values.notna().all() else values
+
+    for col in FLOAT_COLUMNS:
+        if col in df.columns and df[col].dtype.kind != "f":
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(float)
+    return df
@@ -0,0 +1,23 @@
+import pandas as pd
+
+from src.db import connection, write_frame
+from src.logger.logger import logger
+from src.report_schema import enforce_schema
+
+REPORT_TABLE = "report"
+
+def load_report(db_path: str) -> pd.DataFrame:
+    """Carrega a tabela report do SQLite para um DataFrame, já com os tipos do schema."""
+    with connection(db_path) as conn:
+        return enforce_schema(pd.read_sql(f"SELECT * FROM {REPORT_TABLE}", conn))
+
+def save_report(db_path: str, df: pd.DataFrame):
+    """Grava o DataFrame na tabela report, substituindo o conteúdo anterior."""
+    with connection(db_path) as conn:
+        write_frame(conn, REPORT_TABLE, df, if_exists="replace")
+    logger.info(f"💾 Tabela {REPORT_TABLE} gravada com {len(df)} registros")
+
+def append_report(db_path: str, df: pd.DataFrame):
+    """Acrescenta registros à tabela report (usado na gravação em lotes)."""
+    with connection(db_path) as conn:
+        write_frame(conn, REPORT_TABLE, df, if_exists="append")
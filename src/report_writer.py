@@ -0,0 +1,163 @@
+import pandas as pd
+
+from typing import Dict
+
+from src.logger.logger import logger
+
+try:
+    import xlsxwriter
+    from xlsxwriter.utility import xl_col_to_name
+except ImportError:
+    xlsxwriter = None
+
+REPORT_SHEET = "Relatorio"
+SUMMARY_SHEET = "Custos totais"
+
+COLUMN_MAPPING = {
+    "COMPETENCIA": "Competência",
+    "MATRICULA": "Matrícula",
+    "SINDICATO": "Sindicato do Colaborador",
+    "ADMISSAO": "Admissão",
+    "DIAS_UTEIS": "Dias",
+    "VALOR_DIARIO": "VALOR DIÁRIO VR",
+    "TOTAL": "TOTAL",
+    "CUSTO_EMPRESA": "Custo empresa",
+    "CUSTO_PROFISSIONAL": "Desconto profissional",
+    "OBS_GERAL": "OBS GERAL",
+}
+
+COLUMNS_ORDER = [
+    "Matrícula",
+    "Admissão",
+    "Sindicato do Colaborador",
+    "Competência",
+    "Dias",
+    "VALOR DIÁRIO VR",
+    "TOTAL",
+    "Custo empresa",
+    "Desconto profissional",
+    "OBS GERAL"
+]
+
+MONETARY_COLUMNS = [
+    "VALOR DIÁRIO VR",
+    "TOTAL",
+    "Custo empresa",
+    "Desconto profissional"
+]
+
+# Rótulo da aba de custos totais -> coluna somada na aba do relatório.
+SUMMARY_COLUMNS = {
+    "Total Custo Empresa (R$)": "Custo empresa",
+    "Total Colaboradores (R$)": "Desconto profissional",
+    "Total Geral (R$)": "TOTAL",
+}
+
+# Formato numérico de moeda brasileira (locale pt-BR, código 416).
+BRL_FORMAT = '[$R$-416] #,##0.00'
+DATE_FORMAT = "dd/mm/yyyy"
+
+def formatted_monetary_values(valor: float) -> str:
+    """
+    Formata um número float para uma string no formato de moeda brasileira (R$ 1.234,56).
+    """
+    us_formatted_value = f"{valor:,.2f}"
+    br_formatted_value = us_formatted_value.replace(",", "TEMP").replace(".", ",")
+    br_formatted_value = br_formatted_value.replace("TEMP", ".")
+
+    return f"R$ {br_formatted_value}"
+
+def build_report_frame(df: pd.DataFrame, competencia: str) -> pd.DataFrame:
+    """Renomeia e ordena as colunas do report no layout final, mantendo os valores numéricos."""
+    df_report = df.copy()
+    df_report.insert(0, "COMPETENCIA", competencia)
+    df_report.rename(columns={k: v for k, v in COLUMN_MAPPING.items() if k in df_report.columns}, inplace=True)
+    return df_report[[col for col in COLUMNS_ORDER if col in df_report.columns]]
+
+def summary_totals(df_report: pd.DataFrame) -> Dict[str, float]:
+    """Totais da aba de custos, a partir das colunas já renomeadas do relatório."""
+    return {
+        label: float(pd.to_numeric(df_report[col], errors="coerce").sum()) if col in df_report.columns else 0.0
+        for label, col in SUMMARY_COLUMNS.items()
+    }
+
+def write_report_xlsxwriter(df_report: pd.DataFrame, filename: str):
+    """
+    Grava o relatório com o xlsxwriter em modo constant_memory: as linhas são escritas em
+    sequência, os valores monetários permanecem numéricos (formato R$) e a aba de custos
+    totais usa fórmulas SUM sobre a aba do relatório.
+    """
+    workbook = xlsxwriter.Workbook(filename, {"constant_memory": True})
+    try:
+        header_fmt = workbook.add_format({"bold": True})
+        money_fmt = workbook.add_format({"num_format": BRL_FORMAT})
+        date_fmt = workbook.add_format({"num_format": DATE_FORMAT})
+
+        sheet = workbook.add_worksheet(REPORT_SHEET)
+        columns = list(df_report.columns)
+
+        # Cada coluna é convertida uma única vez para valores Python, com NaN/NaT como None.
+        values, writers = [], []
+        for c, col in enumerate(columns):
+            series = df_report[col]
+            if col == "Admissão":
+                series = pd.to_datetime(series, errors="coerce")
+                values.append([v.to_pydatetime() if pd.notna(v) else None for v in series])
+                writers.append((sheet.write_datetime, date_fmt))
+                sheet.set_column(c, c, 12)
+            elif col in MONETARY_COLUMNS or col == "Dias":
+                series = pd.to_numeric(series, errors="coerce")
+                values.append([None if pd.isna(v) else float(v) for v in series])
+                writers.append((sheet.write_number, money_fmt if col in MONETARY_COLUMNS else None))
+            else:
+                values.append([None if pd.isna(v) else str(v) for v in series])
+                writers.append((sheet.write_string, None))
+
+        for c, col in enumerate(columns):
+            sheet.write_string(0, c, col, header_fmt)
+
+        for r, row in enumerate(zip(*values), start=1):
+            for c, value in enumerate(row):
+                if value is None:
+                    continue
+                write, fmt = writers[c]
+                write(r, c, value, fmt)
+
+        summary = workbook.add_worksheet(SUMMARY_SHEET)
+        totals = summary_totals(df_report)
+        last_row = len(df_report) + 1
+        # Com constant_memory, escrever na linha 1 descarta a linha 0: todo o cabeçalho vem antes.
+        for c, label in enumerate(SUMMARY_COLUMNS):
+            summary.write_string(0, c, label, header_fmt)
+            summary.set_column(c, c, 26)
+        for c, (label, col) in enumerate(SUMMARY_COLUMNS.items()):
+            if col in columns and len(df_report):
+                letter = xl_col_to_name(columns.index(col))
+                formula = f"=SUM('{REPORT_SHEET}'!${letter}$2:${letter}${last_row})"
+                summary.write_formula(1, c, formula, money_fmt, totals[label])
+            else:
+                summary.write_number(1, c, totals[label], money_fmt)
+    finally:
+        workbook.close()
+
+def write_report_openpyxl(df_report: pd.DataFrame, filename: str):
+    """Gravação anterior via openpyxl, com valores monetários formatados como texto."""
+    df_text = df_report.copy()
+    for col in MONETARY_COLUMNS:
+        if col in df_text.columns:
+            df_text[col] = df_text[col].apply(formatted_monetary_values)
+
+    df_summary = pd.DataFrame([{label: formatted_monetary_values(v) for label, v in summary_totals(df_report).items()}])
+
+    with pd.ExcelWriter(filename, engine="openpyxl") as writer:
+        df_text.to_excel(writer, sheet_name=REPORT_SHEET, index=False)
+        df_summary.to_excel(writer, sheet_name=SUMMARY_SHEET, index=False)
+
+def save_excel_report(df: pd.DataFrame, filename: str, competencia: str):
+    """Gera o relatório VR/VA em Excel, usando o xlsxwriter quando disponível."""
+    df_report = build_report_frame(df, competencia)
+    if xlsxwriter is not None:
+        write_report_xlsxwriter(df_report, filename)
+    else:
+        logger.warning("xlsxwriter não instalado; gerando relatório via openpyxl (valores como texto).")
+        write_report_openpyxl(df_report, filename)
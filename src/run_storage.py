@@ -0,0 +1,77 @@
+import os
+import re
+import time
+import uuid
+import shutil
+import tempfile
+
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator
+
+from src.db import close_connections, get_connection
+from src.logger.logger import logger
+
+RUNS_DIR = os.environ.get("VRVA_RUNS_DIR", os.path.join(tempfile.gettempdir(), "vrva-runs"))
+# Execuções abandonadas (ex: processo encerrado no meio) são removidas após esse tempo.
+STALE_RUN_SECONDS = 6 * 60 * 60
+
+@dataclass
+class RunStorage:
+    """Diretório isolado de uma execução: banco SQLite próprio e local do relatório gerado."""
+    run_id: str
+    directory: str
+    db_path: str
+
+    def output_path(self, filename: str) -> str:
+        return os.path.join(self.directory, filename)
+
+    def cleanup(self):
+        close_connections(self.db_path)
+        shutil.rmtree(self.directory, ignore_errors=True)
+        logger.info(f"🧹 Execução {self.run_id} removida")
+
+def _safe(value: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_-]", "_", str(value))[:64] or "_"
+
+def cleanup_stale_runs(base_dir: str = RUNS_DIR, max_age_seconds: int = STALE_RUN_SECONDS):
+    """Remove diretórios de execuções mais antigos que max_age_seconds."""
+    if not os.path.isdir(base_dir):
+        return
+    limit = time.time() - max_age_seconds
+    for name in os.listdir(base_dir):
+        path = os.path.join(base_dir, name)
+        try:
+            if os.path.isdir(path) and os.path.getmtime(path) < limit:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            pass
+
+def create_run_storage(session_id: str, competencia: str, base_dir: str = RUNS_DIR) -> RunStorage:
+    """
+    Cria o armazenamento de uma execução, identificado por sessão e competência.
+    Cada execução recebe seu próprio arquivo SQLite, de modo que workflows simultâneos
+    no mesmo servidor não disputam nem sobrescrevem a tabela report uns dos outros.
+    """
+    cleanup_stale_runs(base_dir)
+
+    run_id = f"{_safe(session_id)}-{_safe(competencia)}-{uuid.uuid4().hex[:8]}"
+    directory = os.path.join(base_dir, run_id)
+    os.makedirs(directory, exist_ok=True)
+
+    db_path = os.path.join(directory, "database.db")
+    # Cria o banco já em modo WAL; a conexão fica no pool para as etapas da execução.
+    get_connection(db_path)
+
+    logger.info(f"📂 Execução {run_id} usando banco {db_path}")
+    return RunStorage(run_id=run_id, directory=directory, db_path=db_path)
+
+@contextmanager
+def run_storage(session_id: str, competencia: str, base_dir: str = RUNS_DIR, keep: bool = False) -> Iterator[RunStorage]:
+    """Contexto com o armazenamento isolado da execução, removido ao final (exceto com keep=True)."""
+    storage = create_run_storage(session_id, competencia, base_dir)
+    try:
+        yield storage
+    finally:
+        if not keep:
+            storage.cleanup()
@@ -0,0 +1,352 @@
+"""
+Modo serviço (sem Streamlit): API HTTP que recebe as planilhas de uma competência, enfileira a
+geração do relatório em um pool de processos e permite acompanhar o job e baixar o resultado.
+
+Endpoints:
+    POST /jobs?competencia=05-2025[&mode=local|llm|audit]   multipart/form-data com os .xlsx
+         -> 202 {"job_id": ..., "status": "queued"}; 429 quando a fila está cheia
+    GET  /jobs/<id>            status, totais e erro do job
+    GET  /jobs/<id>/report     download do VR MENSAL MM.AAAA.xlsx
+    GET  /health               workers e tamanho da fila
+
+Uso:
+    python -m src.service --port 8080 [--workers 4] [--max-pending 16] [--archive historico/]
+    curl -F files=@ATIVOS.xlsx -F files=@FERIAS.xlsx ... "http://localhost:8080/jobs?competencia=05-2025"
+
+Com VRVA_SERVICE_TOKEN definido, as requisições precisam do cabeçalho `Authorization: Bearer <token>`.
+"""
+import os
+import json
+import time
+import uuid
+import shutil
+import argparse
+import tempfile
+import threading
+
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from src.batch import normalize_competencia, run_competencia
+from src.logger.logger import logger
+
+SERVICE_DIR = os.environ.get("VRVA_SERVICE_DIR", os.path.join(tempfile.gettempdir(), "vrva-service"))
+MAX_UPLOAD_BYTES = 200 * 1024 * 1024
+# Jobs concluídos (e seus arquivos) ficam disponíveis para download por esse tempo.
+JOB_TTL_SECONDS = 24 * 60 * 60
+# Intervalo da limpeza periódica dos jobs expirados (também com o serviço ocioso).
+CLEANUP_INTERVAL_SECONDS = 10 * 60
+CALCULATION_MODES = ("local", "llm", "audit")
+
+@dataclass
+class Job:
+    job_id: str
+    competencia: str
+    mode: str
+    directory: str
+    submitted_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    future: Optional[Future] = None
+
+    @property
+    def input_dir(self) -> str:
+        return os.path.join(self.directory, "inputs")
+
+    @property
+    def output_dir(self) -> str:
+        return os.path.join(self.directory, "output")
+
+    @property
+    def status(self) -> str:
+        if self.future is None or not self.future.done():
+            return "running" if self.future is not None and self.future.running() else "queued"
+        # Jobs ainda na fila de um pool recriado (ver JobQueue._reset_pool) são cancelados.
+        if self.future.cancelled():
+            return "cancelled"
+        if self.future.exception() is not None:
+            return "error"
+        return "done" if self.future.result().get("Status") == "ok" else "error"
+
+    def error(self) -> Optional[BaseException]:
+        """Exceção do processo (ex: BrokenProcessPool); None se não terminou, foi cancelado ou concluiu."""
+        if self.future is None or not self.future.done() or self.future.cancelled():
+            return None
+        return self.future.exception()
+
+    def result(self) -> Dict[str, Any]:
+        """Resumo devolvido por run_competencia; vazio enquanto o job não termina, se foi cancelado ou se o processo falhou."""
+        if self.future is None or not self.future.done() or self.future.cancelled() or self.future.exception() is not None:
+            return {}
+        return self.future.result()
+
+    def report_path(self) -> Optional[str]:
+        name = self.result().get("Arquivo")
+        path = os.path.join(self.output_dir, name) if name else None
+        return path if path and os.path.exists(path) else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        info = {
+            "job_id": self.job_id,
+            "competencia": self.competencia,
+            "mode": self.mode,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "finished_at": self.finished_at,
+        }
+        if self.status == "cancelled":
+            info["result"] = {"Status": "cancelado", "Erro": "Job cancelado após a recriação do pool; envie novamente."}
+        elif self.future is not None and self.future.done():
+            error = self.error()
+            info["result"] = {"Status": "erro", "Erro": str(error) or type(error).__name__} if error else self.result()
+        return info
+
+class QueueFullError(RuntimeError):
+    """Fila de jobs cheia: o cliente deve tentar novamente mais tarde."""
+
+class ServiceUnavailableError(RuntimeError):
+    """Pool de processos indisponível (ex: worker encerrado por falta de memória); já foi recriado."""
+
+class JobQueue:
+    """
+    Fila local de geração de relatórios: cada job roda em um processo do pool, com banco e
+    diretório próprios (ver batch.run_competencia). Quando há max_pending jobs ainda não
+    concluídos, novos envios são recusados (backpressure) em vez de acumular memória e disco.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        base_dir: str = SERVICE_DIR,
+        openai_api_key: str = "",
+        archive_dir: Optional[str] = None
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * 4
+        self.base_dir = base_dir
+        self.openai_api_key = openai_api_key
+        self.archive_dir = archive_dir
+        self.jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        os.makedirs(base_dir, exist_ok=True)
+
+        self._stop = threading.Event()
+        self._janitor = threading.Thread(target=self._cleanup_loop, name="vrva-job-cleanup", daemon=True)
+        self._janitor.start()
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(1 for job in self.jobs.values() if job.future is not None and not job.future.done())
+
+    def submit(self, competencia: str, files: List[Tuple[str, bytes]], mode: str = "local") -> Job:
+        """Grava as planilhas no diretório do job e o enfileira no pool."""
+        self.cleanup_expired()
+        if self.pending() >= self.max_pending:
+            raise QueueFullError(f"Fila cheia ({self.max_pending} jobs pendentes)")
+
+        job_id = uuid.uuid4().hex
+        job = Job(job_id=job_id, competencia=competencia, mode=mode, directory=os.path.join(self.base_dir, job_id))
+        os.makedirs(job.input_dir)
+        os.makedirs(job.output_dir)
+        for filename, content in files:
+            with open(os.path.join(job.input_dir, filename), "wb") as f:
+                f.write(content)
+
+        with self._lock:
+            try:
+                job.future = self._pool.submit(
+                    run_competencia, competencia, job.input_dir, job.output_dir, mode, self.openai_api_key, self.archive_dir
+                )
+            except BrokenProcessPool:
+                self._reset_pool()
+                shutil.rmtree(job.directory, ignore_errors=True)
+                raise ServiceUnavailableError("Pool de processos reiniciado após falha de um worker; tente novamente.")
+            self.jobs[job_id] = job
+        job.future.add_done_callback(lambda future, job=job: self._finished(job, future))
+        logger.info(f"📨 Job {job_id} ({competencia}, {mode}) enfileirado com {len(files)} planilha(s)")
+        return job
+
+    def _reset_pool(self):
+        """Substitui um pool quebrado (um worker morreu e o executor recusa novos envios). Chamar com o lock."""
+        logger.error(f"💥 Pool de processos quebrado; recriando com {self.workers} worker(s)")
+        broken, self._pool = self._pool, ProcessPoolExecutor(max_workers=self.workers)
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _finished(self, job: Job, future: Future):
+        job.finished_at = time.time()
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            # Recria já, para que o próximo envio não receba 503.
+            with self._lock:
+                if getattr(self._pool, "_broken", False):
+                    self._reset_pool()
+        # As planilhas enviadas não são mais necessárias; o relatório fica até o job expirar.
+        shutil.rmtree(job.input_dir, ignore_errors=True)
+        logger.info(f"✅ Job {job.job_id}: {job.status}")
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def _cleanup_loop(self):
+        while not self._stop.wait(CLEANUP_INTERVAL_SECONDS):
+            try:
+                self.cleanup_expired()
+            except Exception:
+                logger.exception("Erro na limpeza dos jobs expirados")
+
+    def cleanup_expired(self, ttl_seconds: int = JOB_TTL_SECONDS):
+        limit = time.time() - ttl_seconds
+        with self._lock:
+            expired = [job for job in self.jobs.values() if job.finished_at is not None and job.finished_at < limit]
+            for job in expired:
+                del self.jobs[job.job_id]
+        for job in expired:
+            shutil.rmtree(job.directory, ignore_errors=True)
+
+    def shutdown(self):
+        self._stop.set()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+def parse_multipart(content_type: str, body: bytes) -> List[Tuple[str, bytes]]:
+    """Arquivos (.xlsx) de um corpo multipart/form-data, com o nome reduzido ao nome base."""
+    message = BytesParser(policy=HTTP).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + body)
+    files = []
+    for part in message.iter_parts() if message.is_multipart() else []:
+        filename = part.get_filename()
+        if not filename:
+            continue
+        filename = os.path.basename(filename.replace("\\", "/"))
+        if filename.lower().endswith(".xlsx"):
+            files.append((filename, part.get_payload(decode=True) or b""))
+    return files
+
+def _handler(queue: JobQueue, token: Optional[str]):
+    class ServiceHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+            body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _authorized(self) -> bool:
+            if token and self.headers.get("Authorization") != f"Bearer {token}":
+                self._send_json(401, {"erro": "Não autorizado"})
+                return False
+            return True
+
+        def do_POST(self):
+            if not self._authorized():
+                return
+            url = urlparse(self.path)
+            if url.path.rstrip("/") != "/jobs":
+                self._send_json(404, {"erro": "Rota não encontrada"})
+                return
+
+            params = parse_qs(url.query)
+            competencia = normalize_competencia(params.get("competencia", [""])[0])
+            mode = params.get("mode", ["local"])[0]
+            if not competencia:
+                self._send_json(400, {"erro": "Informe a competência (ex: ?competencia=05-2025)"})
+                return
+            if mode not in CALCULATION_MODES:
+                self._send_json(400, {"erro": f"Modo inválido: '{mode}'. Use um de {CALCULATION_MODES}."})
+                return
+            if mode != "local" and not queue.openai_api_key:
+                self._send_json(400, {"erro": "Defina OPENAI_API_KEY no serviço para os modos com LLM."})
+                return
+
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > MAX_UPLOAD_BYTES:
+                self._send_json(413, {"erro": f"Envio maior que {MAX_UPLOAD_BYTES // (1024 * 1024)} MB"})
+                return
+            content_type = self.headers.get("Content-Type", "")
+            if not content_type.startswith("multipart/form-data"):
+                self._send_json(415, {"erro": "Envie as planilhas como multipart/form-data"})
+                return
+            files = parse_multipart(content_type, self.rfile.read(length))
+            if not files:
+                self._send_json(400, {"erro": "Nenhuma planilha .xlsx recebida"})
+                return
+
+            try:
+                job = queue.submit(competencia, files, mode)
+            except QueueFullError as e:
+                self._send_json(429, {"erro": str(e)}, {"Retry-After": "30"})
+                return
+            except ServiceUnavailableError as e:
+                self._send_json(503, {"erro": str(e)}, {"Retry-After": "5"})
+                return
+            self._send_json(202, {"job_id": job.job_id, "status": job.status}, {"Location": f"/jobs/{job.job_id}"})
+
+        def do_GET(self):
+            if not self._authorized():
+                return
+            parts = [p for p in urlparse(self.path).path.split("/") if p]
+            if parts == ["health"]:
+                self._send_json(200, {"workers": queue.workers, "pending": queue.pending(), "max_pending": queue.max_pending})
+                return
+            if len(parts) not in (2, 3) or parts[0] != "jobs" or (len(parts) == 3 and parts[2] != "report"):
+                self._send_json(404, {"erro": "Rota não encontrada"})
+                return
+
+            job = queue.get(parts[1])
+            if job is None:
+                self._send_json(404, {"erro": "Job não encontrado"})
+                return
+            if len(parts) == 2:
+                self._send_json(200, job.to_dict())
+                return
+
+            path = job.report_path() if job.status == "done" else None
+            if path is None:
+                self._send_json(409, {"erro": f"Relatório indisponível (status: {job.status})"})
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+            self.send_header("Content-Disposition", f'attachment; filename="{os.path.basename(path)}"')
+            self.send_header("Content-Length", str(os.path.getsize(path)))
+            self.end_headers()
+            with open(path, "rb") as f:
+                shutil.copyfileobj(f, self.wfile)
+
+        def log_message(self, format, *args):
+            logger.info("🌐 %s - %s", self.address_string(), format % args)
+
+    return ServiceHandler
+
+def create_server(host: str, port: int, queue: JobQueue, token: Optional[str] = None) -> ThreadingHTTPServer:
+    return ThreadingHTTPServer((host, port), _handler(queue, token))
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Serviço HTTP de geração dos relatórios VR/VA")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=None, help="Nº de processos (padrão: nº de CPUs)")
+    parser.add_argument("--max-pending", type=int, default=None, help="Jobs pendentes aceitos antes de responder 429 (padrão: 4 por worker)")
+    parser.add_argument("--archive", default=None, metavar="DIR", help="Arquiva reports e planilhas de cada job em Parquet neste diretório")
+    args = parser.parse_args(argv)
+
+    queue = JobQueue(args.workers, args.max_pending, openai_api_key=os.environ.get("OPENAI_API_KEY", ""), archive_dir=args.archive)
+    server = create_server(args.host, args.port, queue, os.environ.get("VRVA_SERVICE_TOKEN") or None)
+    logger.info(f"🚀 Serviço VR/VA em http://{args.host}:{args.port} com {queue.workers} worker(s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        queue.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+import re
+import sqlite3
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from src.db import atomic
+from src.logger.logger import logger
+
+# Colunas que os comandos gerados podem alterar; todas as demais colunas do report são só leitura.
+WRITABLE_COLUMNS = ["TOTAL", "CUSTO_EMPRESA", "CUSTO_PROFISSIONAL", "OBS_GERAL"]
+REPORT_TABLE = "report"
+KEY_COLUMN = "MATRICULA"
+
+# Palavras e funções aceitas nas expressões dos UPDATEs. Qualquer outro identificador que não
+# seja coluna do report (SELECT, FROM, ATTACH, PRAGMA, load_extension...) invalida o comando.
+ALLOWED_WORDS = frozenset("""
+    AND OR NOT NULL IS IN BETWEEN LIKE GLOB ESCAPE CASE WHEN THEN ELSE END CAST AS
+    INTEGER REAL TEXT NUMERIC TRUE FALSE
+    ROUND COALESCE IFNULL NULLIF ABS MIN MAX LENGTH UPPER LOWER TRIM LTRIM RTRIM SUBSTR
+    REPLACE INSTR PRINTF DATE DATETIME JULIANDAY STRFTIME
+""".split())
+# Limite de CASEs aninhados por coluna ao combinar comandos (a profundidade de expressões do SQLite é limitada).
+MAX_COALESCED_DEPTH = 64
+
+_TOKEN_RE = re.compile(r"""
+      (?P<comment>--[^\n]*|/\*.*?\*/)
+    | (?P<string>'(?:[^']|'')*')
+    | (?P<quoted>"(?:[^"]|"")*")
+    | (?P<number>\d+(?:\.\d*)?(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?)
+    | (?P<word>[A-Za-z_][A-Za-z0-9_]*)
+    | (?P<op><=|>=|<>|!=|==|\|\||<<|>>|[-+*/%=<>(),.&|~])
+    | (?P<space>\s+)
+    | (?P<other>.)
+""", re.VERBOSE | re.DOTALL)
+
+class SQLValidationError(ValueError):
+    """Comando gerado rejeitado pela validação (tabela, coluna ou construção não permitida)."""
+
+@dataclass
+class Token:
+    kind: str
+    text: str
+
+    @property
+    def upper(self) -> str:
+        return self.text.upper()
+
+    @property
+    def name(self) -> Optional[str]:
+        """Nome do identificador (sem aspas), ou None para literais e operadores."""
+        if self.kind == "word":
+            return self.text
+        if self.kind == "quoted":
+            return self.text[1:-1].replace('""', '"')
+        return None
+
+def _tokenize(sql: str) -> List[Token]:
+    tokens = []
+    for match in _TOKEN_RE.finditer(sql):
+        kind = match.lastgroup
+        if kind in ("comment", "space"):
+            continue
+        if kind == "other":
+            raise SQLValidationError(f"Caractere não permitido no SQL: {match.group()!r}")
+        tokens.append(Token(kind, match.group()))
+    return tokens
+
+def _render(tokens: Iterable[Token]) -> str:
+    return " ".join(t.text for t in tokens)
+
+def split_statements(text: str) -> List[str]:
+    """
+    Separa a resposta do LLM em comandos completos usando sqlite3.complete_statement, de modo
+    que ';' dentro de literais não quebra um comando. Cercas de código Markdown são removidas.
+    """
+    text = re.sub(r"```[A-Za-z]*", "", text)
+    statements, buffer = [], ""
+    for part in text.split(";"):
+        buffer += part + ";"
+        if sqlite3.complete_statement(buffer):
+            if buffer.strip(" \t\r\n;"):
+                statements.append(buffer.strip())
+            buffer = ""
+    return statements
+
+@dataclass
+class UpdateStatement:
+    """UPDATE validado: atribuições (coluna -> tokens da expressão) e tokens do WHERE."""
+    assignments: Dict[str, List[Token]]
+    where: List[Token] = field(default_factory=list)
+
+    def is_point_update(self) -> bool:
+        """WHERE MATRICULA = <literal> ou MATRICULA IN (<literais>): usa o índice, sem varrer a tabela."""
+        w = self.where
+        if len(w) < 3 or w[0].name is None or w[0].name.upper() != KEY_COLUMN:
+            return False
+        literals = ("number", "string")
+        if len(w) == 3:
+            return w[1].text in ("=", "==") and w[2].kind in literals
+        if w[1].upper != "IN" or w[2].text != "(" or w[-1].text != ")":
+            return False
+        inner = w[3:-1]
+        return bool(inner) and all(t.kind in literals if i % 2 == 0 else t.text == "," for i, t in enumerate(inner))
+
+    def sql(self) -> str:
+        sets = ", ".join(f'"{col}" = {_render(expr)}' for col, expr in self.assignments.items())
+        where = f" WHERE {_render(self.where)}" if self.where else ""
+        return f'UPDATE "{REPORT_TABLE}" SET {sets}{where};'
+
+def _split_top_level(tokens: List[Token], separator: str) -> List[List[Token]]:
+    parts, current, depth = [], [], 0
+    for token in tokens:
+        if token.text == "(":
+            depth += 1
+        elif token.text == ")":
+            depth -= 1
+        if depth == 0 and token.text == separator:
+            parts.append(current)
+            current = []
+        else:
+            current.append(token)
+    parts.append(current)
+    return parts
+
+def _check_expression(tokens: List[Token], columns: Dict[str, str]) -> List[Token]:
+    """Valida os identificadores da expressão e normaliza os nomes de coluna."""
+    if not tokens:
+        raise SQLValidationError("Expressão vazia no comando UPDATE.")
+    checked = []
+    for token in tokens:
+        name = token.name
+        if name is not None and token.kind == "word" and name.upper() in ALLOWED_WORDS:
+            checked.append(token)
+        elif name is not None:
+            column = columns.get(name.upper())
+            if column is None:
+                raise SQLValidationError(f"Identificador não permitido: {name}")
+            checked.append(Token("quoted", f'"{column}"'))
+        else:
+            checked.append(token)
+    return checked
+
+def parse_update(sql: str, columns: Sequence[str], writable: Sequence[str] = WRITABLE_COLUMNS) -> UpdateStatement:
+    """
+    Valida um comando `UPDATE report SET col = expr[, ...] [WHERE cond]`: apenas a tabela report,
+    apenas colunas graváveis no SET e apenas colunas do report e funções permitidas nas expressões.
+    """
+    tokens = _tokenize(sql.strip().rstrip(";"))
+    if any(t.text == ";" for t in tokens):
+        raise SQLValidationError("Mais de um comando no mesmo trecho.")
+    if len(tokens) < 5 or tokens[0].upper != "UPDATE" or (tokens[1].name or "").lower() != REPORT_TABLE or tokens[2].upper != "SET":
+        raise SQLValidationError("Apenas comandos 'UPDATE report SET ...' são aceitos.")
+
+    by_name = {c.upper(): c for c in columns}
+    writable_names = {c.upper(): c for c in writable if c.upper() in by_name}
+
+    body = tokens[3:]
+    where: List[Token] = []
+    depth = 0
+    for i, token in enumerate(body):
+        depth += token.text == "("
+        depth -= token.text == ")"
+        if depth == 0 and token.kind == "word" and token.upper == "WHERE":
+            body, where = body[:i], _check_expression(body[i + 1:], by_name)
+            break
+
+    assignments: Dict[str, List[Token]] = {}
+    for part in _split_top_level(body, ","):
+        if len(part) < 3 or part[0].name is None or part[1].text != "=":
+            raise SQLValidationError(f"Atribuição inválida: {_render(part)}")
+        column = writable_names.get(part[0].name.upper())
+        if column is None:
+            raise SQLValidationError(f"Coluna não gravável: {part[0].name}")
+        assignments[column] = _check_expression(part[2:], by_name)
+    return UpdateStatement(assignments=assignments, where=where)
+
+def _substitute(tokens: List[Token], current: Dict[str, List[Token]]) -> List[Token]:
+    """Troca referências a colunas já atribuídas pela expressão que produziu seu valor."""
+    result = []
+    for token in tokens:
+        expr = current.get(token.name) if token.kind == "quoted" else None
+        if expr is None:
+            result.append(token)
+        else:
+            result += [Token("op", "("), *expr, Token("op", ")")]
+    return result
+
+def coalesce_updates(statements: Sequence[UpdateStatement]) -> List[UpdateStatement]:
+    """
+    Combina UPDATEs consecutivos em um único comando (uma varredura da tabela). Cada comando vê
+    o resultado dos anteriores: referências a colunas já atribuídas são substituídas pela expressão
+    correspondente e um WHERE vira `CASE WHEN cond THEN expr ELSE <valor atual> END`.
+    UPDATEs pontuais por MATRICULA não são combinados, pois usam o índice.
+    """
+    result: List[UpdateStatement] = []
+    current: Dict[str, List[Token]] = {}
+    depth: Dict[str, int] = {}
+
+    def flush():
+        if current:
+            result.append(UpdateStatement(assignments=dict(current)))
+            current.clear()
+            depth.clear()
+
+    for statement in statements:
+        if statement.is_point_update():
+            flush()
+            result.append(statement)
+            continue
+        if any(depth.get(col, 0) >= MAX_COALESCED_DEPTH for col in statement.assignments):
+            flush()
+
+        condition = _substitute(statement.where, current)
+        updated = {}
+        for col, expr in statement.assignments.items():
+            value = _substitute(expr, current)
+            if condition:
+                previous = current.get(col) or [Token("quoted", f'"{col}"')]
+                value = [Token("word", "CASE"), Token("word", "WHEN"), Token("op", "("), *condition, Token("op", ")"),
+                         Token("word", "THEN"), Token("op", "("), *value, Token("op", ")"),
+                         Token("word", "ELSE"), Token("op", "("), *previous, Token("op", ")"), Token("word", "END")]
+                depth[col] = depth.get(col, 0) + 1
+            updated[col] = value
+        current.update(updated)
+    flush()
+    return result
+
+def _authorizer(writable: Sequence[str]):
+    """Autorizador do sqlite3: durante a execução só é permitido ler o report e gravar as colunas permitidas."""
+    writable = set(writable)
+    allowed = {sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_TRANSACTION, sqlite3.SQLITE_SAVEPOINT}
+
+    def authorize(action, arg1, arg2, db_name, trigger):
+        if action == sqlite3.SQLITE_UPDATE:
+            return sqlite3.SQLITE_OK if arg1 == REPORT_TABLE and arg2 in writable else sqlite3.SQLITE_DENY
+        if action == sqlite3.SQLITE_READ:
+            return sqlite3.SQLITE_OK if arg1 == REPORT_TABLE else sqlite3.SQLITE_DENY
+        return sqlite3.SQLITE_OK if action in allowed else sqlite3.SQLITE_DENY
+    return authorize
+
+def table_columns(conn: sqlite3.Connection, table: str = REPORT_TABLE) -> List[str]:
+    return [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')]
+
+def execute_updates(
+    conn: sqlite3.Connection,
+    commands: Sequence[str],
+    writable: Sequence[str] = WRITABLE_COLUMNS,
+    coalesce: bool = True
+) -> Tuple[int, int]:
+    """
+    Valida, combina e executa os UPDATEs em um bloco atômico (src.db.atomic): qualquer falha desfaz
+    todos os comandos, sem confirmar uma transação já aberta pelo chamador.
+    Retorna (comandos recebidos, comandos executados).
+    """
+    columns = table_columns(conn)
+    if not columns:
+        raise SQLValidationError("Tabela report não existe.")
+    statements = [parse_update(cmd, columns, writable) for cmd in commands]
+    to_run = coalesce_updates(statements) if coalesce else statements
+
+    conn.set_authorizer(_authorizer(writable))
+    try:
+        with atomic(conn, "execute_updates"):
+            for statement in to_run:
+                sql = statement.sql()
+                logger.info("Executando SQL: %s", sql)
+                conn.execute(sql)
+    except Exception:
+        logger.error("Falha ao executar os comandos gerados; transação desfeita")
+        raise
+    finally:
+        conn.set_authorizer(None)
+
+    logger.info(f"✅ {len(statements)} comando(s) UPDATE aplicados em {len(to_run)} varredura(s)")
+    return len(statements), len(to_run)
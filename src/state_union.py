@@ -1,33 +1,145 @@
-from typing import Optional
+import re
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
 from . import utils
+from .base_tables import frame_fingerprint, parse_union_business_days, parse_union_values
 
 # -----------------------
 # Mapeamento sindicato -> UF/State (para achar o valor VR)
 # -----------------------
+UF_TO_STATE = {
+    "AC": "Acre", "AL": "Alagoas", "AP": "Amapá", "AM": "Amazonas", "BA": "Bahia",
+    "CE": "Ceará", "DF": "Distrito Federal", "ES": "Espírito Santo", "GO": "Goiás",
+    "MA": "Maranhão", "MT": "Mato Grosso", "MS": "Mato Grosso do Sul", "MG": "Minas Gerais",
+    "PA": "Pará", "PB": "Paraíba", "PR": "Paraná", "PE": "Pernambuco", "PI": "Piauí",
+    "RJ": "Rio de Janeiro", "RN": "Rio Grande do Norte", "RS": "Rio Grande do Sul",
+    "RO": "Rondônia", "RR": "Roraima", "SC": "Santa Catarina", "SP": "São Paulo",
+    "SE": "Sergipe", "TO": "Tocantins",
+}
+
+# Regras padrão (texto normalizado: maiúsculas, sem acentos), avaliadas em ordem.
+DEFAULT_RULES: List[Tuple[str, str]] = [
+    (r"SINDPD SP|SAO PAULO", "São Paulo"),
+    (r"SINDPD RJ|RIO DE JANEIRO", "Rio de Janeiro"),
+    (r"SINDPPD RS|RIO GRANDE DO SUL", "Rio Grande do Sul"),
+    (r"SITEPD PR|PARANA|CURITIBA", "Paraná"),
+]
+DEFAULT_UFS = ["SP", "RJ", "RS", "PR"]
+
+# Nº máximo de nomes de sindicato memorizados por resolvedor e de resolvedores mantidos em cache.
+MAX_CACHED_UNIONS = 4096
+MAX_CACHED_RESOLVERS = 8
+
+def normalize_union(s: str) -> str:
+    return utils.strip_accents(s.upper())
+
+def _uf_pattern(uf: str) -> str:
+    """Sigla isolada: no início seguida de espaço, entre espaços ou no fim (com ou sem ponto)."""
+    return rf"^{uf} | {uf} | {uf}\.$| {uf}$"
+
+class UnionStateResolver:
+    """
+    Resolve o estado de cada sindicato a partir de uma tabela de regras pré-compilada:
+    primeiro nomes exatos de sindicato, depois as regex em ordem. Cada nome distinto é
+    resolvido uma única vez (cache LRU limitado) e as colunas são mapeadas de forma vetorizada.
+    """
+
+    def __init__(self, rules: List[Tuple[str, str]], exact: Optional[Dict[str, str]] = None):
+        self.rules = [(re.compile(pattern), state) for pattern, state in rules]
+        self.exact = {normalize_union(k): v for k, v in (exact or {}).items()}
+        self.resolve = lru_cache(maxsize=MAX_CACHED_UNIONS)(self._resolve)
+
+        description = repr((sorted(self.exact.items()), rules))
+        self.fingerprint = hashlib.sha256(description.encode()).hexdigest()[:16]
+
+    def _resolve(self, s: str) -> Optional[str]:
+        s0 = normalize_union(s)
+        state = self.exact.get(s0.strip())
+        if state is not None:
+            return state
+        for pattern, state in self.rules:
+            if pattern.search(s0):
+                return state
+        return None
+
+    def resolve_series(self, unions: pd.Series) -> pd.Series:
+        """Estado de cada linha: resolve só os valores distintos (factorize) e mapeia pelos códigos."""
+        codes, uniques = pd.factorize(unions)
+        states = np.array(
+            [self.resolve(u) if isinstance(u, str) else None for u in uniques] + [None],
+            dtype=object
+        )
+        # Código -1 (valor ausente) aponta para o último elemento (None).
+        return pd.Series(states[codes], index=unions.index, dtype=object)
+
+def default_rules() -> List[Tuple[str, str]]:
+    return DEFAULT_RULES + [(_uf_pattern(uf), UF_TO_STATE[uf]) for uf in DEFAULT_UFS]
+
+default_resolver = UnionStateResolver(default_rules())
+
+_resolvers: "OrderedDict[str, UnionStateResolver]" = OrderedDict()
+_resolvers_lock = threading.Lock()
+
+def resolver_from_bases(df_union_values: Optional[pd.DataFrame] = None, df_business_days: Optional[pd.DataFrame] = None) -> UnionStateResolver:
+    """
+    Monta as regras a partir das planilhas base: os estados de Base_sindicato_x_valor
+    (pelo nome e pela sigla da UF) e os sindicatos de Base_dias_uteis, que viram regras exatas.
+    Sem planilhas base, devolve o resolvedor padrão. Reaproveita resolvedores já montados
+    para o mesmo conteúdo.
+    """
+    values = parse_union_values(df_union_values) if df_union_values is not None else None
+    days = parse_union_business_days(df_business_days) if df_business_days is not None else None
+    if (values is None or values.empty) and (days is None or days.empty):
+        return default_resolver
+
+    key = f"{frame_fingerprint(values)}:{frame_fingerprint(days)}"
+    with _resolvers_lock:
+        resolver = _resolvers.get(key)
+        if resolver is not None:
+            _resolvers.move_to_end(key)
+            return resolver
+
+    # Regras padrão primeiro; depois os estados da tabela de valores, pelo nome e pela sigla da UF.
+    rules = list(DEFAULT_RULES)
+    ufs = [(uf, UF_TO_STATE[uf]) for uf in DEFAULT_UFS]
+    if values is not None and not values.empty:
+        states = {normalize_union(s): s for s in values["ESTADO"]}
+        uf_by_state = {normalize_union(v): uf for uf, v in UF_TO_STATE.items()}
+        # Nomes mais longos primeiro ("MATO GROSSO DO SUL" antes de "MATO GROSSO").
+        for normalized in sorted(states, key=len, reverse=True):
+            rules.append((rf"\b{re.escape(normalized)}\b", states[normalized]))
+        ufs = [(uf_by_state[n], state) for n, state in states.items() if n in uf_by_state]
+    rules += [(_uf_pattern(uf), state) for uf, state in ufs]
+
+    # Sindicatos da tabela de dias úteis já resolvidos: consulta direta, sem avaliar as regex.
+    base_resolver = UnionStateResolver(rules)
+    exact = {}
+    if days is not None:
+        for union in days["SINDICATO"]:
+            state = base_resolver.resolve(union)
+            if state is not None:
+                exact[union] = state
+
+    resolver = UnionStateResolver(rules, exact)
+    with _resolvers_lock:
+        resolver = _resolvers.setdefault(key, resolver)
+        _resolvers.move_to_end(key)
+        while len(_resolvers) > MAX_CACHED_RESOLVERS:
+            _resolvers.popitem(last=False)
+    return resolver
+
+def resolve_states(unions: pd.Series, resolver: Optional[UnionStateResolver] = None) -> pd.Series:
+    """Coluna ESTADO a partir da coluna SINDICATO."""
+    return (resolver or default_resolver).resolve_series(unions)
+
 def infer_state_from_union(s: str) -> Optional[str]:
     if not isinstance(s, str):
         return None
-    s0 = s.upper()
-    
-    # Mapeamento mais específico baseado nos dados reais
-    if "SINDPD SP" in s0 or "SAO PAULO" in utils.strip_accents(s0):
-        return "São Paulo"
-    elif "SINDPD RJ" in s0 or "RIO DE JANEIRO" in s0:
-        return "Rio de Janeiro"
-    elif "SINDPPD RS" in s0 or "RIO GRANDE DO SUL" in s0:
-        return "Rio Grande do Sul"
-    elif "SITEPD PR" in s0 or "PARANA" in utils.strip_accents(s0) or "CURITIBA" in s0:
-        return "Paraná"
-    
-    # Fallback para método geral
-    UF_TO_STATE = {
-        "SP": "São Paulo",
-        "RJ": "Rio de Janeiro", 
-        "RS": "Rio Grande do Sul",
-        "PR": "Paraná",
-    }
-    
-    for uf, state in UF_TO_STATE.items():
-        if f" {uf} " in s0 or s0.endswith(f" {uf}.") or s0.endswith(f" {uf}") or s0.startswith(f"{uf} "):
-            return state
-    return None
\ No newline at end of file
+    return default_resolver.resolve(s)
@@ -1,11 +1,22 @@
+import numpy as np
 import pandas as pd
-import sqlite3
 
+from openpyxl import load_workbook
+from typing import Any, Dict, Iterator, Mapping, Optional, Tuple
+
+from src.eligibility import EligibilityEngine, default_engine
 from src.logger.logger import logger
+from src.report_schema import enforce_schema, normalize_keys
+from src.report_store import append_report, save_report
+from src.tools.eligibility_tool import apply_eligibility
+
+ACTIVES_COLUMNS = ['MATRICULA', 'TITULO DO CARGO', 'DESC. SITUACAO', 'Sindicato']
+STREAM_BATCH_SIZE = 50_000
 
-def process_actives(db_path: str, df_actives: pd.DataFrame):
-    """Processa funcionários ativos, excluindo aprendizes, estagiários, diretores,
-        licença maternidade e auxílio doença.
+def build_actives(df_actives: pd.DataFrame) -> pd.DataFrame:
+    """Monta o report inicial a partir dos funcionários ativos. O resultado já sai com os
+        tipos do schema do report (ver report_schema); as exclusões (aprendizes, estagiários,
+        diretores, afastados, exterior) são aplicadas depois, pelo motor de elegibilidade.
     """
     
     df_actives.columns = df_actives.columns.str.strip()
@@ -17,17 +28,102 @@ def process_actives(db_path: str, df_actives: pd.DataFrame):
         'TITULO DO CARGO': 'CARGO'
     }, inplace=True)
     
-    df['MATRICULA'] = df['MATRICULA'].astype(str).str.strip()
+    df['MATRICULA'] = normalize_keys(df['MATRICULA'])
     df['SITUACAO'] = df['SITUACAO'].astype(str).str.strip()
     df['SINDICATO'] = df['SINDICATO'].astype(str).str.strip()
     df['CARGO'] = df['CARGO'].astype(str).str.strip()
+    df = enforce_schema(df)
 
-    exclusions = ["APRENDIZ", "ESTAGIARIO", "DIRETOR"]
-    df = df[~df['CARGO'].str.upper().str.startswith(tuple(exclusions))]
-    exclusions_situation = ["LICENÇA MATERNIDADE", "AUXÍLIO DOENÇA"]
-    df = df[~df['SITUACAO'].str.upper().isin(exclusions_situation)]
-    
-    logger.info(f"✅ Processados {len(df)} ativos após exclusões")
-    
-    with sqlite3.connect(db_path) as conn:
-        df.to_sql('report', conn, if_exists='replace', index=False)
\ No newline at end of file
+    logger.info(f"✅ Processados {len(df)} ativos")
+    return df
+
+def process_actives(
+    db_path: str,
+    df_actives: pd.DataFrame,
+    sources: Optional[Mapping[str, pd.DataFrame]] = None,
+    engine: Optional[EligibilityEngine] = None
+):
+    """
+    Processa funcionários ativos e grava o resultado na tabela report, já sem os não elegíveis:
+    cargo e situação sempre; matrículas das planilhas de exclusão quando informadas em sources.
+    """
+    df, _ = apply_eligibility(build_actives(df_actives), sources, engine)
+    save_report(db_path, df)
+
+def iter_actives_batches(file: Any, batch_size: int = STREAM_BATCH_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    Lê a primeira aba da planilha de ativos em modo read_only do openpyxl, devolvendo
+    DataFrames de até batch_size linhas apenas com as colunas usadas pelo report.
+    """
+    if hasattr(file, "seek"):
+        file.seek(0)
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+
+        columns = [str(c).strip() if c is not None else "" for c in header]
+        missing = [c for c in ACTIVES_COLUMNS if c not in columns]
+        if missing:
+            raise KeyError(f"Colunas ausentes na planilha de ativos: {missing}")
+        positions = [columns.index(c) for c in ACTIVES_COLUMNS]
+
+        batch = []
+        for row in rows:
+            if all(v is None for v in row):
+                continue
+            batch.append(tuple(row[i] if i < len(row) else None for i in positions))
+            if len(batch) >= batch_size:
+                yield _batch_frame(batch)
+                batch = []
+        if batch:
+            yield _batch_frame(batch)
+    finally:
+        workbook.close()
+
+def _batch_frame(batch: list) -> pd.DataFrame:
+    df = pd.DataFrame.from_records(batch, columns=ACTIVES_COLUMNS)
+    # Mesma representação de células vazias do pd.read_excel (NaN, e não None).
+    return df.where(df.notna(), np.nan)
+
+def process_actives_streaming(
+    db_path: str,
+    file: Any,
+    batch_size: int = STREAM_BATCH_SIZE,
+    engine: Optional[EligibilityEngine] = None
+) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    """
+    Processa a planilha de ativos lote a lote, aplicando em cada lote as regras por atributo
+    (cargo e situação) e gravando a tabela report de forma incremental, com memória limitada
+    ao tamanho do lote. As regras por planilha (AFASTAMENTOS, EXTERIOR...) ficam para a etapa
+    de elegibilidade, sobre o report já reduzido.
+
+    Retorna MATRICULA e Sindicato de todos os ativos, usados pelo processamento de admissões,
+    e o nº de linhas atingidas por regra nos lotes.
+    """
+    batch_engine = (engine or default_engine).attribute_rules()
+    keys = []
+    hits: Dict[str, int] = {}
+    total = 0
+    first = True
+    for batch in iter_actives_batches(file, batch_size):
+        keys.append(batch[['MATRICULA', 'Sindicato']])
+        df, batch_hits = apply_eligibility(build_actives(batch), engine=batch_engine)
+        for name, count in batch_hits.items():
+            hits[name] = hits.get(name, 0) + count
+        if first:
+            save_report(db_path, df)
+            first = False
+        else:
+            append_report(db_path, df)
+        total += len(df)
+
+    if first:
+        save_report(db_path, pd.DataFrame(columns=['MATRICULA', 'CARGO', 'SITUACAO', 'SINDICATO']))
+
+    logger.info(f"✅ Processados {total} ativos elegíveis em lotes de até {batch_size} linhas")
+    if not keys:
+        return pd.DataFrame(columns=['MATRICULA', 'Sindicato']), hits
+    return pd.concat(keys, ignore_index=True), hits
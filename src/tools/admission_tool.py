@@ -1,88 +1,99 @@
 import pandas as pd
-import sqlite3
 
-from src.logger.logger import logger
+from typing import Mapping, Optional
 
-def process_admissions(db_path: str, df_admissions: pd.DataFrame, df_actives: pd.DataFrame):
+from src.eligibility import EligibilityEngine
+from src.logger.logger import logger
+from src.report_store import load_report, save_report
+from src.report_index import append_rows, keyed_report, keyed_updates, new_rows, normalize_keys, update_rows
+from src.state_union import UnionStateResolver, resolve_states
+from src.tools.eligibility_tool import apply_eligibility, last_eligible_union
+
+def apply_admissions(
+    df_report: pd.DataFrame,
+    df_admissions: pd.DataFrame,
+    df_actives: pd.DataFrame,
+    resolver: UnionStateResolver = None,
+    default_union: Optional[str] = None
+) -> pd.DataFrame:
     """
-    Processa admissões do mês:
+    Aplica as admissões do mês sobre o report em memória:
       - Atualiza ADMISSAO em registros existentes no report.
       - Adiciona novas matrículas encontradas em admissions mas não presentes em report.
       - Para essas novas, se não houver SINDICATO no df_admissions/df_actives,
-        herda o último SINDICATO disponível no report.
-      - Infere ESTADO a partir do SINDICATO (usando a função disponível).
+        herda default_union (ver last_eligible_union) ou, na falta dele, o último SINDICATO do report.
+      - Infere ESTADO a partir do SINDICATO (resolvedor de sindicatos, padrão ou das planilhas base).
+
+    O report é indexado pela MATRICULA e apenas as linhas das matrículas admitidas são tocadas.
     """
     df_adm = df_admissions[['MATRICULA', 'Admissão', 'Cargo']].copy()
     df_adm.rename(columns={'Admissão': 'ADMISSAO', 'Cargo': 'CARGO'}, inplace=True)
-    df_adm['MATRICULA'] = df_adm['MATRICULA'].astype(str).str.strip()
-
-    remove_positions = ["DIRETOR", "ESTAGIARIO", "ESTAGIO", "APRENDIZ"]
-    df_adm = df_adm[df_adm["CARGO"].apply(lambda c: not any(rc in c.upper() for rc in remove_positions))]
+    df_adm = keyed_updates(df_adm)
 
     if df_adm.empty:
-        logger.info("⚠️ Nenhuma admissão elegível encontrada.")
-        return
+        logger.info("⚠️ Nenhuma admissão encontrada.")
+        return df_report
 
     df_adm['SITUACAO'] = "Admissão no mês"
 
     df_actives = df_actives[['MATRICULA', 'Sindicato']].copy()
     df_actives.rename(columns={'Sindicato': 'SINDICATO'}, inplace=True)
-    df_actives['MATRICULA'] = df_actives['MATRICULA'].astype(str).str.strip()
+    df_actives['MATRICULA'] = normalize_keys(df_actives['MATRICULA'])
 
-    df_adm = df_adm.merge(df_actives, on='MATRICULA', how='left')
+    df_adm = keyed_updates(df_adm.merge(df_actives, on='MATRICULA', how='left'))
 
-    if 'infer_state_from_union' in globals() and callable(globals()['infer_state_from_union']):
-        infer_state_fn = globals()['infer_state_from_union']
-    elif 'infer_estado_from_sindicato' in globals() and callable(globals()['infer_estado_from_sindicato']):
-        infer_state_fn = globals()['infer_estado_from_sindicato']
-    else:
-        infer_state_fn = lambda s: None
-
-    with sqlite3.connect(db_path) as conn:
-        df_report = pd.read_sql('SELECT * FROM report', conn)
-        
-        if 'MATRICULA' not in df_report.columns:
-            logger.error("Tabela report não contém coluna 'MATRICULA'. Abortando processamento de admissões.")
-            return
-        df_report['MATRICULA'] = df_report['MATRICULA'].astype(str).str.strip()
-
-        if 'ADMISSAO' not in df_report.columns:
-            df_report['ADMISSAO'] = pd.NaT
-
-        df_report = df_report.merge(
-            df_adm[['MATRICULA', 'ADMISSAO']],
-            on='MATRICULA',
-            how='left',
-            suffixes=('', '_ADM')
-        )
-        if 'ADMISSAO_ADM' in df_report.columns:
-            df_report['ADMISSAO'] = df_report['ADMISSAO_ADM'].combine_first(df_report['ADMISSAO'])
-            df_report.drop(columns=['ADMISSAO_ADM'], inplace=True)
-
-        df_news = df_adm[~df_adm['MATRICULA'].isin(df_report['MATRICULA'])].copy()
+    if 'MATRICULA' not in df_report.columns:
+        logger.error("Tabela report não contém coluna 'MATRICULA'. Abortando processamento de admissões.")
+        return df_report
+    df_report = keyed_report(df_report)
 
-        if not df_news.empty:
-            if 'SINDICATO' not in df_news.columns:
-                df_news['SINDICATO'] = None
+    if 'ADMISSAO' not in df_report.columns:
+        df_report['ADMISSAO'] = pd.NaT
 
-            last_union = None
-            if 'SINDICATO' in df_report.columns and df_report['SINDICATO'].notna().any():
-                last_union = df_report['SINDICATO'].dropna().iloc[-1]
+    df_report = update_rows(df_report, df_adm, ['ADMISSAO'], overwrite=True)
 
-            if last_union:
-                df_news['SINDICATO'] = df_news['SINDICATO'].fillna(last_union)
+    df_news = new_rows(df_report, df_adm).copy()
 
-            df_news['ESTADO'] = df_news['SINDICATO'].apply(lambda s: infer_state_fn(s) if pd.notna(s) and s != '' else None)
+    if not df_news.empty:
+        if 'SINDICATO' not in df_news.columns:
+            df_news['SINDICATO'] = None
 
-            df_news = df_news[df_news['SINDICATO'].notna() & (df_news['SINDICATO'] != '')]
+        last_union = default_union
+        if last_union is None and 'SINDICATO' in df_report.columns and df_report['SINDICATO'].notna().any():
+            last_union = df_report['SINDICATO'].dropna().iloc[-1]
 
-            if not df_news.empty:
-                df_report = pd.concat([df_report, df_news], ignore_index=True, sort=False)
-                logger.info(f"✅ Adicionadas {len(df_news)} novas admissões ao report herdando sindicato do último registro")
-            else:
-                logger.info("⚠️ Havia novas matrículas, mas nenhuma com sindicato após tentativa de herdar. Nenhuma inserida.")
-        else:
-            logger.info("⚠️ Nenhuma matrícula divergente encontrada para inserir.")
+        if last_union:
+            df_news['SINDICATO'] = df_news['SINDICATO'].fillna(last_union)
 
-        df_report.to_sql('report', conn, if_exists='replace', index=False)
-        logger.info("✅ Admitidos processados e registros existentes atualizados")
+        df_news['ESTADO'] = resolve_states(df_news['SINDICATO'], resolver)
+
+        df_news = df_news[df_news['SINDICATO'].notna() & (df_news['SINDICATO'] != '')]
+
+        if not df_news.empty:
+            df_report = append_rows(df_report, df_news)
+            logger.info(f"✅ Adicionadas {len(df_news)} novas admissões ao report herdando sindicato do último registro")
+        else:
+            logger.info("⚠️ Havia novas matrículas, mas nenhuma com sindicato após tentativa de herdar. Nenhuma inserida.")
+    else:
+        logger.info("⚠️ Nenhuma matrícula divergente encontrada para inserir.")
+
+    logger.info("✅ Admitidos processados e registros existentes atualizados")
+    return df_report
+
+def process_admissions(
+    db_path: str,
+    df_admissions: pd.DataFrame,
+    df_actives: pd.DataFrame,
+    sources: Optional[Mapping[str, pd.DataFrame]] = None,
+    engine: Optional[EligibilityEngine] = None
+):
+    """
+    Processa admissões do mês lendo e regravando a tabela report; admitidos não elegíveis
+    (aprendizes, estagiários, diretores...) não entram, como em process_actives.
+    """
+    df_report = load_report(db_path)
+    df_report = apply_admissions(
+        df_report, df_admissions, df_actives, default_union=last_eligible_union(df_report, sources, engine)
+    )
+    df_report, _ = apply_eligibility(df_report, sources, engine)
+    save_report(db_path, df_report)
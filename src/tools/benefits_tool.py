@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+from src.logger.logger import logger
+from src.report_store import load_report, save_report
+from src.utils import parse_competencia
+
+COMPANY_SHARE = 0.80
+EMPLOYEE_SHARE = 0.20
+FULL_MONTH_BUSINESS_DAYS = (21, 22)
+
+OBS_DISMISSAL_UNTIL_15 = "Desligamento até dia 15 - Verificar elegibilidade"
+OBS_DISMISSAL_AFTER_15 = "Desligamento após dia 15 - Valor proporcional"
+OBS_ADMISSION_IN_MONTH = "Admissão no mês - Valor proporcional"
+OBS_VACATION = "Férias - Valor proporcional"
+OBS_ACTIVE = "Funcionário ativo - Valor integral"
+
+def calculate_benefits(df_base: pd.DataFrame, competencia: str) -> pd.DataFrame:
+    """
+    Calcula os benefícios VR/VA do report em memória, com as mesmas regras do prompt do LLM:
+      - TOTAL = DIAS_UTEIS * VALOR_DIARIO (nulos tratados como 0);
+      - CUSTO_EMPRESA = 80% do TOTAL e CUSTO_PROFISSIONAL = 20% do TOTAL;
+      - OBS_GERAL conforme desligamento, admissão no mês, férias ou valor integral.
+    Todos os valores são arredondados em 2 casas decimais.
+    """
+    month, year = parse_competencia(competencia)
+
+    missing = pd.Series(np.nan, index=df_base.index)
+    business_days = pd.to_numeric(df_base.get('DIAS_UTEIS', missing), errors="coerce").fillna(0)
+    daily_value = pd.to_numeric(df_base.get('VALOR_DIARIO', missing), errors="coerce").fillna(0)
+
+    total = (business_days * daily_value).round(2)
+    df_base['TOTAL'] = total
+    df_base['CUSTO_EMPRESA'] = (total * COMPANY_SHARE).round(2)
+    df_base['CUSTO_PROFISSIONAL'] = (total * EMPLOYEE_SHARE).round(2)
+
+    dismissal = pd.to_datetime(df_base.get('DATA_DEMISSAO', missing), errors="coerce")
+    admission = pd.to_datetime(df_base.get('ADMISSAO', missing), errors="coerce")
+
+    conditions = [
+        dismissal.notna() & (dismissal.dt.day <= 15),
+        dismissal.notna() & (dismissal.dt.day > 15),
+        (admission.dt.month == month) & (admission.dt.year == year),
+        ~business_days.isin(FULL_MONTH_BUSINESS_DAYS),
+    ]
+    choices = [OBS_DISMISSAL_UNTIL_15, OBS_DISMISSAL_AFTER_15, OBS_ADMISSION_IN_MONTH, OBS_VACATION]
+    df_base['OBS_GERAL'] = np.select(conditions, choices, default=OBS_ACTIVE)
+
+    logger.info(f"✅ Benefícios calculados localmente para {len(df_base)} registros")
+    return df_base
+
+def process_benefits(db_path: str, competencia: str):
+    """Calcula os benefícios VR/VA lendo e regravando a tabela report."""
+    df_base = load_report(db_path)
+    save_report(db_path, calculate_benefits(df_base, competencia))
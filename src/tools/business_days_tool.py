@@ -1,85 +1,131 @@
+import numpy as np
 import pandas as pd
-import sqlite3
-from src.state_union import infer_state_from_union
+from src.state_union import UnionStateResolver, resolve_states
 
 from src.logger.logger import logger
+from src.business_calendar import calendar_for, competencia_period
+from src.rate_tables import DEFAULT_BUSINESS_DAYS_BY_STATE, RateTables, default_rate_tables
+from src.report_store import load_report, save_report
 
-BUSINESS_DAYS_BY_STATE = {
-    "São Paulo": 22,
-    "Rio de Janeiro": 21,
-    "Rio Grande do Sul": 21,
-    "Paraná": 22
-}
+BUSINESS_DAYS_BY_STATE = DEFAULT_BUSINESS_DAYS_BY_STATE
 
-PERIOD_START = pd.to_datetime("2025-04-15")
-PERIOD_END = pd.to_datetime("2025-05-15")
+# Competência usada quando nenhuma é informada às ferramentas.
+DEFAULT_COMPETENCIA = "05-2025"
+PERIOD_START, PERIOD_END = competencia_period(DEFAULT_COMPETENCIA)
 
-def business_days_between(start, end, holidays=None):
-    """Conta dias úteis entre start e end, excluindo feriados se fornecidos."""
-    if pd.isna(start) or pd.isna(end) or end < start:
-        return 0
-    rng = pd.bdate_range(start=start, end=end, holidays=holidays)
-    return len(rng)
+def period_of(competencia: str = None):
+    """Início e fim do período de apuração da competência (padrão: DEFAULT_COMPETENCIA)."""
+    return competencia_period(competencia) if competencia else (PERIOD_START, PERIOD_END)
 
-def calculates_proportional_days(state: str, admission, dismisseds, holidays_days: int, holidays_by_state: dict = None):
+def count_business_days(starts, ends, holidays=None) -> np.ndarray:
     """
-    Calcula dias úteis proporcionais entre periodo incial e preiodo final,
-    considerando admissão, demissão, férias e feriados.
+    Conta, de forma vetorizada, os dias úteis no intervalo fechado [start, end] de cada par,
+    excluindo os feriados fornecidos (padrão: os nacionais). Pares com data ausente ou
+    end < start resultam em 0. Usa o calendário pré-computado (soma prefixada) do conjunto de feriados.
     """
-    total_days = BUSINESS_DAYS_BY_STATE.get(state, 0)
-    if total_days == 0:
-        return 0
-
-    start = PERIOD_START if pd.isna(admission) else max(PERIOD_START, pd.to_datetime(admission))
-    end = PERIOD_END if pd.isna(dismisseds) else min(PERIOD_END, pd.to_datetime(dismisseds))
-    if start > end:
-        return 0
-
-    holidays = None
-    if holidays_by_state and state in holidays_by_state:
-        holidays = holidays_by_state[state]
-
-    total_bd_period = business_days_between(PERIOD_START, PERIOD_END, holidays=holidays)
-    bd_between = business_days_between(start, end, holidays=holidays)
-
-    if total_bd_period == 0:
-        days_period = (end - start).days + 1
-        total_period = (PERIOD_END - PERIOD_START).days + 1
-        days = int(round(total_days * days_period / total_period))
-    else:
-        days = int(round(total_days * bd_between / total_bd_period))
+    return calendar_for(holidays).count(starts, ends)
 
-    days -= int(holidays_days or 0)
-    return max(0, days)
+def business_days_between(start, end, holidays=None):
+    """Conta dias úteis entre start e end, excluindo os feriados fornecidos (padrão: os nacionais)."""
+    return int(count_business_days([start], [end], holidays)[0])
+
+def calculates_proportional_days(
+    df_base: pd.DataFrame,
+    holidays_by_state: dict = None,
+    rates: RateTables = None,
+    competencia: str = None
+) -> pd.Series:
+    """
+    Calcula, para todo o DataFrame de uma vez, os dias úteis proporcionais entre periodo
+    inicial e periodo final da competência, considerando admissão, demissão, férias e
+    feriados por estado. Os dias úteis cheios vêm das tabelas de parâmetros (por sindicato,
+    depois por estado).
+    """
+    n = len(df_base)
+    period_start, period_end = period_of(competencia)
+    rates = rates or default_rate_tables
+    unions = df_base['SINDICATO'] if 'SINDICATO' in df_base.columns else pd.Series(None, index=df_base.index, dtype=object)
+    total_days = rates.business_days(unions, df_base['ESTADO'])
+
+    admission = pd.to_datetime(df_base['ADMISSAO'], errors="coerce") if 'ADMISSAO' in df_base.columns else pd.Series(pd.NaT, index=df_base.index)
+    dismissed = pd.to_datetime(df_base['DATA_DEMISSAO'], errors="coerce") if 'DATA_DEMISSAO' in df_base.columns else pd.Series(pd.NaT, index=df_base.index)
+
+    start = admission.where(admission > period_start, period_start)
+    end = dismissed.where(dismissed < period_end, period_end)
+    in_period = (start <= end).to_numpy()
+
+    bd_between = np.zeros(n, dtype=np.int64)
+    total_bd_period = np.zeros(n, dtype=np.int64)
+    states = df_base['ESTADO'].to_numpy()
+    calendars = holidays_by_state or {}
+
+    # Um grupo por calendário de feriados: estados sem calendário compartilham o grupo padrão
+    # (feriados nacionais, ver calendar_for).
+    groups = {state: states == state for state in calendars}
+    default_mask = ~np.isin(states, list(calendars)) if calendars else np.ones(n, dtype=bool)
+    groups[None] = default_mask
+
+    for state, mask in groups.items():
+        if not mask.any():
+            continue
+        holidays = calendars.get(state) if state is not None else None
+        bd_between[mask] = count_business_days(start[mask], end[mask], holidays)
+        total_bd_period[mask] = business_days_between(period_start, period_end, holidays)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(
+            total_bd_period == 0,
+            ((end - start).dt.days + 1).to_numpy(dtype=float) / ((period_end - period_start).days + 1),
+            bd_between / total_bd_period
+        )
 
+    holidays_days = pd.to_numeric(df_base['DIAS_DE_FERIAS'], errors="coerce").fillna(0).to_numpy() if 'DIAS_DE_FERIAS' in df_base.columns else 0
+    days = np.rint(total_days * ratio) - holidays_days
+    days = np.where((total_days == 0) | ~in_period, 0, days)
+    return pd.Series(np.maximum(0, days).astype(int), index=df_base.index)
 
-def process_business_days(db_path: str, holidays_by_state: dict = None):
-    """Atualiza coluna DIAS_UTEIS considerando admissões, demissões e férias."""
-    with sqlite3.connect(db_path) as conn:
-        df_base = pd.read_sql('SELECT * FROM report', conn)
-
-        for col in ["ADMISSAO", "DATA_DEMISSAO"]:
-            if col in df_base.columns:
-                df_base[col] = pd.to_datetime(df_base[col], errors="coerce")
-
-        if 'DIAS_DE_FERIAS' not in df_base.columns:
-            df_base['DIAS_DE_FERIAS'] = 0
-        else:
-            df_base['DIAS_DE_FERIAS'] = df_base['DIAS_DE_FERIAS'].fillna(0).astype(int)
-
-        df_base['ESTADO'] = df_base['SINDICATO'].apply(infer_state_from_union)
-
-        df_base['DIAS_UTEIS'] = df_base.apply(
-            lambda row: calculates_proportional_days(
-                row['ESTADO'],
-                row.get('ADMISSAO'),
-                row.get('DATA_DEMISSAO'),
-                row.get('DIAS_DE_FERIAS', 0),
-                holidays_by_state
-            ),
-            axis=1
-        )
 
-        df_base.to_sql('report', conn, if_exists='replace', index=False)
+def prepare_business_days_columns(df_base: pd.DataFrame) -> pd.DataFrame:
+    """Normaliza as colunas usadas no cálculo de dias úteis (datas e dias de férias)."""
+    for col in ["ADMISSAO", "DATA_DEMISSAO"]:
+        if col in df_base.columns:
+            df_base[col] = pd.to_datetime(df_base[col], errors="coerce")
 
-    logger.info("✅ Dias úteis proporcionais processados com sucesso")
\ No newline at end of file
+    if 'DIAS_DE_FERIAS' not in df_base.columns:
+        df_base['DIAS_DE_FERIAS'] = 0
+    else:
+        df_base['DIAS_DE_FERIAS'] = df_base['DIAS_DE_FERIAS'].fillna(0).astype(int)
+    return df_base
+
+def apply_business_days(
+    df_base: pd.DataFrame,
+    holidays_by_state: dict = None,
+    rows: np.ndarray = None,
+    resolver: UnionStateResolver = None,
+    rates: RateTables = None,
+    competencia: str = None
+) -> pd.DataFrame:
+    """
+    Calcula a coluna DIAS_UTEIS do report em memória considerando admissões, demissões e férias.
+    Com rows (máscara booleana), ESTADO e DIAS_UTEIS são calculados apenas nessas linhas e as
+    demais mantêm os valores já presentes (modo incremental). O ESTADO vem do resolvedor de
+    sindicatos e os dias úteis das tabelas de parâmetros (padrões quando não informados).
+    """
+    prepare_business_days_columns(df_base)
+
+    if rows is None:
+        df_base['ESTADO'] = resolve_states(df_base['SINDICATO'], resolver)
+        df_base['DIAS_UTEIS'] = calculates_proportional_days(df_base, holidays_by_state, rates, competencia)
+    elif rows.any():
+        # Atribuição parcial: ESTADO volta a texto para aceitar estados fora das categorias atuais.
+        df_base['ESTADO'] = df_base['ESTADO'].astype(object) if 'ESTADO' in df_base.columns else None
+        df_base.loc[rows, 'ESTADO'] = resolve_states(df_base.loc[rows, 'SINDICATO'], resolver).to_numpy()
+        df_base.loc[rows, 'DIAS_UTEIS'] = calculates_proportional_days(df_base.loc[rows], holidays_by_state, rates, competencia).to_numpy()
+
+    logger.info("✅ Dias úteis proporcionais processados com sucesso")
+    return df_base
+
+def process_business_days(db_path: str, holidays_by_state: dict = None, rates: RateTables = None, competencia: str = None):
+    """Atualiza coluna DIAS_UTEIS considerando admissões, demissões e férias."""
+    df_base = load_report(db_path)
+    save_report(db_path, apply_business_days(df_base, holidays_by_state, rates=rates, competencia=competencia))
@@ -1,57 +1,69 @@
+import numpy as np
 import pandas as pd
-import sqlite3
+
+from typing import Optional
 
 from src.logger.logger import logger
+from src.report_store import load_report, save_report
+from src.report_index import append_rows, keyed_report, keyed_updates, new_rows, update_rows
 
-def process_fired(db_path: str, df_dismisseds: pd.DataFrame):
+def apply_fired(df_base: pd.DataFrame, df_dismisseds: pd.DataFrame, default_union: Optional[str] = None) -> pd.DataFrame:
     """
-    Processa desligamentos:
+    Aplica os desligamentos sobre o report em memória:
       - Remove desligados até dia 15 com comunicado OK;
       - Mantém/adiciona desligados até dia 15 sem comunicado (Integral);
       - Ignora desligados após dia 16 (Proporcional, tratado em rescisão);
-      - Novos desligados válidos recebem sindicato do último registro.
+      - Novos desligados válidos recebem default_union (ver last_eligible_union) ou, na
+        falta dele, o sindicato do último registro.
+
+    O report é indexado pela MATRICULA e apenas as linhas dos desligados são tocadas.
     """
     
     df_dis = df_dismisseds.copy()
+    df_dis.columns = df_dis.columns.str.strip()
     df_dis.rename(columns={
         'DATA DEMISSÃO': 'DATA_DEMISSAO',
         'COMUNICADO DE DESLIGAMENTO': 'COMUNICADO_DESLIGAMENTO'
     }, inplace=True)
     df_dis['DATA_DEMISSAO'] = pd.to_datetime(df_dis['DATA_DEMISSAO'], dayfirst=True, errors='coerce')
-    df_dis['MATRICULA'] = df_dis['MATRICULA'].astype(str).str.strip()
-
-    def payment(row):
-        if pd.isna(row['DATA_DEMISSAO']):
-            return 'Ignorar', ''
-        day = row['DATA_DEMISSAO'].day
-        if day <= 15:
-            if str(row.get('COMUNICADO_DESLIGAMENTO')).strip().upper() == 'OK':
-                return 'Excluir', ''
-            else:
-                return 'Integral', ''
-        else:
-            return 'Proporcional', 'Desconto proporcional em rescisão'
-
-    df_dis[['TIPO_PAGAMENTO', 'OBS_GERAL']] = df_dis.apply(lambda r: pd.Series(payment(r)), axis=1)
+    df_dis = keyed_updates(df_dis)
+
+    day = df_dis['DATA_DEMISSAO'].dt.day
+    if 'COMUNICADO_DESLIGAMENTO' in df_dis.columns:
+        notified = df_dis['COMUNICADO_DESLIGAMENTO'].astype(str).str.strip().str.upper() == 'OK'
+    else:
+        notified = pd.Series(False, index=df_dis.index)
+
+    no_date = df_dis['DATA_DEMISSAO'].isna()
+    until_15 = ~no_date & (day <= 15)
+    df_dis['TIPO_PAGAMENTO'] = np.select(
+        [no_date, until_15 & notified, until_15],
+        ['Ignorar', 'Excluir', 'Integral'],
+        default='Proporcional'
+    )
+    df_dis['OBS_GERAL'] = np.where(~no_date & ~until_15, 'Desconto proporcional em rescisão', '')
 
     df_valid = df_dis[df_dis['TIPO_PAGAMENTO'] == 'Integral'].copy()
 
-    with sqlite3.connect(db_path) as conn:
-        df_base = pd.read_sql('SELECT * FROM report', conn)
-        df_base['MATRICULA'] = df_base['MATRICULA'].astype(str).str.strip()
-
-        df_merge = df_base.merge(df_valid, on="MATRICULA", how="left", suffixes=("", "_DIS"))
-        for col in ["DATA_DEMISSAO", "COMUNICADO_DESLIGAMENTO", "TIPO_PAGAMENTO", "OBS_GERAL"]:
-            if col + "_DIS" in df_merge.columns:
-                df_merge[col] = df_merge[col].combine_first(df_merge[col + "_DIS"])
-                df_merge.drop(columns=[col + "_DIS"], inplace=True)
-
-        df_news = df_valid[~df_valid['MATRICULA'].isin(df_base['MATRICULA'])].copy()
-
-        if not df_news.empty:
-            last_union = df_base['SINDICATO'].iloc[-1] if 'SINDICATO' in df_base.columns else None
-            df_news['SINDICATO'] = last_union
-            df_merge = pd.concat([df_merge, df_news], ignore_index=True)
-            
-        df_merge.to_sql('report', conn, if_exists='replace', index=False)
-        logger.info(f"✅ Desligamentos processados: {len(df_valid)} registros Integral adicionados")
\ No newline at end of file
+    df_base = keyed_report(df_base)
+
+    # Valores já presentes no report prevalecem; os do desligamento só preenchem lacunas.
+    columns = [c for c in df_valid.columns if c != 'MATRICULA']
+    df_merge = update_rows(df_base, df_valid, columns, overwrite=False)
+
+    df_news = new_rows(df_merge, df_valid).copy()
+
+    if not df_news.empty:
+        last_union = default_union
+        if last_union is None and 'SINDICATO' in df_merge.columns:
+            last_union = df_merge['SINDICATO'].iloc[-1]
+        df_news['SINDICATO'] = last_union
+        df_merge = append_rows(df_merge, df_news)
+        
+    logger.info(f"✅ Desligamentos processados: {len(df_valid)} registros Integral adicionados")
+    return df_merge
+
+def process_fired(db_path: str, df_dismisseds: pd.DataFrame):
+    """Processa desligamentos lendo e regravando a tabela report."""
+    df_base = load_report(db_path)
+    save_report(db_path, apply_fired(df_base, df_dismisseds))
@@ -0,0 +1,50 @@
+import pandas as pd
+
+from typing import Dict, Mapping, Optional, Tuple
+
+from src.eligibility import EligibilityEngine, default_engine
+from src.logger.logger import logger
+from src.report_store import load_report, save_report
+
+def apply_eligibility(
+    df_report: pd.DataFrame,
+    sources: Optional[Mapping[str, pd.DataFrame]] = None,
+    engine: EligibilityEngine = None
+) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    """
+    Remove do report em memória os colaboradores não elegíveis ao VR: cargo e situação
+    (aprendiz, estagiário, diretor, licença maternidade, auxílio doença) e as matrículas
+    das planilhas AFASTAMENTOS, APRENDIZ, ESTÁGIO e EXTERIOR, todas avaliadas em uma passada.
+
+    Retorna o report filtrado e o nº de linhas atingidas por regra (uma linha pode atingir várias).
+    """
+    engine = engine or default_engine
+    result = engine.evaluate(df_report, sources)
+    hits = {**result.hits, "total_excluidos": int(result.excluded.sum())}
+
+    if result.excluded.any():
+        df_report = df_report[~result.excluded]
+    logger.info(f"✅ Elegibilidade aplicada: {hits['total_excluidos']} excluídos, {len(df_report)} elegíveis {result.hits}")
+    return df_report, hits
+
+def last_eligible_union(
+    df_report: pd.DataFrame,
+    sources: Optional[Mapping[str, pd.DataFrame]] = None,
+    engine: EligibilityEngine = None
+) -> Optional[str]:
+    """
+    Sindicato do último registro elegível do report, herdado por admissões e desligados novos
+    sem sindicato. As exclusões rodam depois dessas etapas, então registros que serão removidos
+    (diretores, exterior...) não podem ser a origem do sindicato herdado.
+    """
+    if df_report.empty or 'SINDICATO' not in df_report.columns:
+        return None
+    engine = engine or default_engine
+    unions = df_report['SINDICATO'][~engine.evaluate(df_report, sources).excluded].dropna()
+    return unions.iloc[-1] if not unions.empty else None
+
+def process_eligibility(db_path: str, sources: Optional[Mapping[str, pd.DataFrame]] = None) -> Dict[str, int]:
+    """Aplica as regras de elegibilidade sobre a tabela report."""
+    df_report, hits = apply_eligibility(load_report(db_path), sources)
+    save_report(db_path, df_report)
+    return hits
@@ -1,31 +1,32 @@
-import sqlite3
 import pandas as pd
 
 from src.logger.logger import logger
+from src.rate_tables import DEFAULT_DAILY_VALUE_BY_STATE, RateTables, default_rate_tables
+from src.report_store import load_report, save_report
 
-def process_daily_values(db_path: str):
-    """Atualiza valores diários e inicializa campos de cálculo."""
+DAILY_VALUE_BY_STATE = DEFAULT_DAILY_VALUE_BY_STATE
 
-    DAILY_VALUE_BY_STATE = {
-        "Paraná": 35.0,
-        "Rio de Janeiro": 35.0,
-        "Rio Grande do Sul": 35.0,
-        "São Paulo": 37.5
-    }
+def apply_daily_values(df_base: pd.DataFrame, rates: RateTables = None) -> pd.DataFrame:
+    """
+    Aplica valores diários ao report em memória e inicializa campos de cálculo. Os valores
+    por estado vêm das tabelas de parâmetros (Base_sindicato_x_valor ou os valores padrão).
+    """
+    rates = rates or default_rate_tables
+    df_base['VALOR_DIARIO'] = rates.daily_values(df_base['ESTADO'])
 
-    with sqlite3.connect(db_path) as conn:
-        df_base = pd.read_sql('SELECT * FROM report', conn)
-        df_base['VALOR_DIARIO'] = df_base['ESTADO'].map(DAILY_VALUE_BY_STATE).fillna(0.0)
-
-        if 'TOTAL' not in df_base.columns:
-            df_base['TOTAL'] = 0.0
-        if 'CUSTO_EMPRESA' not in df_base.columns:
-            df_base['CUSTO_EMPRESA'] = 0.0
-        if 'CUSTO_PROFISSIONAL' not in df_base.columns:
-            df_base['CUSTO_PROFISSIONAL'] = 0.0
-        if 'OBS_GERAL' not in df_base.columns:
-            df_base['OBS_GERAL'] = ""
-
-        df_base.to_sql('report', conn, if_exists='replace', index=False)
+    if 'TOTAL' not in df_base.columns:
+        df_base['TOTAL'] = 0.0
+    if 'CUSTO_EMPRESA' not in df_base.columns:
+        df_base['CUSTO_EMPRESA'] = 0.0
+    if 'CUSTO_PROFISSIONAL' not in df_base.columns:
+        df_base['CUSTO_PROFISSIONAL'] = 0.0
+    if 'OBS_GERAL' not in df_base.columns:
+        df_base['OBS_GERAL'] = ""
 
     logger.info("✅ Valores diários aplicados por estado")
+    return df_base
+
+def process_daily_values(db_path: str, rates: RateTables = None):
+    """Atualiza valores diários e inicializa campos de cálculo na tabela report."""
+    df_base = load_report(db_path)
+    save_report(db_path, apply_daily_values(df_base, rates))
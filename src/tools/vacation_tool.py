@@ -1,23 +1,83 @@
 import pandas as pd
-import sqlite3
+
+from typing import Tuple
 
 from src.logger.logger import logger
+from src.report_store import load_report, save_report
+from src.report_index import add_to_column, keyed_report, match_rows, normalize_keys
+from src.tools.business_days_tool import business_days_between, count_business_days, period_of
+
+def vacation_on_period(
+    df_v: pd.DataFrame,
+    competencia: str = None,
+    holidays_by_state: dict = None,
+    states: pd.Series = None
+) -> Tuple[pd.Series, pd.Series]:
+    """
+    Dias úteis de férias dentro do período da competência para todas as linhas de uma vez:
+    usa DT_INICIO/DT_FIM quando preenchidos e, caso contrário, DIAS_DE_FÉRIAS limitado ao total
+    de dias úteis do período. As contagens e o teto usam o mesmo calendário do cálculo de
+    DIAS_UTEIS: o do estado da linha (states, alinhado a df_v) em holidays_by_state ou, na falta
+    dele, os feriados nacionais.
+
+    Retorna os dias de cada linha e se eles cobrem todos os dias úteis do período no calendário.
+    """
+    period_start, period_end = period_of(competencia)
+    days = pd.Series(0, index=df_v.index, dtype="int64")
+    period_days = pd.Series(0, index=df_v.index, dtype="int64")
+
+    has_range = pd.Series(False, index=df_v.index)
+    if "DT_INICIO" in df_v.columns and "DT_FIM" in df_v.columns:
+        has_range = df_v["DT_INICIO"].notna() & df_v["DT_FIM"].notna()
+
+    calendars = holidays_by_state or {}
+    states = states if states is not None else pd.Series(None, index=df_v.index, dtype=object)
+    # Um grupo por calendário de feriados, como em calculates_proportional_days.
+    groups = {state: states == state for state in calendars}
+    groups[None] = ~states.isin(list(calendars))
+
+    for state, mask in groups.items():
+        if not mask.any():
+            continue
+        holidays = calendars.get(state) if state is not None else None
+        max_bd = business_days_between(period_start, period_end, holidays)
+        period_days[mask] = max_bd
 
-STAR_PERIOD = pd.to_datetime("2025-04-15")
-END_PERIOD = pd.to_datetime("2025-05-15")
+        rows = mask & has_range
+        if rows.any():
+            start = df_v.loc[rows, "DT_INICIO"].clip(lower=period_start)
+            end = df_v.loc[rows, "DT_FIM"].clip(upper=period_end)
+            days[rows] = count_business_days(start, end, holidays)
 
-def business_days_between(start, end):
-    if pd.isna(start) or pd.isna(end) or end < start:
-        return 0
-    return len(pd.bdate_range(start, end))
+        rows = mask & ~has_range
+        if "DIAS_DE_FÉRIAS" in df_v.columns and rows.any():
+            days[rows] = df_v.loc[rows, "DIAS_DE_FÉRIAS"].clip(upper=max_bd)
 
-def process_vacation(db_path: str, df_vacation: pd.DataFrame):
+    return days, (days >= period_days) & (period_days > 0)
+
+def calc_holidays_on_period(
+    df_v: pd.DataFrame,
+    competencia: str = None,
+    holidays_by_state: dict = None,
+    states: pd.Series = None
+) -> pd.Series:
+    """Dias úteis de férias de cada linha dentro do período da competência (ver vacation_on_period)."""
+    return vacation_on_period(df_v, competencia, holidays_by_state, states)[0]
+
+def apply_vacation(
+    df_report: pd.DataFrame,
+    df_vacation: pd.DataFrame,
+    competencia: str = None,
+    holidays_by_state: dict = None
+) -> pd.DataFrame:
     """
-    Atualiza dias úteis subtraindo os dias de férias que caem no período 15/04/2025 - 15/05/2025.
+    Atualiza dias úteis do report em memória subtraindo os dias de férias que caem no período
+    da competência (ex: 05-2025 -> 15/04/2025 a 15/05/2025), no calendário do ESTADO de cada um.
+    A subtração é aplicada pelo índice de MATRICULA, somente nas linhas de quem tem férias.
     """
     df_v = df_vacation.copy()
     df_v.rename(columns=lambda c: c.strip().upper().replace(" ", "_"), inplace=True)
-    df_v["MATRICULA"] = df_v["MATRICULA"].astype(str).str.strip()
+    df_v["MATRICULA"] = normalize_keys(df_v["MATRICULA"])
 
     if "DIAS_DE_FÉRIAS" in df_v.columns:
         df_v["DIAS_DE_FÉRIAS"] = pd.to_numeric(df_v["DIAS_DE_FÉRIAS"], errors="coerce").fillna(0).astype(int)
@@ -27,34 +87,31 @@ def process_vacation(db_path: str, df_vacation: pd.DataFrame):
     if "DT_FIM" in df_v.columns:
         df_v["DT_FIM"] = pd.to_datetime(df_v["DT_FIM"], errors="coerce")
 
-    def calc_holidays_on_period(row):
-        if "DT_INICIO" in row and "DT_FIM" in row and pd.notna(row["DT_INICIO"]) and pd.notna(row["DT_FIM"]):
-            start = max(STAR_PERIOD, row["DT_INICIO"])
-            end = min(END_PERIOD, row["DT_FIM"])
-            return business_days_between(start, end) if end >= start else 0
-        elif "DIAS_DE_FÉRIAS" in row:
-            max_bd = business_days_between(STAR_PERIOD, END_PERIOD)
-            return min(int(row["DIAS_DE_FÉRIAS"] or 0), max_bd)
-        return 0
-
-    df_v["FERIAS_NO_PERIODO"] = df_v.apply(calc_holidays_on_period, axis=1)
-    df_v_agg = df_v.groupby("MATRICULA", as_index=False)["FERIAS_NO_PERIODO"].sum()
-
-    with sqlite3.connect(db_path) as conn:
-        df_report = pd.read_sql("SELECT * FROM report", conn)
-        df_report["MATRICULA"] = df_report["MATRICULA"].astype(str).str.strip()
-
-        df_merge = df_report.merge(df_v_agg, on="MATRICULA", how="left")
-        df_merge["FERIAS_NO_PERIODO"] = df_merge["FERIAS_NO_PERIODO"].fillna(0).astype(int)
-
-        df_merge["DIAS_UTEIS"] = pd.to_numeric(df_merge["DIAS_UTEIS"], errors="coerce").fillna(0).astype(int)
-        df_merge["DIAS_UTEIS"] = (
-            df_merge["DIAS_UTEIS"] - df_merge["FERIAS_NO_PERIODO"]
-        )
-        
-        df_merge = df_merge[df_merge["DIAS_UTEIS"] > 0].copy()
-
-        df_merge.drop(columns=["FERIAS_NO_PERIODO"], inplace=True)
-        df_merge.to_sql("report", conn, if_exists="replace", index=False)
-    logger.info(f"✅ Processados {len(df_v)} registros com dias de férias!")    
-    
\ No newline at end of file
+    df_report = keyed_report(df_report)
+    states = None
+    if "ESTADO" in df_report.columns:
+        state_by_key = df_report["ESTADO"][~df_report.index.duplicated(keep="last")]
+        states = df_v["MATRICULA"].map(state_by_key)
+
+    df_v["FERIAS_NO_PERIODO"], df_v["PERIODO_INTEGRAL"] = vacation_on_period(df_v, competencia, holidays_by_state, states)
+    holidays_by_key = df_v.groupby("MATRICULA")["FERIAS_NO_PERIODO"].sum()
+    whole_period = df_v.groupby("MATRICULA")["PERIODO_INTEGRAL"].any()
+
+    if df_report["DIAS_UTEIS"].dtype.kind not in "iu":
+        df_report["DIAS_UTEIS"] = pd.to_numeric(df_report["DIAS_UTEIS"], errors="coerce").fillna(0).astype(int)
+
+    df_report = add_to_column(df_report, "DIAS_UTEIS", -holidays_by_key.astype(int))
+    # Férias em todos os dias úteis do calendário zeram o mês, mesmo quando a Base_dias_uteis
+    # conta mais dias do que o calendário de feriados (ex: 21 x 20 em 05-2025).
+    report_pos, _ = match_rows(df_report, whole_period.index[whole_period.to_numpy()])
+    if len(report_pos):
+        df_report.iloc[report_pos, df_report.columns.get_loc("DIAS_UTEIS")] = 0
+
+    df_merge = df_report[df_report["DIAS_UTEIS"] > 0].copy()
+    logger.info(f"✅ Processados {len(df_v)} registros com dias de férias!")
+    return df_merge
+
+def process_vacation(db_path: str, df_vacation: pd.DataFrame, competencia: str = None, holidays_by_state: dict = None):
+    """Processa férias lendo e regravando a tabela report."""
+    df_report = load_report(db_path)
+    save_report(db_path, apply_vacation(df_report, df_vacation, competencia, holidays_by_state))
@@ -1,20 +1,42 @@
+import os
+import re
 import pandas as pd
-import sqlite3
 import unicodedata
 
-from typing import Any, List
+from typing import Any, List, Tuple
+
+from src.db import connection
 
 DB_PATH = "database.db"
+# Base dos dados mantidos entre execuções (cache de planilhas, snapshots e arquivo colunar): a raiz
+# do projeto, e não o diretório de trabalho, para que a interface, o lote e o serviço usem os mesmos.
+DATA_DIR = os.path.abspath(os.environ.get(
+    "VRVA_DATA_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache")
+))
+
+def data_dir(name: str, env_var: str) -> str:
+    """Subdiretório de DATA_DIR, ou o caminho dado em env_var, sempre absoluto."""
+    return os.path.abspath(os.environ.get(env_var) or os.path.join(DATA_DIR, name))
 
 def strip_accents(s: str) -> str:
     if not isinstance(s, str):
         return ""
     return "".join(c for c in unicodedata.normalize("NFD", s) if unicodedata.category(c) != "Mn")
 
+def parse_competencia(competencia: str) -> Tuple[int, int]:
+    """Converte a competência (ex: 05-2025, 05.2025 ou 05/2025) em (mês, ano)."""
+    match = re.fullmatch(r"\s*(\d{1,2})\s*[-./]\s*(\d{4})\s*", str(competencia))
+    if not match:
+        raise ValueError(f"Competência inválida: '{competencia}'. Use o formato MM-AAAA.")
+    month, year = int(match.group(1)), int(match.group(2))
+    if not 1 <= month <= 12:
+        raise ValueError(f"Competência inválida: '{competencia}'. Mês deve estar entre 01 e 12.")
+    return month, year
+
 def get_table_structure(self) -> str:
     """Obtém estrutura atual da tabela report."""
     try:
-        with sqlite3.connect(self.db_path) as conn:
+        with connection(self.db_path) as conn:
             # Obter schema da tabela
             cursor = conn.cursor()
             cursor.execute("PRAGMA table_info(report)")
@@ -0,0 +1,38 @@
+import threading
+
+import pytest
+
+from src import agent as agent_module
+from src.agent import cached_agent
+
+def test_cache_key_holds_only_a_hash_of_the_api_key():
+    agent = cached_agent("sk-segredo-cache", "local")
+
+    assert cached_agent("sk-segredo-cache", "local") is agent
+    assert cached_agent("sk-outra-chave", "local") is not agent
+    assert not any("sk-segredo-cache" in map(str, key) for key in agent_module._agents)
+
+def test_shared_agent_keeps_no_per_run_files(tmp_path):
+    agent = cached_agent("", "local", archive_dir=str(tmp_path))
+    first = agent.initial_state("05-2025", db_path=str(tmp_path / "a.db"), files=["ATIVOS.xlsx"])
+    second = agent.initial_state("05-2025", db_path=str(tmp_path / "b.db"))
+
+    assert first["files"] == ["ATIVOS.xlsx"] and second["files"] == []
+    with pytest.raises(RuntimeError, match="compartilhado"):
+        agent.set_files(["ATIVOS.xlsx"])
+    assert agent.files == []
+
+def test_concurrent_callers_share_one_agent(tmp_path):
+    agents, barrier = [], threading.Barrier(4)
+
+    def worker():
+        barrier.wait()
+        agents.append(cached_agent("", "local", archive_dir=str(tmp_path / "concorrente")))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(a) for a in agents}) == 1
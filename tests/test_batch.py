@@ -0,0 +1,48 @@
+import glob
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from src.batch import SUMMARY_FILE, discover_competencias, normalize_competencia, run_batch
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+@pytest.mark.parametrize("name, expected", [
+    ("05-2025", "05-2025"),
+    ("5.2025", "05-2025"),
+    ("2025-05", "05-2025"),
+    ("2025_12", "12-2025"),
+    ("13-2025", None),
+    ("maio", None),
+])
+def test_normalize_competencia(name, expected):
+    assert normalize_competencia(name) == expected
+
+def test_discover_competencias_in_chronological_order(tmp_path):
+    for name in ["2025-05", "12-2024", "rascunho"]:
+        (tmp_path / name).mkdir()
+    (tmp_path / "06-2025.txt").write_text("")
+
+    assert [c for c, _ in discover_competencias(str(tmp_path))] == ["12-2024", "05-2025"]
+
+def test_run_batch_writes_reports_and_consolidated_summary(tmp_path):
+    month = tmp_path / "in" / "05-2025"
+    month.mkdir(parents=True)
+    for path in glob.glob(os.path.join(DATA_DIR, "*.xlsx")):
+        if not os.path.basename(path).startswith("VR MENSAL"):
+            shutil.copy(path, month)
+    (tmp_path / "in" / "06-2025").mkdir()
+    output = tmp_path / "out"
+
+    summary = run_batch(str(tmp_path / "in"), str(output), workers=1)
+
+    assert summary["Competência"].tolist() == ["05-2025", "06-2025"]
+    ok, empty = summary.iloc[0], summary.iloc[1]
+    assert ok["Status"] == "ok" and ok["Colaboradores"] > 0
+    assert (output / ok["Arquivo"]).exists()
+    assert empty["Status"] == "erro" and "Nenhuma planilha" in empty["Erro"]
+
+    consolidated = pd.read_excel(output / SUMMARY_FILE)
+    assert "05-2025" in consolidated["Competência"].astype(str).tolist()
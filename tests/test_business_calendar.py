@@ -0,0 +1,46 @@
+from datetime import date
+
+import pandas as pd
+
+from src.business_calendar import build_holidays_by_state, calendar_for, national_holidays
+from src.tools.business_days_tool import business_days_between, calculates_proportional_days
+
+# 15/04/2025 a 15/05/2025: 23 dias de semana, com Sexta-feira Santa (18/04), Tiradentes (21/04) e 01/05.
+START, END = "2025-04-15", "2025-05-15"
+
+def test_national_holidays_include_movable_good_friday():
+    assert {date(2025, 4, 18), date(2025, 4, 21), date(2025, 5, 1), date(2025, 11, 20)} <= set(national_holidays([2025]))
+    assert date(2024, 3, 29) in national_holidays([2024])
+
+def test_default_calendar_skips_national_holidays():
+    assert business_days_between(START, END) == 20
+    assert business_days_between(START, END, holidays=[]) == 23
+    assert calendar_for() is calendar_for(None)
+
+def test_state_calendar_adds_local_holidays_to_national_ones():
+    holidays = build_holidays_by_state(["São Paulo"], [2025], {"São Paulo": ["2025-04-23"]})
+    assert business_days_between(START, END, holidays["São Paulo"]) == 19
+
+def test_admission_after_holidays_is_prorated_on_national_calendar():
+    df = pd.DataFrame({
+        "MATRICULA": [1, 2],
+        "ESTADO": ["Rio Grande do Sul", "Rio Grande do Sul"],
+        "SINDICATO": [None, None],
+        "ADMISSAO": pd.to_datetime(["2025-04-22", None]),
+    })
+    # 17 dos 20 dias úteis do período, sobre os 21 dias cheios do RS.
+    assert calculates_proportional_days(df, competencia="05-2025").tolist() == [18, 21]
+
+def test_shared_calendar_counts_consistently_across_threads():
+    from concurrent.futures import ThreadPoolExecutor
+    from src.business_calendar import BusinessCalendar
+
+    calendar = BusinessCalendar(None, first_year=2024, last_year=2024)
+    years = list(range(1990, 2070, 3)) * 4
+    expected = {year: business_days_between(f"{year}-04-15", f"{year}-05-15") for year in set(years)}
+
+    def count(year):
+        return year, int(calendar.count([f"{year}-04-15"], [f"{year}-05-15"])[0])
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        assert dict(pool.map(count, years)) == expected
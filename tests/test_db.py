@@ -0,0 +1,70 @@
+import sqlite3
+import threading
+
+import pandas as pd
+import pytest
+
+from src import db
+from src.sql_executor import execute_updates
+
+FRAME = pd.DataFrame({"MATRICULA": [1, 2], "TOTAL": [0.0, 0.0]})
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = db.get_connection(str(tmp_path / "vrva.db"))
+    conn.execute("CREATE TABLE auditoria (MATRICULA INTEGER)")
+    conn.commit()
+    yield conn
+    db.close_connections(str(tmp_path / "vrva.db"))
+
+def test_write_frame_does_not_commit_callers_transaction(conn):
+    conn.execute("INSERT INTO auditoria VALUES (1)")
+    db.write_frame(conn, "report", FRAME)
+
+    assert conn.in_transaction
+    conn.rollback()
+    assert conn.execute("SELECT COUNT(*) FROM auditoria").fetchone()[0] == 0
+    assert not db.table_exists(conn, "report")
+
+def test_write_frame_commits_when_no_transaction_is_open(conn, tmp_path):
+    db.write_frame(conn, "report", FRAME)
+
+    assert not conn.in_transaction
+    with sqlite3.connect(str(tmp_path / "vrva.db")) as other:
+        assert other.execute("SELECT COUNT(*) FROM report").fetchone()[0] == 2
+
+def test_failed_updates_keep_callers_earlier_work(conn):
+    db.write_frame(conn, "report", FRAME)
+    conn.execute("CREATE TRIGGER report_total AFTER UPDATE OF TOTAL ON report BEGIN INSERT INTO auditoria VALUES (NEW.MATRICULA); END")
+    conn.execute("INSERT INTO auditoria VALUES (1)")
+
+    # O autorizador nega o INSERT do gatilho: o UPDATE falha depois de o chamador já ter gravado.
+    with pytest.raises(sqlite3.DatabaseError, match="not authorized"):
+        execute_updates(conn, ["UPDATE report SET TOTAL = 1"])
+
+    assert conn.in_transaction
+    assert conn.execute("SELECT SUM(TOTAL) FROM report").fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM auditoria").fetchone()[0] == 1
+
+def test_evicted_connections_are_closed(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "MAX_POOLED_CONNECTIONS", 2)
+    path = str(tmp_path / "pool.db")
+    opened, gate = [], threading.Event()
+
+    def worker():
+        opened.append(db.get_connection(path))
+        gate.wait()
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    while len(opened) < 3:
+        gate.wait(0.01)
+    gate.set()
+    for thread in threads:
+        thread.join()
+
+    with pytest.raises(sqlite3.ProgrammingError, match="closed"):
+        opened[0].execute("SELECT 1")
+    opened[-1].execute("SELECT 1")
+    db.close_connections(path)
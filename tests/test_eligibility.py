@@ -0,0 +1,114 @@
+import glob
+import os
+
+import pandas as pd
+import pytest
+
+from src.eligibility import EligibilityEngine, EligibilityRule
+from src.db import connection
+from src.tools.actives_tool import build_actives, process_actives_streaming
+from src.tools.eligibility_tool import apply_eligibility, last_eligible_union
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+@pytest.fixture
+def report() -> pd.DataFrame:
+    return pd.DataFrame({
+        "MATRICULA": [101, 102, 103, 104, 105, 106, 107, 108, 109, 110],
+        "CARGO": ["ANALISTA", "Diretor Comercial", "Estagiário de TI", "ANALISTA", "ANALISTA",
+                  "Aprendiz", "ANALISTA", "ANALISTA", "ANALISTA", "TÉCNICO"],
+        "SITUACAO": ["Trabalhando", "Trabalhando", "Trabalhando", "Licença Maternidade", "Trabalhando",
+                     "Trabalhando", "Auxílio Doença", "Trabalhando", "Trabalhando", "Trabalhando"],
+        "SINDICATO": ["SP", "RJ", "SP", "SP", "PR", "SP", "RS", "SP", "RJ", "RS"],
+    })
+
+@pytest.fixture
+def sources() -> dict:
+    return {
+        "afastamentos": pd.DataFrame({"MATRICULA": [105, 107, 999], "DESC. SITUACAO": ["Atestado", "Auxílio Doença", "x"]}),
+        "aprendiz": pd.DataFrame({"MATRICULA": [106], "TITULO DO CARGO": ["APRENDIZ"]}),
+        "estagio": pd.DataFrame({"MATRICULA": ["103 "], "TITULO DO CARGO": ["ESTAGIARIO"]}),
+        # Anotação sem cabeçalho, como na planilha real: 109 já voltou e segue elegível.
+        "exterior": pd.DataFrame({
+            " Cadastro ": [108, None, 109],
+            "Valor": [554.4, 0, 554.4],
+            "Unnamed: 2": [None, None, "Retornou do exterior - devido o pgto"],
+        }),
+    }
+
+def test_hits_per_rule_and_remaining_rows(report, sources):
+    df, hits = apply_eligibility(report, sources)
+
+    assert hits == {
+        "cargo": 3,           # 102 diretor, 103 estagiário (acentuado), 106 aprendiz
+        "situacao": 2,        # 104 licença maternidade, 107 auxílio doença
+        "afastamentos": 2,    # 105 e 107 (999 não está no report)
+        "aprendiz": 1,        # 106
+        "estagio": 1,         # 103, matrícula como texto com espaço
+        "exterior": 1,        # 108, pela coluna Cadastro (109 retornou)
+        "total_excluidos": 7, # 103, 106 e 107 atingem duas regras
+    }
+    assert df["MATRICULA"].tolist() == [101, 109, 110]
+
+def test_categorical_columns_give_same_result(report, sources):
+    categorical = report.astype({"CARGO": "category", "SITUACAO": "category"})
+    expected, expected_hits = apply_eligibility(report.copy(), sources)
+    df, hits = apply_eligibility(categorical, sources)
+    assert hits == expected_hits
+    assert df["MATRICULA"].tolist() == expected["MATRICULA"].tolist()
+
+def test_missing_sources_only_apply_attribute_rules(report):
+    df, hits = apply_eligibility(report)
+    assert hits["afastamentos"] == hits["exterior"] == 0
+    assert hits["total_excluidos"] == 5
+    assert df["MATRICULA"].tolist() == [101, 105, 108, 109, 110]
+
+def test_source_without_key_column_is_an_error(report):
+    with pytest.raises(KeyError, match="Cadastro"):
+        apply_eligibility(report, {"exterior": pd.DataFrame({"MATRICULA": [108]})})
+
+def test_rule_needs_exactly_one_of_column_or_source():
+    with pytest.raises(ValueError):
+        EligibilityEngine([EligibilityRule("x", "coluna e planilha", column="CARGO", source="aprendiz")])
+
+def test_inherited_union_skips_rows_that_will_be_excluded(report, sources):
+    # As últimas linhas elegíveis: 108 está no exterior; 110 (RS) passa em todas as regras.
+    assert last_eligible_union(report, sources) == "RS"
+    report.loc[report["MATRICULA"] == 110, "CARGO"] = "DIRETOR"
+    assert last_eligible_union(report, sources) == "RJ"
+    assert last_eligible_union(report.iloc[[1]], sources) is None
+
+def test_sample_sheets_keep_employee_back_from_exterior():
+    def sheet(pattern):
+        return pd.read_excel(glob.glob(os.path.join(DATA_DIR, pattern))[0])
+
+    actives = build_actives(sheet("ATIVOS.xlsx"))
+    sources = {
+        "afastamentos": sheet("AFASTAMENTOS.xlsx"),
+        "aprendiz": sheet("APRENDIZ.xlsx"),
+        "estagio": sheet("EST*GIO.xlsx"),
+        "exterior": sheet("EXTERIOR.xlsx"),
+    }
+
+    df, hits = apply_eligibility(actives.copy(), sources)
+
+    # 31227 está na EXTERIOR como "RETORNOU DO EXTERIOR - devido o pgto"; os demais listados não são ativos.
+    assert hits == {"cargo": 0, "situacao": 20, "afastamentos": 20, "aprendiz": 0,
+                    "estagio": 0, "exterior": 0, "total_excluidos": 20}
+    assert len(df) == len(actives) - 20
+    assert 31227 in set(df["MATRICULA"])
+
+def test_streaming_applies_attribute_rules_per_batch(report, sources, tmp_path):
+    actives = report.rename(columns={"CARGO": "TITULO DO CARGO", "SITUACAO": "DESC. SITUACAO", "SINDICATO": "Sindicato"})
+    xlsx = tmp_path / "ATIVOS.xlsx"
+    actives.to_excel(xlsx, index=False)
+    db_path = str(tmp_path / "vrva.db")
+
+    keys, hits = process_actives_streaming(db_path, str(xlsx), batch_size=3)
+
+    # Cargo e situação saem já nos lotes; as planilhas de exclusão ficam para a etapa de elegibilidade.
+    assert hits == {"cargo": 3, "situacao": 2, "total_excluidos": 5}
+    assert len(keys) == len(report)
+    with connection(db_path) as conn:
+        stored = [row[0] for row in conn.execute('SELECT MATRICULA FROM report ORDER BY MATRICULA')]
+    assert stored == [101, 105, 108, 109, 110]
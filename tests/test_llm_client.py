@@ -0,0 +1,127 @@
+import time
+
+import pandas as pd
+import pytest
+
+from langchain_openai import ChatOpenAI
+
+from benchmarks.llm_stub_server import STUB_SQL, start_stub_server
+from src.agent import VRVAAgent
+from src.llm_client import LLMClient, LLMTimeoutError, ResponseCache
+from src.tools.benefits_tool import calculate_benefits
+
+COMPETENCIA = "05-2025"
+
+@pytest.fixture
+def stub():
+    """Stub da API de chat da OpenAI; retorna (base_url, nº de requisições atendidas)."""
+    servers = []
+
+    def start(delay: float = 0.0):
+        server, url = start_stub_server(delay=delay)
+        servers.append(server)
+        return url, lambda: server.RequestHandlerClass.requests_served
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def chat_model(url: str) -> ChatOpenAI:
+    return ChatOpenAI(api_key="sk-test", base_url=url, model="gpt-4", temperature=0, max_retries=0)
+
+# ==============================
+# CACHE
+# ==============================
+def test_identical_prompt_is_served_from_cache(stub):
+    url, served = stub()
+    client = LLMClient(chat_model(url), timeout=5, cache=ResponseCache())
+
+    first = client.complete("calcule a competência 05-2025")
+    second = client.complete("calcule a competência 05-2025")
+
+    assert first == second == STUB_SQL
+    assert served() == 1
+
+    client.complete("calcule a competência 06-2025")
+    assert served() == 2
+
+def test_cached_response_expires_after_ttl(stub):
+    url, served = stub()
+    client = LLMClient(chat_model(url), timeout=5, cache=ResponseCache(ttl_seconds=0.2))
+
+    client.complete("prompt com validade curta")
+    client.complete("prompt com validade curta")
+    assert served() == 1
+
+    time.sleep(0.3)
+    client.complete("prompt com validade curta")
+    assert served() == 2
+
+def test_response_cache_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == ("1", "3")
+
+def test_identical_prompts_in_flight_share_one_call(stub):
+    url, served = stub(delay=0.3)
+    client = LLMClient(chat_model(url), timeout=5, cache=ResponseCache())
+
+    futures = [client.submit("prompt concorrente") for _ in range(3)]
+
+    assert len({id(f) for f in futures}) == 1
+    assert [f.result() for f in futures] == [STUB_SQL] * 3
+    assert served() == 1
+
+# ==============================
+# TEMPO LIMITE E FALLBACK
+# ==============================
+def test_timeout_is_retried_then_raised(stub):
+    url, served = stub(delay=1.0)
+    client = LLMClient(chat_model(url), timeout=0.2, retries=1, cache=ResponseCache())
+
+    start = time.perf_counter()
+    with pytest.raises(LLMTimeoutError):
+        client.complete("prompt lento")
+
+    assert served() == 2
+    assert time.perf_counter() - start < 1.0
+
+def test_llm_timeout_falls_back_to_local_calculator(stub, tmp_path, monkeypatch, caplog):
+    url, served = stub(delay=1.0)
+    monkeypatch.setenv("OPENAI_BASE_URL", url)
+
+    agent = VRVAAgent(str(tmp_path / "vrva.db"), "sk-test", calculation_mode="llm")
+    agent._client = LLMClient(agent.llm, timeout=0.2, retries=1, cache=ResponseCache())
+
+    report = pd.DataFrame({
+        "MATRICULA": [1, 2, 3],
+        "ADMISSAO": pd.to_datetime(["2020-01-10", "2025-05-12", "2019-03-01"]),
+        "DATA_DEMISSAO": pd.to_datetime([None, None, "2025-05-20"]),
+        "DIAS_UTEIS": [22, 14, 15],
+        "VALOR_DIARIO": [37.5, 35.0, 37.5],
+    })
+    expected = calculate_benefits(report.copy(), COMPETENCIA)
+
+    start = time.perf_counter()
+    state = agent.calculate_benefits_node({
+        "db_path": str(tmp_path / "vrva.db"),
+        "competencia": COMPETENCIA,
+        "report": report,
+    })
+
+    # O nó espera no máximo um tempo limite, não tempo limite x tentativas.
+    assert time.perf_counter() - start < 0.6
+    assert not state.get("error")
+    assert state["calculations_done"]
+    assert "não respondeu no prazo" in caplog.text
+    pd.testing.assert_frame_equal(
+        state["report"][expected.columns].reset_index(drop=True),
+        expected.reset_index(drop=True),
+        check_dtype=False,
+    )
+    assert served() >= 1
@@ -0,0 +1,44 @@
+import openpyxl
+import pandas as pd
+import pytest
+
+from src.report_writer import REPORT_SHEET, SUMMARY_COLUMNS, SUMMARY_SHEET, build_report_frame, write_report_xlsxwriter
+
+pytest.importorskip("xlsxwriter")
+
+@pytest.fixture
+def report() -> pd.DataFrame:
+    return build_report_frame(pd.DataFrame({
+        "MATRICULA": [1, 2],
+        "SINDICATO": ["SP", "RJ"],
+        "ADMISSAO": pd.to_datetime(["2020-01-10", None]),
+        "DIAS_UTEIS": [22, 10],
+        "VALOR_DIARIO": [37.5, 35.0],
+        "TOTAL": [825.0, 350.0],
+        "CUSTO_EMPRESA": [660.0, 280.0],
+        "CUSTO_PROFISSIONAL": [165.0, 70.0],
+        "OBS_GERAL": ["", "Férias"],
+    }), "05-2025")
+
+def test_summary_sheet_keeps_every_header_and_total(report, tmp_path):
+    filename = tmp_path / "relatorio.xlsx"
+    write_report_xlsxwriter(report, str(filename))
+
+    summary = openpyxl.load_workbook(filename)[SUMMARY_SHEET]
+    assert [cell.value for cell in summary[1]] == list(SUMMARY_COLUMNS)
+    assert [cell.value for cell in summary[2]] == [
+        f"=SUM('{REPORT_SHEET}'!$H$2:$H$3)", f"=SUM('{REPORT_SHEET}'!$I$2:$I$3)", f"=SUM('{REPORT_SHEET}'!$G$2:$G$3)"
+    ]
+
+    # Valores em cache das fórmulas, lidos por quem não recalcula a planilha.
+    cached = openpyxl.load_workbook(filename, data_only=True)[SUMMARY_SHEET]
+    assert [cell.value for cell in cached[2]] == [940.0, 235.0, 1175.0]
+
+def test_report_sheet_has_header_and_numeric_values(report, tmp_path):
+    filename = tmp_path / "relatorio.xlsx"
+    write_report_xlsxwriter(report, str(filename))
+
+    rows = list(openpyxl.load_workbook(filename)[REPORT_SHEET].values)
+    assert list(rows[0]) == list(report.columns)
+    assert len(rows) == 3
+    assert rows[1][report.columns.get_loc("TOTAL")] == 825.0
@@ -0,0 +1,169 @@
+import glob
+import json
+import os
+import signal
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pytest
+
+from src.service import Job, JobQueue, QueueFullError, create_server
+
+COMPETENCIA = "05-2025"
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+def read_samples():
+    files = []
+    for path in sorted(glob.glob(os.path.join(DATA_DIR, "*.xlsx"))):
+        if not os.path.basename(path).startswith("VR MENSAL"):
+            with open(path, "rb") as f:
+                files.append((os.path.basename(path), f.read()))
+    return files
+
+SAMPLE_FILES = read_samples()
+
+@pytest.fixture
+def make_queue(tmp_path):
+    queues = []
+
+    def make(**kwargs):
+        queue = JobQueue(base_dir=str(tmp_path / f"jobs-{len(queues)}"), **kwargs)
+        queues.append(queue)
+        return queue
+
+    yield make
+    for queue in queues:
+        queue.shutdown()
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(queue: JobQueue) -> str:
+        server = create_server("127.0.0.1", 0, queue)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def request(url: str, body: bytes = None, headers: dict = None):
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=body, headers=headers or {})) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+def multipart(files):
+    boundary = uuid.uuid4().hex
+    parts = [
+        f'--{boundary}\r\nContent-Disposition: form-data; name="files"; filename="{name}"\r\n'
+        f"Content-Type: application/octet-stream\r\n\r\n".encode() + content + b"\r\n"
+        for name, content in files
+    ]
+    return b"".join(parts) + f"--{boundary}--\r\n".encode(), {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+
+def wait_done(job: Job, timeout: float = 120):
+    deadline = time.monotonic() + timeout
+    while not job.future.done():
+        assert time.monotonic() < deadline, "job não terminou no prazo"
+        time.sleep(0.1)
+    time.sleep(0.1)  # callback _finished
+
+# ==============================
+# ENVIO E STATUS
+# ==============================
+def test_submitted_job_reports_status_and_serves_report(make_queue, serve):
+    queue = make_queue(workers=1)
+    url = serve(queue)
+
+    body, headers = multipart(SAMPLE_FILES)
+    status, payload = request(f"{url}/jobs?competencia={COMPETENCIA}", body, headers)
+    assert status == 202
+    job_id = json.loads(payload)["job_id"]
+
+    wait_done(queue.get(job_id))
+    status, payload = request(f"{url}/jobs/{job_id}")
+    info = json.loads(payload)
+    assert (status, info["status"]) == (200, "done")
+    assert info["result"]["Colaboradores"] > 0
+
+    status, content = request(f"{url}/jobs/{job_id}/report")
+    assert status == 200 and content[:2] == b"PK"
+    # As planilhas enviadas são removidas ao fim do job; o relatório fica.
+    assert not os.path.exists(queue.get(job_id).input_dir)
+
+def test_invalid_requests_are_rejected(make_queue, serve):
+    url = serve(make_queue(workers=1))
+    body, headers = multipart(SAMPLE_FILES[:1])
+
+    assert request(f"{url}/jobs", body, headers)[0] == 400
+    assert request(f"{url}/jobs?competencia={COMPETENCIA}&mode=xyz", body, headers)[0] == 400
+    assert request(f"{url}/jobs/inexistente")[0] == 404
+
+def test_full_queue_refuses_new_jobs(make_queue):
+    queue = make_queue(workers=1, max_pending=1)
+    queue.submit(COMPETENCIA, SAMPLE_FILES)
+    with pytest.raises(QueueFullError):
+        queue.submit(COMPETENCIA, SAMPLE_FILES)
+
+# ==============================
+# CANCELAMENTO E POOL QUEBRADO
+# ==============================
+def test_cancelled_future_is_reported_as_cancelled(tmp_path):
+    future = Future()
+    future.cancel()
+    job = Job(job_id="x", competencia=COMPETENCIA, mode="local", directory=str(tmp_path), future=future)
+
+    assert job.status == "cancelled"
+    assert job.result() == {} and job.error() is None and job.report_path() is None
+    assert job.to_dict()["result"]["Status"] == "cancelado"
+
+def test_pool_reset_cancels_queued_jobs(make_queue, serve):
+    queue = make_queue(workers=1)
+    url = serve(queue)
+    # Pool antigo com o único worker ocupado: os jobs enviados ficam na fila, sem adiantamento
+    # para o processo (como faz o ProcessPoolExecutor), e o cancelamento é determinístico.
+    release = threading.Event()
+    queue._pool.shutdown()
+    queue._pool = ThreadPoolExecutor(max_workers=1)
+    queue._pool.submit(release.wait)
+    jobs = [queue.submit(COMPETENCIA, SAMPLE_FILES) for _ in range(2)]
+
+    with queue._lock:
+        queue._reset_pool()
+    release.set()
+
+    assert all(job.future.cancelled() for job in jobs)
+    status, payload = request(f"{url}/jobs/{jobs[0].job_id}")
+    assert (status, json.loads(payload)["status"]) == (200, "cancelled")
+    assert request(f"{url}/jobs/{jobs[0].job_id}/report")[0] == 409
+
+    job = queue.submit(COMPETENCIA, SAMPLE_FILES)
+    wait_done(job)
+    assert job.status == "done"
+
+def test_dead_worker_recreates_pool(make_queue):
+    queue = make_queue(workers=1)
+    job = queue.submit(COMPETENCIA, SAMPLE_FILES)
+    while not queue._pool._processes:
+        time.sleep(0.01)
+    for pid in list(queue._pool._processes):
+        os.kill(pid, signal.SIGKILL)
+
+    wait_done(job)
+    assert job.status == "error"
+    assert "terminated abruptly" in job.to_dict()["result"]["Erro"]
+
+    # O pool já foi recriado no callback: o envio seguinte não recebe 503.
+    next_job = queue.submit(COMPETENCIA, SAMPLE_FILES)
+    wait_done(next_job)
+    assert next_job.status == "done"
@@ -0,0 +1,151 @@
+import sqlite3
+
+import pytest
+
+from src.sql_executor import (
+    SQLValidationError,
+    coalesce_updates,
+    execute_updates,
+    parse_update,
+    split_statements,
+)
+
+COLUMNS = ["MATRICULA", "DIAS_UTEIS", "VALOR_DIARIO", "TOTAL", "CUSTO_EMPRESA", "CUSTO_PROFISSIONAL", "OBS_GERAL"]
+ROWS = [
+    (1, 22, 10.0, 0, 0, 0, ""),
+    (2, 10, 20.0, 0, 0, 0, ""),
+    (3, 0, 35.0, 0, 0, 0, ""),
+]
+
+def make_report() -> sqlite3.Connection:
+    conn = sqlite3.connect(":memory:")
+    conn.execute(
+        "CREATE TABLE report (MATRICULA INTEGER, DIAS_UTEIS INTEGER, VALOR_DIARIO REAL, "
+        "TOTAL REAL, CUSTO_EMPRESA REAL, CUSTO_PROFISSIONAL REAL, OBS_GERAL TEXT)"
+    )
+    conn.executemany("INSERT INTO report VALUES (?, ?, ?, ?, ?, ?, ?)", ROWS)
+    conn.commit()
+    return conn
+
+def report_rows(conn: sqlite3.Connection):
+    return conn.execute("SELECT * FROM report ORDER BY MATRICULA").fetchall()
+
+# ==============================
+# VALIDAÇÃO
+# ==============================
+@pytest.mark.parametrize("sql", [
+    "UPDATE report SET TOTAL = ROUND(COALESCE(DIAS_UTEIS,0) * COALESCE(VALOR_DIARIO,0), 2);",
+    "update report set CUSTO_EMPRESA = TOTAL * 0.8, CUSTO_PROFISSIONAL = TOTAL * 0.2",
+    'UPDATE "report" SET "OBS_GERAL" = \'Férias - Valor proporcional\' WHERE DIAS_UTEIS NOT IN (21, 22)',
+    "UPDATE report SET TOTAL = 0 WHERE MATRICULA = 3",
+])
+def test_parse_update_accepts_report_updates(sql):
+    statement = parse_update(sql, COLUMNS)
+    assert set(statement.assignments) <= {"TOTAL", "CUSTO_EMPRESA", "CUSTO_PROFISSIONAL", "OBS_GERAL"}
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM report",
+    "DELETE FROM report",
+    "DROP TABLE report",
+    "INSERT INTO report (TOTAL) VALUES (1)",
+    "UPDATE outra SET TOTAL = 1",
+    "UPDATE report SET MATRICULA = 0",
+    "UPDATE report SET DIAS_UTEIS = 30",
+    "UPDATE report SET TOTAL = (SELECT MAX(TOTAL) FROM report)",
+    "UPDATE report SET TOTAL = 1 WHERE MATRICULA IN (SELECT MATRICULA FROM sqlite_master)",
+    "UPDATE report SET TOTAL = load_extension('x')",
+    "UPDATE report SET TOTAL = COLUNA_INEXISTENTE",
+    "UPDATE report SET TOTAL = 1; DROP TABLE report",
+    "UPDATE report SET TOTAL = 1; UPDATE report SET CUSTO_EMPRESA = 1",
+    "UPDATE report SET TOTAL = ",
+])
+def test_parse_update_rejects_anything_else(sql):
+    with pytest.raises(SQLValidationError):
+        parse_update(sql, COLUMNS)
+
+def test_split_statements_keeps_semicolons_inside_literals():
+    response = """```sql
+UPDATE report SET OBS_GERAL = 'a; b' WHERE TOTAL = 0;
+UPDATE report SET TOTAL = 1;
+```"""
+    assert split_statements(response) == [
+        "UPDATE report SET OBS_GERAL = 'a; b' WHERE TOTAL = 0;",
+        "UPDATE report SET TOTAL = 1;",
+    ]
+
+def test_execute_updates_rejects_whole_batch_before_running():
+    conn = make_report()
+    with pytest.raises(SQLValidationError):
+        execute_updates(conn, ["UPDATE report SET TOTAL = 1", "UPDATE report SET MATRICULA = 0"])
+    assert report_rows(conn) == ROWS
+
+# ==============================
+# COMBINAÇÃO DOS COMANDOS
+# ==============================
+DEPENDENT_UPDATES = [
+    "UPDATE report SET TOTAL = DIAS_UTEIS * VALOR_DIARIO",
+    "UPDATE report SET TOTAL = TOTAL + 100 WHERE DIAS_UTEIS < 15",
+    "UPDATE report SET TOTAL = TOTAL * 2 WHERE TOTAL > 250",
+    "UPDATE report SET CUSTO_EMPRESA = ROUND(TOTAL * 0.8, 2), CUSTO_PROFISSIONAL = ROUND(TOTAL * 0.2, 2)",
+    "UPDATE report SET OBS_GERAL = 'sem dias' WHERE DIAS_UTEIS = 0 AND TOTAL = 100",
+]
+
+def test_coalesced_updates_match_sequential_execution():
+    sequential, coalesced = make_report(), make_report()
+
+    assert execute_updates(sequential, DEPENDENT_UPDATES, coalesce=False) == (5, 5)
+    assert execute_updates(coalesced, DEPENDENT_UPDATES) == (5, 1)
+    assert report_rows(coalesced) == report_rows(sequential)
+    # 1: 220 (não passa pelo 2º nem pelo 3º); 2: 200 + 100 = 300 > 250 -> 600; 3: 0 + 100.
+    assert [(row[3], row[6]) for row in report_rows(coalesced)] == [(220, ""), (600, ""), (100, "sem dias")]
+
+def test_column_reading_its_own_earlier_value():
+    statements = [parse_update(sql, COLUMNS) for sql in (
+        "UPDATE report SET TOTAL = 10",
+        "UPDATE report SET TOTAL = TOTAL + 1 WHERE MATRICULA > 1",
+        "UPDATE report SET TOTAL = TOTAL * 3",
+    )]
+    [combined] = coalesce_updates(statements)
+    conn = make_report()
+    conn.execute(combined.sql())
+    assert [row[3] for row in report_rows(conn)] == [30, 33, 33]
+
+def test_point_updates_are_not_coalesced():
+    statements = [parse_update(sql, COLUMNS) for sql in (
+        "UPDATE report SET TOTAL = 1",
+        "UPDATE report SET TOTAL = 2 WHERE MATRICULA = 2",
+        "UPDATE report SET TOTAL = TOTAL + 1",
+        "UPDATE report SET CUSTO_EMPRESA = TOTAL",
+    )]
+    combined = coalesce_updates(statements)
+    assert len(combined) == 3
+    assert combined[1].is_point_update()
+
+    conn = make_report()
+    for statement in combined:
+        conn.execute(statement.sql())
+    assert [(row[3], row[4]) for row in report_rows(conn)] == [(2, 2), (3, 3), (2, 2)]
+
+# ==============================
+# TRANSAÇÃO
+# ==============================
+def test_authorizer_denial_rolls_back_every_statement():
+    conn = make_report()
+    # O gatilho grava em outra tabela: o autorizador nega o UPDATE que o dispara.
+    conn.executescript("""
+        CREATE TABLE auditoria (MATRICULA INTEGER);
+        CREATE TRIGGER report_custo AFTER UPDATE OF CUSTO_EMPRESA ON report
+        BEGIN INSERT INTO auditoria VALUES (NEW.MATRICULA); END;
+    """)
+
+    with pytest.raises(sqlite3.DatabaseError, match="not authorized"):
+        execute_updates(conn, [
+            "UPDATE report SET TOTAL = 99 WHERE MATRICULA = 1",
+            "UPDATE report SET CUSTO_EMPRESA = 5",
+        ])
+
+    assert report_rows(conn) == ROWS
+    assert conn.execute("SELECT COUNT(*) FROM auditoria").fetchone()[0] == 0
+    assert not conn.in_transaction
+    # O autorizador é removido mesmo após a falha.
+    conn.execute("INSERT INTO auditoria VALUES (1)")
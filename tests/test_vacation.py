@@ -0,0 +1,37 @@
+import pandas as pd
+
+from src.business_calendar import build_holidays_by_state
+from src.tools.vacation_tool import apply_vacation, vacation_on_period
+
+COMPETENCIA = "05-2025"  # 15/04 a 15/05/2025: 20 dias úteis no calendário nacional
+
+def report() -> pd.DataFrame:
+    return pd.DataFrame({
+        "MATRICULA": [1, 2, 3, 4],
+        "ESTADO": ["São Paulo", "Rio Grande do Sul", "São Paulo", "Paraná"],
+        "DIAS_UTEIS": [22, 21, 22, 22],
+    })
+
+def test_cap_uses_the_same_calendar_as_the_ranges():
+    df_v = pd.DataFrame({"MATRICULA": [1, 2], "DIAS_DE_FÉRIAS": [30, 30]})
+    holidays = build_holidays_by_state(["São Paulo"], [2025], {"São Paulo": ["2025-04-23"]})
+
+    days, whole = vacation_on_period(df_v, COMPETENCIA, holidays, pd.Series(["São Paulo", "Rio Grande do Sul"]))
+
+    assert days.tolist() == [19, 20]
+    assert whole.tolist() == [True, True]
+
+def test_vacation_over_every_business_day_zeroes_the_month():
+    df_vacation = pd.DataFrame({
+        "MATRICULA": [1, 2, 3, 4],
+        "DIAS DE FÉRIAS": [30, 20, 10, None],
+        "DT INICIO": [None, None, None, "2025-04-22"],
+        "DT FIM": [None, None, None, "2025-04-30"],
+    })
+
+    df = apply_vacation(report(), df_vacation, COMPETENCIA)
+
+    # 1 e 2 ficam o período inteiro de férias (mesmo com 22/21 dias na Base_dias_uteis) e saem;
+    # 3 desconta 10 dias; 4 desconta 7 dias úteis de 22/04 a 30/04.
+    assert df["MATRICULA"].tolist() == [3, 4]
+    assert df["DIAS_UTEIS"].tolist() == [12, 15]